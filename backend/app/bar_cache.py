@@ -0,0 +1,300 @@
+"""
+Columnar on-disk cache of bars in front of Postgres.
+
+Each instrument's bars are kept in one Arrow IPC file that is memory-mapped
+on read, so strategy code gets NumPy views of the mapped pages instead of
+rows decoded through the Prisma engine. A file is refreshed incrementally:
+only rows after its last cached datetime are fetched and appended (the
+file is rewritten and atomically replaced, so concurrent readers keep a
+consistent mapping).
+
+Rebuild the cache (from backend/):
+    python -m app.bar_cache                   # every instrument
+    python -m app.bar_cache --instrument HINDALCO
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from prisma import Prisma
+
+from app.cache import data_versions
+from app.metrics import timed
+from app.pagination import iter_pages
+from app.prices import BAR_COLUMNS, BarArrays, PriceSeries, fetch_bar_arrays, fetch_price_arrays
+from app.raw_db import raw_reader
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - pyarrow is optional, reads fall back to Prisma
+    pa = None
+
+# Directory holding one <instrument>.arrow file per instrument; the default does not depend on the working
+# directory, so the API and seed.py (run from different directories) share it
+BAR_CACHE_DIR = os.getenv("BAR_CACHE_DIR", str(Path(__file__).resolve().parent.parent / ".bar_cache"))
+# Set to 0 to always read bars through Prisma
+BAR_CACHE_ENABLED = os.getenv("BAR_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+# Seconds before a file is checked again for rows written outside the API
+BAR_CACHE_TTL = float(os.getenv("BAR_CACHE_TTL", "300"))
+
+EMPTY_DTYPES = {"datetime": "datetime64[ns]", "volume": np.int64}
+
+
+class BarCache:
+    """
+    Per-instrument Arrow IPC files with incremental refresh
+
+    Reads skip the database entirely while the instrument's data version
+    (bumped by POST /data and /data/bulk) is unchanged and the TTL has not
+    expired; otherwise rows newer than the cached maximum datetime are
+    fetched and appended. A write that lands at or before the cached
+    maximum (a backfill) deletes the file so it is rebuilt.
+    """
+
+    def __init__(self, directory: str = BAR_CACHE_DIR, ttl: float = BAR_CACHE_TTL, enabled: bool = BAR_CACHE_ENABLED):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.enabled = enabled and pa is not None
+        # instrument -> (data version, monotonic expiry) of the last refresh
+        self._checked: Dict[str, Tuple[int, float]] = {}
+        # path -> (mtime_ns, table) of mapped files
+        self._tables: Dict[Path, Tuple[int, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.rows_appended = 0
+        self.invalidations = 0
+
+    def path(self, instrument: str) -> Path:
+        return self.directory / f"{quote(instrument, safe='')}.arrow"
+
+    def read(self, instrument: str) -> Optional[Any]:
+        """Memory-map an instrument's file as an Arrow table (None if it is not cached)."""
+        path = self.path(instrument)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._tables.pop(path, None)
+            return None
+        cached = self._tables.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        table = ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+        self._tables[path] = (mtime, table)
+        return table
+
+    def write(self, instrument: str, table: Any) -> None:
+        """Write a table to a temporary file and atomically replace the instrument's file."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(instrument)
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with pa.OSFile(str(temporary), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temporary, path)
+
+    def delete(self, instrument: str) -> None:
+        path = self.path(instrument)
+        self._tables.pop(path, None)
+        self._checked.pop(instrument, None)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    async def refresh(self, prisma: Prisma, instrument: str) -> Optional[Any]:
+        """Append rows newer than the cached maximum datetime; returns the up-to-date table."""
+        table = self.read(instrument)
+        after = None
+        if table is not None and table.num_rows:
+            after = (instrument, table.column("datetime")[-1].as_py())
+
+        new_rows = await fetch_bar_table(prisma, instrument, after)
+        self.refreshes += 1
+        if new_rows.num_rows:
+            table = new_rows if table is None else pa.concat_tables([table, new_rows])
+            self.write(instrument, table.combine_chunks())
+            self.rows_appended += new_rows.num_rows
+            table = self.read(instrument)
+        return table
+
+    async def load(self, prisma: Prisma, instrument: str) -> Optional[Any]:
+        """Return the instrument's table, refreshing it only when new data may exist."""
+        version = await data_versions.get(instrument)
+        async with self._locks.setdefault(instrument, asyncio.Lock()):
+            checked = self._checked.get(instrument)
+            if checked is not None and checked[0] == version and checked[1] > time.monotonic():
+                table = self.read(instrument)
+                if table is not None:
+                    self.hits += 1
+                    return table
+            table = await self.refresh(prisma, instrument)
+            self._checked[instrument] = (version, time.monotonic() + self.ttl)
+            return table
+
+    async def columns(
+        self,
+        prisma: Prisma,
+        instrument: str,
+        names: Sequence[str] = ("datetime",) + BAR_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Dict[str, np.ndarray]:
+        """Columns of an instrument as zero-copy views of the mapped file, sliced to [start, end]."""
+        table = await self.load(prisma, instrument)
+        if table is None or table.num_rows == 0:
+            return {name: np.empty(0, dtype=EMPTY_DTYPES.get(name, np.float64)) for name in names}
+
+        stamps = column_view(table, "datetime")
+        lo = np.searchsorted(stamps, _to_datetime64(start), side="left") if start else 0
+        hi = np.searchsorted(stamps, _to_datetime64(end), side="right") if end else len(stamps)
+        return {name: column_view(table, name)[lo:hi] for name in names}
+
+    async def price_series(
+        self,
+        prisma: Prisma,
+        instrument: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> PriceSeries:
+        """Close prices of an instrument as zero-copy views of the mapped file, sliced to [start, end]."""
+        columns = await self.columns(prisma, instrument, ("datetime", "close"), start, end)
+        return PriceSeries(
+            datetimes=pd.DatetimeIndex(columns["datetime"]).tz_localize("UTC"),
+            close=columns["close"]
+        )
+
+    def invalidate(self, instrument: str, earliest: Optional[datetime] = None) -> None:
+        """
+        React to new rows for an instrument
+
+        Rows after the cached maximum are picked up by the next incremental
+        refresh; rows at or before it (or an unknown range) drop the file.
+        """
+        self._checked.pop(instrument, None)
+        if not self.enabled:
+            return
+        table = self.read(instrument)
+        if table is None or table.num_rows == 0:
+            return
+        if earliest is not None and _to_datetime64(earliest) > column_view(table, "datetime")[-1]:
+            return
+        self.invalidations += 1
+        self.delete(instrument)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "rows_appended": self.rows_appended,
+            "invalidations": self.invalidations,
+        }
+
+
+def _to_datetime64(value: datetime) -> np.datetime64:
+    """UTC datetime64[ns] for comparisons with the cached (UTC) datetime column."""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert("UTC").tz_localize(None)
+    return timestamp.to_datetime64().astype("datetime64[ns]")
+
+
+def column_view(table: Any, name: str) -> np.ndarray:
+    """Zero-copy NumPy view of a single-chunk column (datetime columns as naive UTC datetime64[ns])."""
+    column = table.column(name)
+    chunk = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return chunk.to_numpy(zero_copy_only=True)
+
+
+def bar_table(datetimes: Any, columns: Dict[str, Any]) -> Any:
+    return pa.table({
+        "datetime": pa.array(datetimes, type=pa.timestamp("ns", tz="UTC")),
+        **{name: pa.array(columns[name], type=pa.int64() if name == "volume" else pa.float64()) for name in BAR_COLUMNS},
+    })
+
+
+async def fetch_bar_table(prisma: Prisma, instrument: str, after: Optional[Tuple[str, datetime]] = None) -> Any:
+    """Read an instrument's bars after a (instrument, datetime) key page by page into an Arrow table."""
+    if raw_reader.enabled:
+        columns = await raw_reader.fetch_columns(("datetime",) + BAR_COLUMNS, instrument, after=after[1] if after else None)
+        return bar_table(columns.pop("datetime"), columns)
+    datetimes: List[datetime] = []
+    columns: Dict[str, List[Any]] = {name: [] for name in BAR_COLUMNS}
+    async for page in iter_pages(prisma, instrument, after=after):
+        for stock in page:
+            datetimes.append(stock.datetime)
+            for name in BAR_COLUMNS:
+                columns[name].append(getattr(stock, name))
+    return bar_table(datetimes, columns)
+
+
+bar_cache = BarCache()
+
+
+async def load_price_arrays(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> PriceSeries:
+    """Close prices for the strategy engine: from the bar cache for one instrument, else through Prisma."""
+    if instrument and bar_cache.enabled:
+        with timed("bar_cache"):
+            return await bar_cache.price_series(prisma, instrument, start, end)
+    return await fetch_price_arrays(prisma, instrument, start, end)
+
+
+async def load_bar_arrays(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> BarArrays:
+    """OHLCV columns for aggregation: from the bar cache for one instrument, else through the database."""
+    if instrument and bar_cache.enabled:
+        with timed("bar_cache"):
+            columns = await bar_cache.columns(prisma, instrument, start=start, end=end)
+        rows = len(columns["datetime"])
+        return BarArrays(
+            instruments=[instrument] if rows else [],
+            offsets=np.array([0, rows] if rows else [0], dtype=np.int64),
+            columns=columns
+        )
+    return await fetch_bar_arrays(prisma, instrument, start, end)
+
+
+async def rebuild(instruments: Optional[List[str]] = None) -> None:
+    from app.database import get_prisma_client
+
+    async with get_prisma_client() as prisma:
+        if not instruments:
+            rows = await prisma.stockdata.find_many(distinct=["instrument"], order={"instrument": "asc"})
+            instruments = [row.instrument for row in rows]
+        for instrument in instruments:
+            start = time.perf_counter()
+            bar_cache.delete(instrument)
+            table = await bar_cache.refresh(prisma, instrument)
+            rows = table.num_rows if table is not None else 0
+            print(f"{instrument}: {rows:,} bars in {time.perf_counter() - start:.1f}s -> {bar_cache.path(instrument)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instrument", action="append", help="Instrument to rebuild (repeatable, default: all)")
+    args = parser.parse_args()
+    if pa is None:
+        raise SystemExit("pyarrow is required for the bar cache")
+    asyncio.run(rebuild(args.instrument))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Seconds a cached result stays valid even if no new data arrives
+STRATEGY_CACHE_TTL = float(os.getenv("STRATEGY_CACHE_TTL", "300"))
+# Upper bound on the serialized size of all locally cached results
+STRATEGY_CACHE_MAX_BYTES = int(os.getenv("STRATEGY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional Redis URL for a cache and data-version store shared between workers
+STRATEGY_CACHE_REDIS_URL = os.getenv("STRATEGY_CACHE_REDIS_URL")
+# Where data versions live without Redis: "database" (the DataVersion table, seen by every process) or "local"
+DATA_VERSION_STORE = os.getenv("DATA_VERSION_STORE", "database")
+
+ALL_INSTRUMENTS = "*"
+
+
+def cache_key(kind: str, *parts: Any) -> str:
+    """Build a flat string key from a result kind and its parameters."""
+    return ":".join([kind, *("" if part is None else str(part) for part in parts)])
+
+
+class DataVersions:
+    """
+    Per-instrument data version counters
+
+    Every write bumps the instrument's counter and the all-instruments
+    counter, so a cache key that embeds the version changes as soon as new
+    rows arrive. With a shared client the counters live there (INCR);
+    otherwise, with store="database", in the DataVersion table. Either way
+    API workers and scripts such as seed.py observe each other's writes.
+    The "local" store only sees writes made by this process.
+    """
+
+    def __init__(self, shared: Any = None, store: str = "local", client: Any = None):
+        if store not in ("database", "local"):
+            raise ValueError(f"Unknown data version store: {store}")
+        self.shared = shared
+        self.store = store
+        self.client = client
+        self.local: Dict[str, int] = {}
+
+    def _table(self) -> Any:
+        if self.client is None:
+            from app.database import prisma
+
+            self.client = prisma
+        return self.client.dataversion
+
+    async def get(self, instrument: Optional[str] = None) -> int:
+        name = instrument or ALL_INSTRUMENTS
+        if self.shared is not None:
+            value = await self.shared.get(cache_key("version", name))
+            return int(value or 0)
+        if self.store == "database":
+            row = await self._table().find_unique(where={"instrument": name})
+            return row.version if row is not None else 0
+        return self.local.get(name, 0)
+
+    async def bump(self, instrument: str) -> int:
+        """Increment the instrument and all-instruments counters; return the instrument's new version."""
+        versions = []
+        for name in (instrument, ALL_INSTRUMENTS):
+            if self.shared is not None:
+                versions.append(int(await self.shared.incr(cache_key("version", name))))
+            elif self.store == "database":
+                row = await self._table().upsert(
+                    where={"instrument": name},
+                    data={"create": {"instrument": name, "version": 1}, "update": {"version": {"increment": 1}}}
+                )
+                versions.append(row.version)
+            else:
+                self.local[name] = self.local.get(name, 0) + 1
+                versions.append(self.local[name])
+        return versions[0]
+
+
+class StrategyCache:
+    """
+    LRU cache of strategy results with a TTL and a total size bound in bytes
+
+    Values must be JSON-serializable; their encoded length is the size that
+    counts toward max_bytes. An optional shared client (redis.asyncio-style
+    get / set(ex=) API) is consulted on local misses and written through on
+    every set.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = STRATEGY_CACHE_MAX_BYTES,
+        ttl: float = STRATEGY_CACHE_TTL,
+        shared: Any = None
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple[Any, int, float]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def _store(self, key: str, value: Any, size: int) -> None:
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        while self.size_bytes + size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[key] = (value, size, time.monotonic() + self.ttl)
+        self.size_bytes += size
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, _, expires = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            self.expirations += 1
+
+        if self.shared is not None:
+            encoded = await self.shared.get(cache_key("result", key))
+            if encoded is not None:
+                value = json.loads(encoded)
+                self._store(key, value, len(encoded))
+                self.hits += 1
+                self.shared_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any) -> None:
+        encoded = json.dumps(value, default=str)
+        self._store(key, value, len(encoded))
+        if self.shared is not None:
+            await self.shared.set(cache_key("result", key), encoded, ex=max(int(self.ttl), 1))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "shared_backend": self.shared is not None,
+        }
+
+
+def _shared_client() -> Any:
+    if not STRATEGY_CACHE_REDIS_URL:
+        return None
+    import redis.asyncio as redis
+
+    return redis.Redis.from_url(STRATEGY_CACHE_REDIS_URL)
+
+
+_shared = _shared_client()
+data_versions = DataVersions(shared=_shared, store=DATA_VERSION_STORE)
+strategy_cache = StrategyCache(shared=_shared)
@@ -1,22 +1,147 @@
-from prisma import Prisma
+import asyncio
+import os
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+# Pool settings are forwarded to the Prisma query engine through the
+# connection string (see Prisma's `connection_limit` / `pool_timeout` params).
+DB_CONNECTION_LIMIT = int(os.getenv("DB_CONNECTION_LIMIT", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+def build_database_url(
+    url: Optional[str] = None,
+    connection_limit: int = DB_CONNECTION_LIMIT,
+    pool_timeout: int = DB_POOL_TIMEOUT,
+) -> Optional[str]:
+    """Return DATABASE_URL with pool parameters added (explicit URL params win)."""
+    url = url if url is not None else os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.setdefault("connection_limit", str(connection_limit))
+    query.setdefault("pool_timeout", str(pool_timeout))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+# Connection-string parameters understood by Prisma but rejected by libpq
+PRISMA_ONLY_PARAMS = {"schema", "connection_limit", "pool_timeout", "pgbouncer", "statement_cache_size", "socket_timeout"}
+
+
+def libpq_dsn(url: Optional[str] = None) -> Optional[str]:
+    """Return DATABASE_URL stripped of Prisma-only parameters, for raw drivers."""
+    url = url if url is not None else os.getenv("DATABASE_URL")
+    if not url:
+        return None
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in PRISMA_ONLY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class PoolStats:
+    """Counters describing how the shared client's pool is being used."""
+
+    def __init__(self, connection_limit: int):
+        self.connection_limit = connection_limit
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.saturated_checkouts = 0
+        self.connects = 0
+        self.last_connect_seconds: Optional[float] = None
 
-# Create a generator function for Prisma client to use as a dependency
+    def acquire(self) -> None:
+        if self.in_use >= self.connection_limit:
+            self.saturated_checkouts += 1
+        self.in_use += 1
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def release(self) -> None:
+        self.in_use -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "connection_limit": self.connection_limit,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "saturation": self.in_use / self.connection_limit if self.connection_limit else 0.0,
+            "checkouts": self.checkouts,
+            "saturated_checkouts": self.saturated_checkouts,
+            "connects": self.connects,
+            "last_connect_seconds": self.last_connect_seconds,
+        }
+
+
+_database_url = build_database_url()
+prisma = Prisma(datasource={"url": _database_url} if _database_url else None)
+pool_stats = PoolStats(DB_CONNECTION_LIMIT)
+_connect_lock = asyncio.Lock()
+
+
+async def connect_prisma() -> Prisma:
+    """Open the process-wide client if it is not connected yet."""
+    async with _connect_lock:
+        if not prisma.is_connected():
+            start = time.perf_counter()
+            await prisma.connect()
+            pool_stats.connects += 1
+            pool_stats.last_connect_seconds = time.perf_counter() - start
+    return prisma
+
+
+async def disconnect_prisma() -> None:
+    """Close the process-wide client (called once on shutdown)."""
+    async with _connect_lock:
+        if prisma.is_connected():
+            await prisma.disconnect()
+
+
+async def get_pool_metrics() -> Dict[str, Any]:
+    """Pool health: local checkout counters plus the engine's pool gauges."""
+    metrics: Dict[str, Any] = {
+        "connected": prisma.is_connected(),
+        **pool_stats.snapshot(),
+        "engine": {},
+    }
+    if prisma.is_connected():
+        try:
+            engine_metrics = await prisma.get_metrics()
+            metrics["engine"] = {
+                gauge.key: gauge.value
+                for gauge in engine_metrics.gauges
+                if gauge.key.startswith("prisma_pool")
+            }
+        except Exception:
+            # Engine metrics require the `metrics` preview feature
+            pass
+    return metrics
+
+
+# Dependency handing out the shared, already-connected Prisma client
 async def get_prisma() -> AsyncGenerator[Prisma, None]:
-    prisma = Prisma()
-    await prisma.connect()
+    client = prisma if prisma.is_connected() else await connect_prisma()
+    pool_stats.acquire()
     try:
-        yield prisma
+        yield client
     finally:
-        await prisma.disconnect()
+        pool_stats.release()
 
-# Context manager for Prisma client
+# Context manager for scripts running outside the FastAPI lifespan
 @asynccontextmanager
 async def get_prisma_client():
-    prisma = Prisma()
-    await prisma.connect()
+    owns_connection = not prisma.is_connected()
+    await connect_prisma()
     try:
         yield prisma
     finally:
-        await prisma.disconnect()
\ No newline at end of file
+        if owns_connection:
+            await disconnect_prisma()
@@ -0,0 +1,354 @@
+"""
+Strategy engine: runs declarative StrategySpecs over bar arrays.
+
+A spec names indicators (in /indicators syntax, parameterised with
+{param}) and entry/exit conditions written as expressions, e.g.
+
+    {"params": {"period": 14, "oversold": 30, "overbought": 70},
+     "indicators": {"rsi": "rsi:{period}"},
+     "entry": "rsi < oversold", "exit": "rsi > overbought"}
+
+compile_spec validates a spec once into a StrategyPlan: parsed indicator
+specs plus each condition compiled from its syntax tree into a chain of
+NumPy operations. Running a plan computes the indicators on one shared
+IndicatorContext, evaluates the conditions over whole arrays, turns them
+into positions with a forward fill and hands the result to the same
+metrics code as the backtest kernels.
+
+Expressions may use numbers, params, the bar columns (open, high, low,
+close, volume), indicator names (alias.output for indicators with several
+outputs, e.g. m.signal for a macd), + - * /, comparisons, and / or / not,
+and the functions abs(x), shift(x, bars), crosses_above(a, b) and
+crosses_below(a, b).
+"""
+import ast
+import functools
+import json
+import operator
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.indicators import INDICATORS, IndicatorContext, parse_spec
+from app.kernels import KernelResult
+from app.metrics import timed
+from app.schemas import StrategySpec
+from app.strategy import TradeDetail, kernel_performance
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+BUILTIN_STRATEGIES: Dict[str, StrategySpec] = {
+    # The long/short moving average crossover of run_ma_backtest
+    "ma_crossover": StrategySpec(
+        params={"short_window": 20, "long_window": 50},
+        indicators={"short_ma": "mean:{short_window}", "long_ma": "mean:{long_window}"},
+        entry="short_ma > long_ma",
+        side="long_short"
+    ),
+    "macd_crossover": StrategySpec(
+        params={"fast": 12, "slow": 26, "signal": 9},
+        indicators={"m": "macd:{fast}:{slow}:{signal}"},
+        entry="crosses_above(m.macd, m.signal)",
+        exit="crosses_below(m.macd, m.signal)"
+    ),
+    "rsi_reversion": StrategySpec(
+        params={"period": 14, "oversold": 30, "overbought": 70},
+        indicators={"rsi": "rsi:{period}"},
+        entry="rsi < oversold",
+        exit="rsi > overbought"
+    ),
+    "bollinger_reversion": StrategySpec(
+        params={"window": 20, "num_std": 2},
+        indicators={"bands": "bollinger:{window}:{num_std}"},
+        entry="close < bands.lower",
+        exit="close > bands.middle"
+    ),
+}
+
+Env = Dict[str, Any]
+Node = Callable[[Env], Any]
+
+BINARY_OPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+COMPARE_OPS = {
+    ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less,
+    ast.LtE: np.less_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+
+
+def _shift(values: np.ndarray, bars: float) -> np.ndarray:
+    """Value `bars` bars earlier (NaN before the start); never looks ahead."""
+    values = np.asarray(values, dtype=float)
+    bars = min(max(int(bars), 0), len(values))
+    out = np.full(len(values), np.nan)
+    out[bars:] = values[:len(values) - bars]
+    return out
+
+
+def _crossed(condition: np.ndarray) -> np.ndarray:
+    """True where condition holds on a bar but not on the previous one."""
+    condition = np.asarray(condition, dtype=bool)
+    out = condition.copy()
+    out[1:] &= ~condition[:-1]
+    if len(out):
+        out[0] = False
+    return out
+
+
+FUNCTIONS: Dict[str, Tuple[int, Callable[..., np.ndarray]]] = {
+    "abs": (1, np.abs),
+    "shift": (2, _shift),
+    "crosses_above": (2, lambda a, b: _crossed(np.greater(a, b))),
+    "crosses_below": (2, lambda a, b: _crossed(np.less(a, b))),
+}
+
+
+class StrategyPlan(NamedTuple):
+    # (name, indicator name, parameters) of each indicator, in spec order
+    indicators: List[Tuple[str, str, Dict[str, Any]]]
+    params: Dict[str, float]
+    entry: Node
+    exit: Optional[Node]
+    side: str
+
+    def signals(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Evaluate the entry and exit conditions over bar columns (close required)."""
+        close = np.asarray(columns["close"], dtype=float)
+        n = len(close)
+        ctx = IndicatorContext(close, columns.get("high"), columns.get("low"))
+        env: Env = dict(self.params)
+        env.update({name: np.asarray(columns[name], dtype=float) for name in BAR_FIELDS if name in columns})
+        for name, indicator, params in self.indicators:
+            outputs = INDICATORS[indicator].compute(ctx, **params)
+            env[name] = next(iter(outputs.values())) if len(outputs) == 1 else outputs
+
+        entry = np.broadcast_to(np.asarray(self.entry(env), dtype=bool), n)
+        exit = ~entry if self.exit is None else np.broadcast_to(np.asarray(self.exit(env), dtype=bool), n)
+        return entry, exit
+
+    def positions(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Position of each bar: 1 long, 0 flat (or -1 short for long_short)
+
+        Entry bars set the state to 1, exit bars to 0 (exit wins when both
+        hold) and the state carries forward until the next signal; bars
+        before the first signal are flat.
+        """
+        entry, exit = self.signals(columns)
+        state = np.where(exit, 0.0, np.where(entry, 1.0, np.nan))
+        last = np.where(np.isnan(state), 0, np.arange(len(state)))
+        state = state[np.maximum.accumulate(last)] if len(state) else state
+        state = np.nan_to_num(state, nan=0.0)
+        return 2 * state - 1 if self.side == "long_short" else state
+
+    def run(self, datetimes: Any, columns: Dict[str, np.ndarray], trades: TradeDetail = "records") -> Dict[str, Any]:
+        """Backtest the plan over time-ordered, non-empty bar columns; same metrics as run_ma_backtest."""
+        close = np.asarray(columns["close"], dtype=float)
+        with timed("kernel"):
+            result = self.kernel(columns)
+        return kernel_performance(datetimes, close, result, trades)
+
+    def kernel(self, columns: Dict[str, np.ndarray]) -> KernelResult:
+        close = np.asarray(columns["close"], dtype=float)
+        position = self.positions(columns)
+        n = len(close)
+        strategy_returns = np.zeros(n)
+        strategy_returns[1:] = position[:-1] * (close[1:] / close[:-1] - 1)
+        equity = np.cumprod(1 + strategy_returns)
+        peak = np.maximum.accumulate(equity)
+
+        # Long trades: from each move into a long position to the next move out of it
+        held = position > 0
+        events = np.flatnonzero(held[1:] != held[:-1]) + 1
+        kinds = held[events]
+        closes = kinds[:-1] & ~kinds[1:]
+
+        mean = strategy_returns.mean()
+        return KernelResult(
+            equity,
+            events[:-1][closes],
+            events[1:][closes],
+            float(((peak - equity) / peak).max()),
+            float(mean),
+            float(((strategy_returns - mean) ** 2).sum())
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        """Bar columns the plan reads besides close."""
+        return sorted({column for _, indicator, _ in self.indicators for column in INDICATORS[indicator].columns})
+
+
+class _Compiler:
+    """Compiles a condition's syntax tree into nested NumPy closures, checking every name."""
+
+    def __init__(self, names: Dict[str, Tuple[str, ...]]):
+        # Known names -> output names (empty for arrays and numbers)
+        self.names = names
+
+    def compile(self, source: str) -> Node:
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression '{source}': {e.msg}")
+        return self.visit(tree.body)
+
+    def visit(self, node: ast.AST) -> Node:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            if node.id not in self.names:
+                raise ValueError(f"Unknown name '{node.id}'")
+            if self.names[node.id]:
+                raise ValueError(f"'{node.id}' has several outputs, use one of: {', '.join(node.id + '.' + output for output in self.names[node.id])}")
+            return operator.itemgetter(node.id)
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name):
+            outputs = self.names.get(node.value.id)
+            if not outputs or node.attr not in outputs:
+                raise ValueError(f"Unknown output '{node.value.id}.{node.attr}'")
+            name, output = node.value.id, node.attr
+            return lambda env: env[name][output]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            operand = self.visit(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda env: np.logical_not(operand(env))
+            return lambda env: np.negative(operand(env))
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+            op, left, right = BINARY_OPS[type(node.op)], self.visit(node.left), self.visit(node.right)
+            return lambda env: op(left(env), right(env))
+        if isinstance(node, ast.BoolOp):
+            op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            values = [self.visit(value) for value in node.values]
+            return lambda env: functools.reduce(op, (value(env) for value in values))
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARE_OPS for op in node.ops):
+            # a < b < c is (a < b) and (b < c)
+            operands = [self.visit(node.left)] + [self.visit(value) for value in node.comparators]
+            ops = [COMPARE_OPS[type(op)] for op in node.ops]
+
+            def compare(env):
+                values = [operand(env) for operand in operands]
+                return functools.reduce(np.logical_and, (
+                    op(values[i], values[i + 1]) for i, op in enumerate(ops)
+                ))
+            return compare
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            if node.func.id not in FUNCTIONS:
+                raise ValueError(f"Unknown function '{node.func.id}' (available: {', '.join(sorted(FUNCTIONS))})")
+            arity, function = FUNCTIONS[node.func.id]
+            if len(node.args) != arity:
+                raise ValueError(f"{node.func.id} takes {arity} arguments")
+            args = [self.visit(arg) for arg in node.args]
+            return lambda env: function(*(arg(env) for arg in args))
+        raise ValueError(f"Unsupported expression: {ast.unparse(node)}")
+
+
+# A {name} param placeholder in an indicator spec
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+def _format_param(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _substitute(indicator_spec: str, formatted: Dict[str, str], name: str) -> str:
+    """Replace {param} placeholders without str.format, so field access and indexing are rejected."""
+    def replace(match: "re.Match[str]") -> str:
+        if match.group(1) not in formatted:
+            raise ValueError(f"Unknown param '{match.group(1)}' in indicator '{name}'")
+        return formatted[match.group(1)]
+
+    substituted = PLACEHOLDER.sub(replace, indicator_spec)
+    if "{" in substituted or "}" in substituted:
+        raise ValueError(f"Invalid placeholder in indicator '{name}': {indicator_spec}")
+    return substituted
+
+
+def _compile(spec: StrategySpec) -> StrategyPlan:
+    names: Dict[str, Tuple[str, ...]] = {name: () for name in BAR_FIELDS}
+    for name in spec.params:
+        if not name.isidentifier() or name in names:
+            raise ValueError(f"Invalid param name '{name}'")
+        names[name] = ()
+
+    indicators = []
+    formatted = {key: _format_param(value) for key, value in spec.params.items()}
+    for name, indicator_spec in spec.indicators.items():
+        if not name.isidentifier() or name in names:
+            raise ValueError(f"Invalid or duplicate indicator name '{name}'")
+        indicator, params = parse_spec(_substitute(indicator_spec, formatted, name))
+        outputs = INDICATORS[indicator].outputs
+        names[name] = outputs if len(outputs) > 1 else ()
+        indicators.append((name, indicator, params))
+
+    compiler = _Compiler(names)
+    return StrategyPlan(
+        indicators=indicators,
+        params=dict(spec.params),
+        entry=compiler.compile(spec.entry),
+        exit=compiler.compile(spec.exit) if spec.exit else None,
+        side=spec.side
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_cached(encoded: str) -> StrategyPlan:
+    return _compile(StrategySpec.model_validate_json(encoded))
+
+
+def spec_json(spec: StrategySpec) -> str:
+    """Canonical JSON of a spec, used for plan and result cache keys."""
+    return json.dumps(spec.model_dump(), sort_keys=True, separators=(",", ":"))
+
+
+def compile_spec(spec: StrategySpec) -> StrategyPlan:
+    """
+    Validate a spec and compile it into a StrategyPlan (cached per spec)
+
+    Raises:
+        ValueError: Unknown indicator, name, function or param, or an
+            unsupported expression
+    """
+    return _compile_cached(spec_json(spec))
+
+
+def resolve_strategy(
+    strategy: Optional[str] = None,
+    spec: Optional[StrategySpec] = None,
+    params: Optional[Dict[str, float]] = None
+) -> StrategySpec:
+    """
+    The spec to run: a built-in by name or a given spec, with params overridden
+
+    Raises:
+        ValueError: Neither or both of strategy and spec, an unknown
+            built-in or a param the spec does not define
+    """
+    if (strategy is None) == (spec is None):
+        raise ValueError("Provide either a built-in strategy name or a spec")
+    if strategy is not None:
+        if strategy not in BUILTIN_STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}' (available: {', '.join(BUILTIN_STRATEGIES)})")
+        spec = BUILTIN_STRATEGIES[strategy]
+    unknown = sorted(set(params or {}) - set(spec.params))
+    if unknown:
+        raise ValueError(f"Unknown strategy params: {', '.join(unknown)}")
+    return spec.model_copy(update={"params": {**spec.params, **(params or {})}}) if params else spec
+
+
+def require_single_series(instruments: List[str]) -> None:
+    """Strategies backtest one price series; bars of several instruments would be run as one."""
+    if len(instruments) > 1:
+        raise ValueError(
+            f"Data for {len(instruments)} instruments found; pass an instrument to backtest a strategy"
+        )
+
+
+def run_strategy(
+    datetimes: Any,
+    columns: Dict[str, np.ndarray],
+    spec: StrategySpec,
+    trades: TradeDetail = "records"
+) -> Dict[str, Any]:
+    """Compile (or reuse) a spec's plan and backtest it over non-empty bar columns."""
+    return compile_spec(spec).run(datetimes, columns, trades)
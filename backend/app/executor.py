@@ -0,0 +1,245 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.metrics import record_stage
+
+# "thread" or "process": where strategy computations run
+STRATEGY_EXECUTOR = os.getenv("STRATEGY_EXECUTOR", "thread")
+# Concurrent strategy computations
+STRATEGY_WORKERS = int(os.getenv("STRATEGY_WORKERS", str(os.cpu_count() or 1)))
+# Jobs allowed to wait for a worker before new ones are rejected with 429
+STRATEGY_QUEUE_LIMIT = int(os.getenv("STRATEGY_QUEUE_LIMIT", "16"))
+# Seconds a request waits for its computation (queueing included) before a 504
+STRATEGY_TIMEOUT = float(os.getenv("STRATEGY_TIMEOUT", "30"))
+# Worker processes that large sweeps, portfolios and walk-forward runs are split across
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", str(os.cpu_count() or 1)))
+
+# Recent samples kept for the wait/compute percentiles
+TIMING_SAMPLES = 1000
+
+
+class ExecutorSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, float, Any]:
+    # Runs in the worker; CLOCK_MONOTONIC is shared by all processes on the host
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic(), result
+
+
+class TimingStats:
+    """Count, total, max and recent percentiles of a duration in seconds."""
+
+    def __init__(self, samples: int = TIMING_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=samples)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        p50, p95 = np.percentile(self.recent, [50, 95]) if self.recent else (0.0, 0.0)
+        return {
+            "count": self.count,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "p50_seconds": float(p50),
+            "p95_seconds": float(p95),
+            "max_seconds": self.max,
+        }
+
+
+class StrategyExecutor:
+    """
+    Bounded pool for CPU-bound strategy work, keeping it off the event loop
+
+    At most `workers` jobs run at once and at most `queue_limit` more wait
+    for a worker; beyond that run() raises ExecutorSaturated so the API can
+    answer 429 instead of piling up requests. Each job has a timeout: a job
+    still queued when it expires is cancelled, a running one is abandoned
+    (threads and pool processes cannot be interrupted) but its result is
+    discarded. Queue wait and compute time are recorded separately.
+    """
+
+    def __init__(
+        self,
+        kind: str = STRATEGY_EXECUTOR,
+        workers: int = STRATEGY_WORKERS,
+        queue_limit: int = STRATEGY_QUEUE_LIMIT,
+        timeout: float = STRATEGY_TIMEOUT
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = max(workers, 1)
+        self.queue_limit = max(queue_limit, 0)
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = TimingStats()
+        self.compute = TimingStats()
+
+    @property
+    def pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="strategy")
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+        """Run fn(*args) on the pool; raises ExecutorSaturated or asyncio.TimeoutError."""
+        if self.in_flight >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise ExecutorSaturated(
+                f"Strategy executor is saturated ({self.workers} running, {self.queue_limit} queued)"
+            )
+
+        self.in_flight += 1
+        self.submitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted = time.monotonic()
+        try:
+            if self.kind == "thread":
+                # Carry the request's context so stages timed in the worker reach its Server-Timing
+                future = self.pool.submit(contextvars.copy_context().run, _timed_call, fn, args)
+            else:
+                future = self.pool.submit(_timed_call, fn, args)
+        except Exception:
+            self.in_flight -= 1
+            raise
+        # The slot is freed when the job really finishes, so abandoned jobs still count
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: self._release_threadsafe(loop))
+        try:
+            started, finished, result = await asyncio.wait_for(
+                asyncio.wrap_future(future), timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            future.cancel()
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.completed += 1
+        self.queue_wait.add(max(started - submitted, 0.0))
+        self.compute.add(finished - started)
+        record_stage("queue_wait", max(started - submitted, 0.0))
+        record_stage("compute", finished - started)
+        return result
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop has closed (shutdown); nothing is left to account for
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "timeout_seconds": self.timeout,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "peak_in_flight": self.peak_in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": self.queue_wait.snapshot(),
+            "compute": self.compute.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+
+class ParallelPool:
+    """
+    Long-lived process pool shared by computations that split across processes
+
+    The pool is started on first use and kept, so a large sweep, portfolio
+    or walk-forward run does not pay for process start-up. Calls from
+    several threads share its workers. A pool broken by a dying worker is
+    replaced on the next call.
+    """
+
+    def __init__(self, workers: int = PARALLEL_WORKERS):
+        self.workers = max(workers, 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.restarts = 0
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def map(self, fn: Callable[..., Any], *iterables: Iterable[Any]) -> List[Any]:
+        """list(pool.map(fn, *iterables)) on the shared pool."""
+        pool = self.pool
+        try:
+            futures = [pool.submit(fn, *args) for args in zip(*iterables)]
+            self.submitted += len(futures)
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+                    self.restarts += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "started": self._pool is not None,
+            "submitted": self.submitted,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+strategy_executor = StrategyExecutor()
+parallel_pool = ParallelPool()
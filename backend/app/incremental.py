@@ -0,0 +1,296 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.strategy import TradeDetail, extract_trades, records_to_columns
+
+# Number of (instrument, windows) states kept warm
+INCREMENTAL_MAX_STATES = int(os.getenv("INCREMENTAL_MAX_STATES", "128"))
+# Seconds before a state is rebuilt from the database, bounding staleness for
+# rows written outside the API (e.g. by seed.py)
+INCREMENTAL_STATE_TTL = float(os.getenv("INCREMENTAL_STATE_TTL", "300"))
+
+StateKey = Tuple[str, int, int]
+
+
+def to_utc(value: Any) -> pd.Timestamp:
+    """Normalise a timestamp to tz-aware UTC (naive values are taken as UTC)."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+class MAStrategyState:
+    """
+    Running state of the MA crossover strategy for one series
+
+    Holds the trailing closes in a ring buffer with the short/long window
+    sums, the last signal, the open trade, equity and peak equity, and a
+    Welford mean/variance of strategy returns, so update() folds in one bar
+    in O(1). The definitions follow run_ma_backtest: trades, total return and
+    drawdown are reproduced exactly; the Sharpe ratio and the moving averages
+    agree with a full recompute to floating-point rounding.
+    """
+
+    def __init__(self, short_window: int, long_window: int):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.capacity = max(short_window, long_window) + 1
+        self.buffer = np.zeros(self.capacity)
+        self.count = 0
+        self.short_sum = 0.0
+        self.long_sum = 0.0
+        # Time zone of the series; trade dates are reported in it
+        self.tz: Any = None
+        self.last_datetime: Optional[pd.Timestamp] = None
+        self.last_close: Optional[float] = None
+        self.last_signal: Optional[int] = None
+        self.open_trade: Optional[Tuple[pd.Timestamp, float]] = None
+        self.trades: List[Dict[str, Any]] = []
+        self.wins = 0
+        self.win_sum = 0.0
+        self.loss_sum = 0.0
+        self.equity = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+        # Welford accumulators over strategy returns
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Data version of the instrument this state reflects
+        self.version = 0
+        self.expires = float("inf")
+
+    @classmethod
+    def from_arrays(
+        cls,
+        datetimes: Iterable[Any],
+        close: np.ndarray,
+        short_window: int,
+        long_window: int
+    ) -> "MAStrategyState":
+        """Build the state for a whole history at once with array operations."""
+        state = cls(short_window, long_window)
+        close = np.asarray(close, dtype=float)
+        if len(close) == 0:
+            return state
+        dates = pd.DatetimeIndex(datetimes)
+        series = pd.Series(close)
+        short_ma = series.rolling(short_window, min_periods=1).mean().to_numpy()
+        long_ma = series.rolling(long_window, min_periods=1).mean().to_numpy()
+        signal = np.where(short_ma > long_ma, 1, -1)
+
+        returns = np.zeros(len(close))
+        returns[1:] = close[1:] / close[:-1] - 1
+        strategy_returns = np.zeros(len(close))
+        strategy_returns[1:] = signal[:-1] * returns[1:]
+        equity = np.cumprod(1 + strategy_returns)
+        peak = np.maximum.accumulate(equity)
+
+        position = np.zeros(len(close))
+        position[1:] = np.sign(np.diff(signal))
+        for trade in extract_trades(dates, close, position):
+            state._record_trade(trade)
+        entries = np.flatnonzero(position == 1)
+        exits = np.flatnonzero(position == -1)
+        if len(entries) and (not len(exits) or entries[-1] > exits[-1]):
+            state.open_trade = (dates[entries[-1]], float(close[entries[-1]]))
+
+        tail = close[-state.capacity:]
+        state.buffer[:len(tail)] = tail
+        state.count = len(close)
+        if state.count >= state.capacity:
+            state.buffer = np.roll(state.buffer, state.count % state.capacity)
+        state.short_sum = float(close[-short_window:].sum())
+        state.long_sum = float(close[-long_window:].sum())
+        state.tz = dates.tz
+        state.last_datetime = dates[-1]
+        state.last_close = float(close[-1])
+        state.last_signal = int(signal[-1])
+        state.equity = float(equity[-1])
+        state.peak = float(peak[-1])
+        state.max_drawdown = float(((peak - equity) / peak).max())
+        state.n = len(strategy_returns)
+        state.mean = float(strategy_returns.mean())
+        state.m2 = float(((strategy_returns - state.mean) ** 2).sum())
+        return state
+
+    def align(self, value: Any) -> pd.Timestamp:
+        """Express a timestamp in the series' time zone (naive series hold UTC)."""
+        timestamp = to_utc(value)
+        return timestamp.tz_localize(None) if self.tz is None else timestamp.tz_convert(self.tz)
+
+    def _at(self, age: int) -> float:
+        """Close `age` bars before the latest one (0 = latest)."""
+        return self.buffer[(self.count - 1 - age) % self.capacity]
+
+    def averages(self) -> Tuple[float, float]:
+        """Short and long moving averages at the latest bar (requires at least one bar)."""
+        return (
+            self.short_sum / min(self.count, self.short_window),
+            self.long_sum / min(self.count, self.long_window)
+        )
+
+    def _record_trade(self, trade: Dict[str, Any]) -> None:
+        self.trades.append(trade)
+        if trade['profit_pct'] > 0:
+            self.wins += 1
+            self.win_sum += trade['profit_pct']
+        else:
+            self.loss_sum += trade['profit_pct']
+
+    def update(self, timestamp: Any, close: float) -> None:
+        """Fold one new bar (later than every bar seen so far) into the state."""
+        timestamp = self.align(timestamp)
+        close = float(close)
+
+        self.buffer[self.count % self.capacity] = close
+        self.count += 1
+        self.short_sum += close
+        self.long_sum += close
+        if self.count > self.short_window:
+            self.short_sum -= self._at(self.short_window)
+        if self.count > self.long_window:
+            self.long_sum -= self._at(self.long_window)
+        short_ma, long_ma = self.averages()
+        signal = 1 if short_ma > long_ma else -1
+
+        strategy_return = 0.0
+        if self.last_close is not None:
+            strategy_return = self.last_signal * (close / self.last_close - 1)
+        self.equity *= 1 + strategy_return
+        self.peak = max(self.peak, self.equity)
+        self.max_drawdown = max(self.max_drawdown, (self.peak - self.equity) / self.peak)
+        self.n += 1
+        delta = strategy_return - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (strategy_return - self.mean)
+
+        if self.last_signal is not None and signal != self.last_signal:
+            if signal == 1:
+                self.open_trade = (timestamp, close)
+            elif self.open_trade is not None:
+                entry_date, entry_price = self.open_trade
+                self._record_trade({
+                    'entry_date': entry_date.isoformat(),
+                    'exit_date': timestamp.isoformat(),
+                    'entry_price': entry_price,
+                    'exit_price': close,
+                    'profit_pct': (close - entry_price) / entry_price * 100,
+                    'type': 'long'
+                })
+                self.open_trade = None
+
+        self.last_datetime = timestamp
+        self.last_close = close
+        self.last_signal = signal
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current metrics of run_ma_backtest, without the trade list."""
+        total_trades = len(self.trades)
+        losing_trades = total_trades - self.wins
+        std = np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+        return {
+            'total_returns': float((self.equity - 1) * 100),
+            'win_rate': float(self.wins / total_trades * 100) if total_trades else 0.0,
+            'total_trades': total_trades,
+            'profitable_trades': self.wins,
+            'losing_trades': losing_trades,
+            'average_win': float(self.win_sum / self.wins) if self.wins else 0.0,
+            'average_loss': float(self.loss_sum / losing_trades) if losing_trades else 0.0,
+            'max_drawdown': float(self.max_drawdown * 100),
+            'sharpe_ratio': float(self.mean / std * np.sqrt(252)) if std > 0 else None,
+        }
+
+    def snapshot(self, trades: TradeDetail = "records") -> Dict[str, Any]:
+        """Current metrics in the same shape as run_ma_backtest with the same `trades` argument."""
+        if trades == "none":
+            return self.metrics()
+        return {
+            **self.metrics(),
+            'trades': records_to_columns(self.trades) if trades == "columns" else list(self.trades)
+        }
+
+
+class IncrementalEngine:
+    """
+    LRU registry of per-(instrument, short_window, long_window) strategy states
+
+    Each state records the data version it reflects. A write that bumps the
+    instrument's version from exactly that value is folded in bar by bar;
+    anything else (an out-of-order bar, rows skipped as duplicates, or a write
+    made by another worker) drops the state so the next request rebuilds it.
+    """
+
+    def __init__(self, max_states: int = INCREMENTAL_MAX_STATES, ttl: float = INCREMENTAL_STATE_TTL):
+        self.max_states = max_states
+        self.ttl = ttl
+        self.states: "OrderedDict[StateKey, MAStrategyState]" = OrderedDict()
+
+    def get(self, instrument: str, short_window: int, long_window: int, version: int) -> Optional[MAStrategyState]:
+        """Return the state for the windows if it is current at `version`."""
+        key = (instrument, short_window, long_window)
+        state = self.states.get(key)
+        if state is None or state.version != version or state.expires <= time.monotonic():
+            return None
+        self.states.move_to_end(key)
+        return state
+
+    def seed(
+        self,
+        instrument: str,
+        short_window: int,
+        long_window: int,
+        version: int,
+        datetimes: Iterable[Any],
+        close: np.ndarray
+    ) -> MAStrategyState:
+        state = MAStrategyState.from_arrays(datetimes, close, short_window, long_window)
+        return self.add(instrument, version, state)
+
+    def add(self, instrument: str, version: int, state: MAStrategyState) -> MAStrategyState:
+        """Register a state built (e.g. off the event loop) from data at `version`."""
+        key = (instrument, state.short_window, state.long_window)
+        state.version = version
+        state.expires = time.monotonic() + self.ttl
+        self.states[key] = state
+        self.states.move_to_end(key)
+        while len(self.states) > self.max_states:
+            self.states.popitem(last=False)
+        return state
+
+    def on_bars(
+        self,
+        instrument: str,
+        bars: Iterable[Tuple[Any, float]],
+        version: int,
+        complete: bool = True
+    ) -> None:
+        """
+        Apply newly committed (datetime, close) bars of one instrument
+
+        version is the instrument's data version after the write; complete is
+        False when some of the written rows were skipped as duplicates.
+        """
+        bars = sorted((to_utc(timestamp), float(close)) for timestamp, close in bars)
+        for key in [key for key in self.states if key[0] == instrument]:
+            state = self.states[key]
+            in_order = bool(bars) and (
+                state.last_datetime is None or state.align(bars[0][0]) > state.last_datetime
+            )
+            if not complete or not in_order or state.version != version - 1:
+                del self.states[key]
+                continue
+            for timestamp, close in bars:
+                state.update(timestamp, close)
+            state.version = version
+
+    def invalidate(self, instrument: Optional[str] = None) -> None:
+        for key in [key for key in self.states if instrument is None or key[0] == instrument]:
+            del self.states[key]
+
+
+incremental_engine = IncrementalEngine()
@@ -0,0 +1,288 @@
+"""
+Technical indicators computed over one instrument's bars.
+
+Indicators are registered in INDICATORS by name with their default
+parameters and output series. A request computes all of its indicators on
+one IndicatorContext, which memoizes the intermediates they have in common
+(prefix sums of the close, the true range, the EMA of a given series and
+span), so e.g. sma:20 and bollinger:20 share one cumulative sum and macd
+and ema:12 share one EMA. Every indicator is O(n) in the number of bars.
+
+Warm-up bars (fewer than `window` observations) are NaN, except for mean.
+"""
+import math
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.sweep import rolling_means
+
+# Largest power of 1/decay used inside an EMA block; bounds the intermediates to ~1e150
+EMA_BLOCK_RANGE = 150 * math.log(10)
+
+
+class Indicator(NamedTuple):
+    compute: Callable[..., Dict[str, np.ndarray]]
+    params: Dict[str, Any]
+    outputs: Tuple[str, ...]
+    # Bar columns the indicator reads besides close
+    columns: Tuple[str, ...] = ()
+
+
+INDICATORS: Dict[str, Indicator] = {}
+
+
+def register(name: str, outputs: Sequence[str], columns: Sequence[str] = (), **params):
+    def decorator(compute):
+        INDICATORS[name] = Indicator(compute, params, tuple(outputs), tuple(columns))
+        return compute
+    return decorator
+
+
+def parse_spec(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Parse an indicator spec "name[:arg[:arg...]]" into its name and parameters
+
+    Arguments are positional in the order of the indicator's parameters
+    (e.g. macd:12:26:9, bollinger:20:2); omitted ones take their defaults.
+
+    Raises:
+        ValueError: Unknown indicator or invalid arguments
+    """
+    name, *args = spec.strip().lower().split(":")
+    indicator = INDICATORS.get(name)
+    if indicator is None:
+        raise ValueError(f"Unknown indicator '{name}' (available: {', '.join(sorted(INDICATORS))})")
+    if len(args) > len(indicator.params):
+        raise ValueError(f"{name} takes at most {len(indicator.params)} arguments")
+
+    params = dict(indicator.params)
+    for key, arg in zip(indicator.params, args):
+        try:
+            value = type(indicator.params[key])(arg)
+        except ValueError:
+            raise ValueError(f"Invalid {key} for {name}: {arg}")
+        if value <= 0:
+            raise ValueError(f"{name} {key} must be positive")
+        params[key] = value
+    return name, params
+
+
+def spec_key(name: str, params: Dict[str, Any]) -> str:
+    """Canonical spec string, e.g. "bollinger:20:2.0"."""
+    return ":".join([name] + [str(value) for value in params.values()])
+
+
+def ema_recursive(values: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    y[0] = x[0], y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]
+
+    Same as pandas ewm(alpha=alpha, adjust=False).mean(), without a Python
+    loop per bar: within a block of B bars the recursion unrolls to
+    y[s + j] = d^(j + 1) * y[s - 1] + alpha * d^j * cumsum(x[s + i] / d^i)
+    with d = 1 - alpha, evaluated for all blocks at once. B keeps d^-B
+    finite; only the carry from block to block is a loop, over n / B blocks.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n == 0:
+        return values.copy()
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return values.copy()
+
+    block = n if decay == 1.0 else int(min(n, max(1, EMA_BLOCK_RANGE // -math.log(decay))))
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = values
+    padded = padded.reshape(blocks, block)
+
+    powers = decay ** np.arange(block)
+    # Each block's EMA with a zero starting value, then the carried-in value decayed across it
+    partial = alpha * powers * np.cumsum(padded / powers, axis=1)
+    carry_decay = powers * decay
+    # The series starts at its first value: y[0] = x[0]
+    previous = values[0]
+    out = np.empty_like(partial)
+    for row in range(blocks):
+        out[row] = partial[row] + carry_decay * previous
+        previous = out[row, -1]
+    return out.reshape(-1)[:n]
+
+
+class IndicatorContext:
+    """
+    Bar columns of one series plus memoized intermediates shared by indicators
+
+    Prefix sums are taken of the close minus its first value, which keeps
+    them small enough that window sums lose little precision on long series.
+    """
+
+    def __init__(self, close: np.ndarray, high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None):
+        self.close = np.asarray(close, dtype=float)
+        self.high = None if high is None else np.asarray(high, dtype=float)
+        self.low = None if low is None else np.asarray(low, dtype=float)
+        self.n = len(self.close)
+        self._cache: Dict[Tuple, np.ndarray] = {}
+        self.computed = 0
+
+    def _memo(self, key: Tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        if key not in self._cache:
+            self._cache[key] = compute()
+            self.computed += 1
+        return self._cache[key]
+
+    @property
+    def shift(self) -> float:
+        return float(self.close[0]) if self.n else 0.0
+
+    def cumsum(self) -> np.ndarray:
+        """Prefix sums of (close - shift), with a leading 0."""
+        return self._memo(("cumsum",), lambda: np.concatenate(([0.0], np.cumsum(self.close - self.shift))))
+
+    def cumsum_sq(self) -> np.ndarray:
+        """Prefix sums of (close - shift)^2, with a leading 0."""
+        return self._memo(("cumsum_sq",), lambda: np.concatenate(([0.0], np.cumsum((self.close - self.shift) ** 2))))
+
+    def window_sum(self, window: int) -> np.ndarray:
+        """Sum of (close - shift) over each trailing window (partial at the start)."""
+        def compute():
+            csum = self.cumsum()
+            ends = np.arange(1, self.n + 1)
+            return csum[ends] - csum[np.maximum(ends - window, 0)]
+        return self._memo(("window_sum", window), compute)
+
+    def mean(self, window: int) -> np.ndarray:
+        """Trailing mean over up to `window` bars, computed exactly like the MA crossover's."""
+        return self._memo(("mean", window), lambda: rolling_means(self.close, [window])[0])
+
+    def diff(self) -> np.ndarray:
+        return self._memo(("diff",), lambda: np.diff(self.close))
+
+    def true_range(self) -> np.ndarray:
+        """max(high - low, |high - previous close|, |low - previous close|); high - low on the first bar."""
+        if self.high is None or self.low is None:
+            raise ValueError("high and low prices are required")
+
+        def compute():
+            ranges = self.high - self.low
+            previous = self.close[:-1]
+            ranges[1:] = np.maximum.reduce([
+                ranges[1:], np.abs(self.high[1:] - previous), np.abs(self.low[1:] - previous)
+            ])
+            return ranges
+        return self._memo(("true_range",), compute)
+
+    def ema(self, source: str, alpha: float, values: Optional[Callable[[], np.ndarray]] = None) -> np.ndarray:
+        """EMA with smoothing alpha of a named series (close unless values computes another)."""
+        return self._memo(
+            ("ema", source, alpha),
+            lambda: ema_recursive(self.close if values is None else values(), alpha)
+        )
+
+
+def _warm_up(values: np.ndarray, bars: int) -> np.ndarray:
+    values[:max(bars, 0)] = np.nan
+    return values
+
+
+def span_alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+
+@register("sma", outputs=("sma",), window=20)
+def sma(ctx: IndicatorContext, window: int) -> Dict[str, np.ndarray]:
+    counts = np.minimum(np.arange(1, ctx.n + 1), window)
+    return {"sma": _warm_up(ctx.window_sum(window) / counts + ctx.shift, window - 1)}
+
+
+@register("mean", outputs=("mean",), window=20)
+def mean(ctx: IndicatorContext, window: int) -> Dict[str, np.ndarray]:
+    """SMA without warm-up: the first bars average what is available, as the MA crossover strategy does."""
+    return {"mean": ctx.mean(window)}
+
+
+@register("ema", outputs=("ema",), span=20)
+def ema(ctx: IndicatorContext, span: int) -> Dict[str, np.ndarray]:
+    return {"ema": ctx.ema("close", span_alpha(span))}
+
+
+@register("wma", outputs=("wma",), window=20)
+def wma(ctx: IndicatorContext, window: int) -> Dict[str, np.ndarray]:
+    # The weighted sum N[t] = sum_k (window - k) * x[t - k] changes by window * x[t] minus the
+    # previous window's plain sum; accumulating those steps keeps the partial sums as small as N
+    steps = window * (ctx.close - ctx.shift)
+    steps[1:] -= ctx.window_sum(window)[:-1]
+    out = np.cumsum(steps) / (window * (window + 1) / 2) + ctx.shift
+    return {"wma": _warm_up(out, window - 1)}
+
+
+@register("rsi", outputs=("rsi",), period=14)
+def rsi(ctx: IndicatorContext, period: int) -> Dict[str, np.ndarray]:
+    """Wilder's RSI: gains and losses smoothed with alpha = 1 / period."""
+    alpha = 1.0 / period
+    gain = ctx.ema("gain", alpha, lambda: np.maximum(ctx.diff(), 0.0))
+    loss = ctx.ema("loss", alpha, lambda: np.maximum(-ctx.diff(), 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(loss > 0, 100 - 100 / (1 + gain / loss), np.where(gain > 0, 100.0, 50.0))
+    return {"rsi": _warm_up(np.concatenate(([np.nan], values)), period)}
+
+
+@register("macd", outputs=("macd", "signal", "histogram"), fast=12, slow=26, signal=9)
+def macd(ctx: IndicatorContext, fast: int, slow: int, signal: int) -> Dict[str, np.ndarray]:
+    line = ctx.ema("close", span_alpha(fast)) - ctx.ema("close", span_alpha(slow))
+    signal_line = ctx.ema(f"macd:{fast}:{slow}", span_alpha(signal), lambda: line)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+@register("bollinger", outputs=("middle", "upper", "lower"), window=20, num_std=2.0)
+def bollinger(ctx: IndicatorContext, window: int, num_std: float) -> Dict[str, np.ndarray]:
+    """Bands num_std population standard deviations around the SMA."""
+    middle = sma(ctx, window)["sma"]
+    squares = ctx.cumsum_sq()
+    ends = np.arange(1, ctx.n + 1)
+    counts = np.minimum(ends, window)
+    average = ctx.window_sum(window) / counts
+    variance = np.maximum((squares[ends] - squares[ends - counts]) / counts - average ** 2, 0.0)
+    width = num_std * np.sqrt(variance)
+    return {"middle": middle, "upper": middle + width, "lower": middle - width}
+
+
+@register("atr", outputs=("atr",), columns=("high", "low"), period=14)
+def atr(ctx: IndicatorContext, period: int) -> Dict[str, np.ndarray]:
+    """Wilder's average true range: true range smoothed with alpha = 1 / period."""
+    values = ctx.ema("true_range", 1.0 / period, ctx.true_range).copy()
+    return {"atr": _warm_up(values, period - 1)}
+
+
+def compute_indicators(
+    specs: Sequence[Tuple[str, Dict[str, Any]]],
+    close: np.ndarray,
+    high: Optional[np.ndarray] = None,
+    low: Optional[np.ndarray] = None
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Compute several indicators over one series, sharing intermediates
+
+    Args:
+        specs: (name, params) pairs, as returned by parse_spec
+        close: Close prices in time order
+        high / low: High and low prices, required by atr
+
+    Returns:
+        Output series of each indicator, keyed by spec_key
+    """
+    ctx = IndicatorContext(close, high, low)
+    results = {}
+    for name, params in specs:
+        key = spec_key(name, params)
+        if key not in results:
+            results[key] = INDICATORS[name].compute(ctx, **params) if ctx.n else {
+                output: np.empty(0) for output in INDICATORS[name].outputs
+            }
+    return results
+
+
+def required_columns(specs: Sequence[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """Bar columns needed besides close."""
+    return sorted({column for name, _ in specs for column in INDICATORS[name].columns})
@@ -0,0 +1,346 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from prisma import Prisma
+from pydantic import ValidationError
+
+from app.database import libpq_dsn
+from app.schemas import StockDataCreate
+
+try:
+    import psycopg2
+except ImportError:  # pragma: no cover - psycopg2 is optional for the COPY path
+    psycopg2 = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+# COPY loads running at once; each holds one staging connection for its whole upload
+INGEST_COPY_CONNECTIONS = int(os.getenv("INGEST_COPY_CONNECTIONS", "2"))
+STOCK_COLUMNS = ("datetime", "open", "high", "low", "close", "volume", "instrument")
+
+
+class IngestError(ValueError):
+    """Raised when a bulk payload cannot be parsed or a row fails validation."""
+
+    def __init__(self, message: str, row: Optional[int] = None):
+        super().__init__(f"Row {row}: {message}" if row is not None else message)
+        self.row = row
+        # Rows committed by earlier batches before the error was hit
+        self.inserted = 0
+
+
+def detect_format(content_type: Optional[str]) -> str:
+    """Map a request Content-Type to one of json, ndjson or csv."""
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if media_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if media_type in ("text/csv", "application/csv"):
+        return "csv"
+    if media_type == "application/json":
+        return "json"
+    raise IngestError(f"Unsupported content type: {media_type}")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed request body into lines without buffering all of it."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+async def iter_records(chunks: AsyncIterator[bytes], body_format: str) -> AsyncIterator[Dict[str, Any]]:
+    """Yield raw record dicts from a JSON array, NDJSON or CSV body."""
+    if body_format == "json":
+        body = b"".join([chunk async for chunk in chunks])
+        try:
+            records = json.loads(body or b"[]")
+        except json.JSONDecodeError as e:
+            raise IngestError(f"Invalid JSON body: {e}")
+        if not isinstance(records, list):
+            raise IngestError("JSON body must be an array of records")
+        for record in records:
+            yield record
+        return
+
+    header: Optional[List[str]] = None
+    async for line in iter_lines(chunks):
+        line = line.strip()
+        if not line:
+            continue
+        if body_format == "ndjson":
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise IngestError(f"Invalid NDJSON line: {e}")
+        else:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield dict(zip(header, values))
+
+
+async def iter_batches(
+    records: AsyncIterator[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> AsyncIterator[List[StockDataCreate]]:
+    """Validate records and group them into batches of StockDataCreate rows."""
+    batch: List[StockDataCreate] = []
+    row = 0
+    async for record in records:
+        row += 1
+        try:
+            batch.append(StockDataCreate.model_validate(record))
+        except ValidationError as e:
+            raise IngestError(e.errors()[0]["msg"] + f" ({e.errors()[0]['loc']})", row=row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def utc_naive(value: datetime) -> datetime:
+    """Naive UTC datetime, as Prisma stores DateTime in a timestamp without time zone."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def rows_to_csv(rows: Iterable[StockDataCreate]) -> io.StringIO:
+    """Render validated rows as CSV for COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((
+            utc_naive(row.datetime).isoformat(sep=" "),
+            repr(row.open), repr(row.high), repr(row.low), repr(row.close),
+            row.volume, row.instrument
+        ))
+    buffer.seek(0)
+    return buffer
+
+
+class PrismaBatchWriter:
+    """Insert batches with create_many(skip_duplicates=True): one INSERT ... ON CONFLICT DO NOTHING each."""
+
+    method = "insert"
+
+    def __init__(self, prisma: Prisma):
+        self.prisma = prisma
+
+    async def write(self, rows: List[StockDataCreate]) -> int:
+        return await self.prisma.stockdata.create_many(
+            data=[
+                {
+                    "datetime": row.datetime,
+                    "open": float(row.open),
+                    "high": float(row.high),
+                    "low": float(row.low),
+                    "close": float(row.close),
+                    "volume": row.volume,
+                    "instrument": row.instrument,
+                }
+                for row in rows
+            ],
+            skip_duplicates=True
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+class StagingPool:
+    """
+    Long-lived psycopg2 connections for COPY loads, each with its own temp staging table
+
+    At most `size` loads hold a connection at once; further uploads wait
+    for one to be released. Connections are opened by start() (or on first
+    use) and kept, so a bulk request pays neither a connect nor a
+    CREATE TEMP TABLE. The staging table is truncated between uses.
+    """
+
+    columns = ", ".join(f'"{column}"' for column in STOCK_COLUMNS)
+
+    def __init__(self, size: int = INGEST_COPY_CONNECTIONS, dsn: Optional[str] = None):
+        self.size = max(size, 1)
+        self.dsn = dsn
+        self._idle: List[Any] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.acquired = 0
+        self.waited = 0
+        self.connects = 0
+
+    def _open(self) -> Any:
+        connection = psycopg2.connect(self.dsn or libpq_dsn())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE stock_staging AS SELECT {self.columns} FROM "StockData" WITH NO DATA'
+            )
+        connection.commit()
+        self.connects += 1
+        return connection
+
+    @staticmethod
+    def _reset(connection: Any) -> None:
+        connection.rollback()
+        with connection.cursor() as cursor:
+            cursor.execute("TRUNCATE stock_staging")
+        connection.commit()
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        return self._slots
+
+    async def start(self) -> None:
+        """Open the staging connections ahead of the first upload; failures are left to first use."""
+        if psycopg2 is None:
+            return
+        try:
+            while len(self._idle) < self.size:
+                self._idle.append(await asyncio.to_thread(self._open))
+        except Exception as e:
+            logger.warning("Could not open COPY staging connections: %s", e)
+
+    async def acquire(self) -> Any:
+        if self.slots.locked():
+            self.waited += 1
+        await self.slots.acquire()
+        try:
+            connection = self._idle.pop() if self._idle else None
+            if connection is None or connection.closed:
+                connection = await asyncio.to_thread(self._open)
+        except Exception:
+            self.slots.release()
+            raise
+        self.acquired += 1
+        return connection
+
+    async def release(self, connection: Any) -> None:
+        try:
+            await asyncio.to_thread(self._reset, connection)
+            self._idle.append(connection)
+        except Exception:
+            # A broken connection is dropped; the next load opens a new one
+            connection.close()
+        finally:
+            self.slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "connects": self.connects,
+        }
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+staging_pool = StagingPool()
+
+
+class CopyBatchWriter:
+    """COPY batches into a pooled connection's staging table, then upsert with ON CONFLICT DO NOTHING."""
+
+    method = "copy"
+    columns = StagingPool.columns
+
+    def __init__(self, pool: Optional[StagingPool] = None):
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 is required for COPY-based loading")
+        self.pool = pool or staging_pool
+        self.connection = None
+
+    def _write(self, connection: Any, rows: List[StockDataCreate]) -> int:
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY stock_staging ({self.columns}) FROM STDIN WITH (FORMAT csv)",
+                    rows_to_csv(rows)
+                )
+                cursor.execute(
+                    f'INSERT INTO "StockData" ({self.columns}) '
+                    f'SELECT {self.columns} FROM stock_staging ON CONFLICT DO NOTHING'
+                )
+                inserted = cursor.rowcount
+                cursor.execute("TRUNCATE stock_staging")
+            connection.commit()
+            return inserted
+        except Exception:
+            connection.rollback()
+            raise
+
+    async def write(self, rows: List[StockDataCreate]) -> int:
+        if self.connection is None:
+            self.connection = await self.pool.acquire()
+        return await asyncio.to_thread(self._write, self.connection, rows)
+
+    async def close(self) -> None:
+        if self.connection is not None:
+            connection, self.connection = self.connection, None
+            await self.pool.release(connection)
+
+
+def make_writer(method: str, prisma: Prisma, pool: Optional[StagingPool] = None):
+    """Return the batch writer for a method name ("copy" falls back to "insert" without psycopg2)."""
+    if method == "copy" and psycopg2 is not None:
+        return CopyBatchWriter(pool)
+    return PrismaBatchWriter(prisma)
+
+
+async def ingest(
+    batches: AsyncIterator[List[StockDataCreate]],
+    writer,
+    on_commit: Optional[Callable[[List[StockDataCreate], int], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Write validated batches and collect per-batch inserted/skipped counts
+
+    Rows that collide with an existing (unique) key are skipped rather than
+    failing the batch, so re-sending a payload is idempotent. on_commit is
+    awaited with each batch and its inserted count once it is stored.
+    """
+    results = []
+    try:
+        async for rows in batches:
+            inserted = await writer.write(rows)
+            if on_commit is not None and inserted:
+                await on_commit(rows, inserted)
+            results.append({
+                "batch": len(results) + 1,
+                "received": len(rows),
+                "inserted": inserted,
+                "skipped": len(rows) - inserted,
+            })
+    except IngestError as e:
+        e.inserted = sum(r["inserted"] for r in results)
+        raise
+    finally:
+        await writer.close()
+    return {
+        "method": writer.method,
+        "received": sum(r["received"] for r in results),
+        "inserted": sum(r["inserted"] for r in results),
+        "skipped": sum(r["skipped"] for r in results),
+        "batches": results,
+    }
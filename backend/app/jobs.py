@@ -0,0 +1,351 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+from prisma import Json, Prisma
+from prisma.errors import UniqueViolationError
+from pydantic import BaseModel
+
+from app.bar_cache import load_bar_arrays, load_price_arrays
+from app.cache import data_versions
+from app.engine import require_single_series, resolve_strategy, run_strategy
+from app.executor import StrategyExecutor
+from app.portfolio import run_portfolio_backtest
+from app.prices import BarArrays, PriceSeries, fetch_instrument_arrays
+from app.rollups import load_interval_series, rollup_store
+from app.schemas import MovingAverageParams, PortfolioParams, SweepParams, WalkForwardParams
+from app.strategy import run_ma_backtest, select_trades
+from app.sweep import run_ma_sweep
+from app.walkforward import run_walk_forward
+
+logger = logging.getLogger(__name__)
+
+# Jobs run concurrently by this process (0: only accept jobs, another process runs them)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds an idle job worker waits before checking the table for jobs queued elsewhere
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# Seconds a single computation step of a job may take
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "3600"))
+# Seconds between the heartbeats a running job writes to its row
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+# Seconds without a heartbeat after which a running job counts as abandoned (its process died) and is queued again
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+# Sweep jobs are computed (and report progress) this many short windows at a time
+JOB_SWEEP_CHUNK = int(os.getenv("JOB_SWEEP_CHUNK", "4"))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+JOB_PARAMS = {
+    "performance": MovingAverageParams,
+    "sweep": SweepParams,
+    "portfolio": PortfolioParams,
+    "walkforward": WalkForwardParams,
+}
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def normalize_params(kind: str, params: Dict[str, Any]) -> Tuple[BaseModel, Dict[str, Any]]:
+    """Validate job parameters for their kind; returns the model and its JSON form with defaults filled in."""
+    if kind not in JOB_PARAMS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    model = JOB_PARAMS[kind].model_validate(params)
+    if isinstance(model, SweepParams):
+        model.windows()
+    if isinstance(model, MovingAverageParams):
+        resolve_strategy(model.strategy)
+    return model, model.model_dump(mode="json")
+
+
+def params_hash(kind: str, params: Dict[str, Any], data_version: int = 0) -> str:
+    """
+    Stable hash of a job's kind, normalized parameters and input data version, used to deduplicate submissions
+
+    The data version makes a submission after new bars arrive a new job
+    instead of returning the result computed on older data.
+    """
+    encoded = json.dumps(
+        {"kind": kind, "params": params, "data_version": data_version}, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class JobContext:
+    """Handed to a running job to report progress and notice cancellation."""
+
+    def __init__(self, runner: "JobRunner", job_id: str):
+        self.runner = runner
+        self.job_id = job_id
+
+    async def progress(self, value: float) -> None:
+        """Record progress in [0, 1]; raises JobCancelled if the job is no longer running."""
+        updated = await self.runner.prisma.strategyjob.update_many(
+            where={"id": self.job_id, "status": "running"},
+            data={"progress": min(max(value, 0.0), 1.0)}
+        )
+        if not updated:
+            raise JobCancelled()
+
+
+async def _load_series(ctx: JobContext, params: Any) -> PriceSeries:
+    if params.interval is None:
+        return await load_price_arrays(ctx.runner.prisma, params.instrument, params.start, params.end)
+    if not params.instrument:
+        raise ValueError("interval requires an instrument")
+    return await load_interval_series(ctx.runner.prisma, params.instrument, params.interval, params.start, params.end)
+
+
+async def _load_bars(ctx: JobContext, params: Any) -> BarArrays:
+    if params.interval is None:
+        return await load_bar_arrays(ctx.runner.prisma, params.instrument, params.start, params.end)
+    if not params.instrument:
+        raise ValueError("interval requires an instrument")
+    return await rollup_store.bars(ctx.runner.prisma, params.instrument, params.interval, params.start, params.end)
+
+
+async def _run_performance(ctx: JobContext, params: MovingAverageParams) -> Dict[str, Any]:
+    if params.strategy != "ma_crossover":
+        bars = await _load_bars(ctx, params)
+        if not bars.instruments:
+            raise ValueError("No stock data found")
+        require_single_series(bars.instruments)
+        await ctx.progress(0.5)
+        datetimes = pd.DatetimeIndex(bars.columns["datetime"]).tz_localize("UTC")
+        performance = await ctx.runner.executor.run(
+            run_strategy, datetimes, bars.columns, resolve_strategy(params.strategy), params.trade_detail()
+        )
+    else:
+        series = await _load_series(ctx, params)
+        if len(series.close) == 0:
+            raise ValueError("No stock data found")
+        await ctx.progress(0.5)
+        performance = await ctx.runner.executor.run(
+            functools.partial(run_ma_backtest, trades=params.trade_detail()),
+            series.datetimes, series.close, params.short_window, params.long_window
+        )
+    return select_trades(
+        performance, params.include_trades, params.trades_offset, params.trades_limit, params.trades_format
+    )
+
+
+async def _run_sweep(ctx: JobContext, params: SweepParams) -> Dict[str, Any]:
+    short_windows, long_windows = params.windows()
+    series = await _load_series(ctx, params)
+    if len(series.close) == 0:
+        raise ValueError("No stock data found")
+    await ctx.progress(0.05)
+
+    results: List[Dict[str, Any]] = []
+    for start in range(0, len(short_windows), JOB_SWEEP_CHUNK):
+        chunk = short_windows[start:start + JOB_SWEEP_CHUNK]
+        results.extend(await ctx.runner.executor.run(run_ma_sweep, series.close, chunk, long_windows))
+        await ctx.progress(0.05 + 0.95 * (start + len(chunk)) / len(short_windows))
+    return {"short_windows": short_windows, "long_windows": long_windows, "results": results}
+
+
+async def _run_portfolio(ctx: JobContext, params: PortfolioParams) -> Dict[str, Any]:
+    arrays = await fetch_instrument_arrays(ctx.runner.prisma, params.instrument_list(), params.start, params.end)
+    if not arrays.instruments:
+        raise ValueError("No stock data found")
+    await ctx.progress(0.5)
+    return await ctx.runner.executor.run(
+        run_portfolio_backtest, arrays, params.short_window, params.long_window
+    )
+
+
+async def _run_walkforward(ctx: JobContext, params: WalkForwardParams) -> Dict[str, Any]:
+    short_windows, long_windows = params.windows()
+    series = await _load_series(ctx, params)
+    if len(series.close) == 0:
+        raise ValueError("No stock data found")
+    await ctx.progress(0.1)
+    return await ctx.runner.executor.run(
+        run_walk_forward, series.datetimes, series.close, short_windows, long_windows,
+        params.train_bars, params.test_bars, params.step, params.anchored, params.objective
+    )
+
+
+JOB_HANDLERS: Dict[str, Callable[[JobContext, Any], Awaitable[Dict[str, Any]]]] = {
+    "performance": _run_performance,
+    "sweep": _run_sweep,
+    "portfolio": _run_portfolio,
+    "walkforward": _run_walkforward,
+}
+
+
+class JobRunner:
+    """
+    Persistent background jobs for long strategy runs
+
+    Jobs live in the StrategyJob table, so their status and results survive
+    restarts. Submissions with the same kind and parameters share one row
+    (deduplicated by parameter hash). Worker tasks take jobs from an
+    in-process queue, or poll the table for jobs queued by other API
+    processes, and claim each one atomically (queued -> running) before
+    running its computation steps on a dedicated executor. A running job
+    writes a heartbeat to its row; jobs whose heartbeat is older than
+    JOB_STALE_SECONDS were abandoned by a process that died and are queued
+    again, while jobs still running in other processes are left alone.
+    Cancellation is checked between steps: a job whose row is no longer
+    running stops at its next progress update and its result is discarded.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.prisma: Optional[Prisma] = None
+        self.executor = StrategyExecutor(workers=max(workers, 1), queue_limit=max(workers, 1), timeout=JOB_TIMEOUT)
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self, prisma: Prisma) -> None:
+        """Requeue jobs abandoned by a process that died and start the worker tasks."""
+        self.prisma = prisma
+        if self.workers <= 0:
+            return
+        await self.requeue_stale()
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.executor.shutdown()
+
+    async def requeue_stale(self) -> int:
+        """Queue again running jobs whose heartbeat is older than JOB_STALE_SECONDS; returns how many."""
+        cutoff = _now() - timedelta(seconds=JOB_STALE_SECONDS)
+        return await self.prisma.strategyjob.update_many(
+            where={"status": "running", "OR": [{"heartbeat_at": None}, {"heartbeat_at": {"lt": cutoff}}]},
+            data={"status": "queued", "progress": 0.0}
+        )
+
+    async def submit(self, prisma: Prisma, kind: str, params: Dict[str, Any], rerun: bool = False) -> Tuple[Any, bool]:
+        """
+        Queue a job, or return the existing one for the same parameters and data
+
+        A finished job is reused unless it failed, was cancelled or rerun is
+        set, in which case it is queued again. Jobs are keyed by the data
+        version of their instrument (all instruments without one), so new
+        bars make a new job. Returns the job and whether it was (re)queued
+        by this call.
+        """
+        model, normalized = normalize_params(kind, params)
+        version = await data_versions.get(getattr(model, "instrument", None))
+        digest = params_hash(kind, normalized, version)
+        job = await prisma.strategyjob.find_unique(where={"params_hash": digest})
+
+        if job is None:
+            try:
+                job = await prisma.strategyjob.create(data={
+                    "kind": kind,
+                    "params": Json(normalized),
+                    "params_hash": digest,
+                })
+            except UniqueViolationError:
+                # An identical job was submitted concurrently
+                return await prisma.strategyjob.find_unique(where={"params_hash": digest}), False
+        elif job.status in ACTIVE_STATUSES or (job.status == "succeeded" and not rerun):
+            return job, False
+        else:
+            requeued = await prisma.strategyjob.update_many(
+                where={"id": job.id, "status": {"in": list(FINISHED_STATUSES)}},
+                data={"status": "queued", "progress": 0.0, "error": None, "started_at": None, "finished_at": None}
+            )
+            job = await prisma.strategyjob.find_unique(where={"id": job.id})
+            if not requeued:
+                return job, False
+
+        if self.tasks:
+            self.queue.put_nowait(job.id)
+        return job, True
+
+    async def cancel(self, prisma: Prisma, job_id: str) -> Optional[Any]:
+        """Cancel a queued or running job; returns the job (None if it does not exist)."""
+        await prisma.strategyjob.update_many(
+            where={"id": job_id, "status": {"in": list(ACTIVE_STATUSES)}},
+            data={"status": "cancelled", "finished_at": _now()}
+        )
+        return await prisma.strategyjob.find_unique(where={"id": job_id})
+
+    async def _next_job_id(self) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), self.poll_seconds)
+        except asyncio.TimeoutError:
+            # Idle workers also pick up jobs abandoned by processes that died
+            await self.requeue_stale()
+            job = await self.prisma.strategyjob.find_first(
+                where={"status": "queued"},
+                order={"created_at": "asc"}
+            )
+            return job.id if job is not None else None
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job_id = await self._next_job_id()
+                if job_id is not None:
+                    await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Strategy job worker error")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _run(self, job_id: str) -> None:
+        claimed = await self.prisma.strategyjob.update_many(
+            where={"id": job_id, "status": "queued"},
+            data={"status": "running", "started_at": _now(), "heartbeat_at": _now(), "progress": 0.0}
+        )
+        if not claimed:
+            return
+        job = await self.prisma.strategyjob.find_unique(where={"id": job_id})
+        params, _ = normalize_params(job.kind, job.params)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await JOB_HANDLERS[job.kind](JobContext(self, job_id), params)
+            update = {"status": "succeeded", "progress": 1.0, "result": Json(result), "error": None}
+        except JobCancelled:
+            return
+        except asyncio.TimeoutError:
+            update = {"status": "failed", "error": f"Computation step exceeded {self.executor.timeout:g}s"}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        # Only a job that is still running records its outcome (it may have been cancelled meanwhile)
+        await self.prisma.strategyjob.update_many(
+            where={"id": job_id, "status": "running"},
+            data={**update, "finished_at": _now()}
+        )
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Mark a job as alive while it runs, including during long computation steps."""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await self.prisma.strategyjob.update_many(
+                    where={"id": job_id, "status": "running"},
+                    data={"heartbeat_at": _now()}
+                )
+            except Exception:
+                logger.exception("Heartbeat of job %s failed", job_id)
+
+
+job_runner = JobRunner()
@@ -0,0 +1,140 @@
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from app.sweep import rolling_means
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - numba is optional, the NumPy kernel is the fallback
+    numba = None
+
+HAS_NUMBA = numba is not None
+BACKENDS = ("pandas", "numpy", "numba")
+# Backtest backend: auto (numba when installed, else numpy), pandas, numpy or numba
+BACKTEST_BACKEND = os.getenv("BACKTEST_BACKEND", "auto")
+
+class KernelResult(NamedTuple):
+    """Arrays and running statistics produced by a backtest kernel."""
+    equity: np.ndarray
+    entries: np.ndarray
+    exits: np.ndarray
+    max_drawdown: float
+    mean_return: float
+    m2_return: float
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Map a backend name (or "auto"/None) to the kernel that will run."""
+    backend = backend or BACKTEST_BACKEND
+    if backend == "auto":
+        return "numba" if HAS_NUMBA else "numpy"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backtest backend: {backend}")
+    if backend == "numba" and not HAS_NUMBA:
+        raise ValueError("The numba backend requires the numba package")
+    return backend
+
+def _ma_crossover_loop(close, short_window, long_window):
+    """
+    Single pass over the close array: window sums, signal, equity, drawdown,
+    Welford return statistics and trade pairing, with no intermediate arrays
+    besides equity and the trade indices. Compiled with Numba when available.
+    """
+    n = close.shape[0]
+    equity = np.empty(n)
+    entries = np.empty(n // 2 + 1, dtype=np.int64)
+    exits = np.empty(n // 2 + 1, dtype=np.int64)
+    trades = 0
+    open_entry = -1
+    short_sum = 0.0
+    long_sum = 0.0
+    prev_signal = 0
+    value = 1.0
+    peak = 1.0
+    max_drawdown = 0.0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(n):
+        price = close[i]
+        short_sum += price
+        long_sum += price
+        if i >= short_window:
+            short_sum -= close[i - short_window]
+        if i >= long_window:
+            long_sum -= close[i - long_window]
+        short_ma = short_sum / min(i + 1, short_window)
+        long_ma = long_sum / min(i + 1, long_window)
+        signal = 1 if short_ma > long_ma else -1
+
+        strategy_return = 0.0
+        if i > 0:
+            strategy_return = prev_signal * (price / close[i - 1] - 1)
+        value *= 1 + strategy_return
+        equity[i] = value
+        if value > peak:
+            peak = value
+        drawdown = (peak - value) / peak
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+        delta = strategy_return - mean
+        mean += delta / (i + 1)
+        m2 += delta * (strategy_return - mean)
+
+        if i > 0 and signal != prev_signal:
+            if signal == 1:
+                open_entry = i
+            elif open_entry >= 0:
+                entries[trades] = open_entry
+                exits[trades] = i
+                trades += 1
+                open_entry = -1
+        prev_signal = signal
+    return equity, entries[:trades], exits[:trades], max_drawdown, mean, m2
+
+_ma_crossover_compiled = numba.njit(cache=True, nogil=True)(_ma_crossover_loop) if HAS_NUMBA else None
+
+def numba_ma_crossover(close: np.ndarray, short_window: int, long_window: int) -> KernelResult:
+    """Run the compiled single-pass kernel (numba must be installed)."""
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    return KernelResult(*_ma_crossover_compiled(close, short_window, long_window))
+
+def numpy_ma_crossover(close: np.ndarray, short_window: int, long_window: int) -> KernelResult:
+    """
+    Pure-NumPy kernel: the same chain as the pandas backtest on plain arrays
+
+    Rolling means come from one cumulative sum and trades are paired from
+    the crossover indices, so no pandas objects are built.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return KernelResult(np.empty(0), empty, empty, 0.0, 0.0, 0.0)
+
+    short_ma, long_ma = rolling_means(close, [short_window, long_window])
+    signal = np.where(short_ma > long_ma, 1.0, -1.0)
+    strategy_returns = np.zeros(n)
+    strategy_returns[1:] = signal[:-1] * (close[1:] / close[:-1] - 1)
+    equity = np.cumprod(1 + strategy_returns)
+    peak = np.maximum.accumulate(equity)
+
+    # Crossovers alternate, so an exit closes a trade whenever the event before it is an entry
+    events = np.flatnonzero(signal[1:] != signal[:-1]) + 1
+    kinds = signal[events]
+    closes = (kinds[1:] == -1) & (kinds[:-1] == 1)
+
+    mean = strategy_returns.mean()
+    return KernelResult(
+        equity,
+        events[:-1][closes],
+        events[1:][closes],
+        float(((peak - equity) / peak).max()),
+        float(mean),
+        float(((strategy_returns - mean) ** 2).sum())
+    )
+
+KERNELS = {
+    "numpy": numpy_ma_crossover,
+    "numba": numba_ma_crossover,
+}
@@ -1,9 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.database import connect_prisma, disconnect_prisma, prisma
+from app.executor import parallel_pool, strategy_executor
+from app.ingest import staging_pool
+from app.jobs import job_runner
+from app.raw_db import raw_reader
 from app.routes import router  # Ensure this import works
+from app.streaming import stream_hub
+from app.serialization import CompressionMiddleware, ORJSONResponse
+from app.metrics import MetricsMiddleware
 import logging
 
-app = FastAPI(title="Stock Trading Strategy API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared Prisma client (and its connection pool) once per process
+    await connect_prisma()
+    await staging_pool.start()
+    await job_runner.start(prisma)
+    try:
+        yield
+    finally:
+        stream_hub.close()
+        await job_runner.stop()
+        strategy_executor.shutdown()
+        parallel_pool.shutdown()
+        await raw_reader.close()
+        await staging_pool.close()
+        await disconnect_prisma()
+
+
+app = FastAPI(title="Stock Trading Strategy API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Enable detailed error logs
 logging.basicConfig(level=logging.DEBUG)
@@ -17,6 +45,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (gzip, or zstd when installed) for clients that accept it
+app.add_middleware(CompressionMiddleware)
+
+# Time every request (compression included) for GET /metrics and Server-Timing
+app.add_middleware(MetricsMiddleware)
+
 # Include Routes (Ensure router is imported correctly)
 app.include_router(router)
 
@@ -0,0 +1,201 @@
+"""
+Request latency and hot-path stage timings in the Prometheus text format.
+
+MetricsMiddleware records every HTTP request in a latency histogram
+labelled by method, route template and status. Code on the hot path wraps
+its stages in timed("name") (database fetch, array decoding, DataFrame
+build, rolling means, trade extraction, JSON encoding, ...), which records
+into a per-stage histogram; stages may nest. With SERVER_TIMING=1 the
+stages a request went through before its response started are also sent
+back in a Server-Timing header.
+
+Histograms are kept in-process (no client library needed) and rendered by
+GET /metrics together with the DB pool, executor and cache statistics.
+Stages that run in a process-pool executor are not recorded; the
+executor's queue_wait and compute stages still are.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+# Set to 0 to stop recording request and stage timings
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Set to 1 to report each request's stage timings in a Server-Timing header
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds, from sub-millisecond stages to slow backtests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stages recorded by the current request, when it reports Server-Timing
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in instrumented hot-path stages", ("stage",))
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration measured by the caller."""
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+class timed:
+    """Context manager timing a stage: `with timed("db_fetch"): ...`"""
+
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "timed":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_stage(self.stage, time.perf_counter() - self.start)
+
+
+def server_timing(stages: Iterable[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value; repeated stages are summed, durations are in milliseconds."""
+    durations: Dict[str, float] = {}
+    for stage, seconds in stages:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    durations["app"] = total
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in durations.items())
+
+
+def render_stats(prefix: str, stats: Dict[str, Any], counters: Iterable[str] = ()) -> List[str]:
+    """
+    Numeric fields of a stats snapshot as Prometheus samples
+
+    Fields named in `counters` become counters (suffixed _total), the other
+    numbers gauges; None, strings and nested values are skipped.
+    """
+    counters = set(counters)
+    lines = []
+    for field, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{field}_total" if field in counters else f"{prefix}_{field}"
+        lines.append(f"# TYPE {name} {'counter' if field in counters else 'gauge'}")
+        lines.append(f"{name} {value!r}")
+    return lines
+
+
+def render_metrics(*sections: List[str]) -> str:
+    """Request and stage histograms followed by the given rendered sections, as one exposition."""
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    for section in sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and optionally adding a Server-Timing header."""
+
+    def __init__(self, app: Any, enabled: Optional[bool] = None, server_timing: Optional[bool] = None):
+        self.app = app
+        self.enabled = METRICS_ENABLED if enabled is None else enabled
+        self.server_timing = SERVER_TIMING if server_timing is None else server_timing
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = "500"
+        stages: Optional[List[Tuple[str, float]]] = [] if self.server_timing else None
+        token = _request_stages.set(stages)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if stages is not None:
+                    headers = MutableHeaders(raw=message["headers"])
+                    headers.append("Server-Timing", server_timing(stages, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stages.reset(token)
+            # The matched route's template keeps the label set bounded
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status
+            )
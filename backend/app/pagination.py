@@ -0,0 +1,122 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from prisma import Prisma
+
+# Rows fetched per keyset page when streaming a whole table
+DATA_PAGE_SIZE = int(os.getenv("DATA_PAGE_SIZE", "5000"))
+
+STOCK_FIELDS = ("id", "datetime", "open", "high", "low", "close", "volume", "instrument")
+STOCK_ORDER = [{"instrument": "asc"}, {"datetime": "asc"}]
+
+Cursor = Tuple[str, datetime]
+
+def encode_cursor(instrument: str, timestamp: datetime) -> str:
+    """Encode the (instrument, datetime) key of the last row as an opaque token."""
+    raw = json.dumps([instrument, timestamp.isoformat()]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode a token from encode_cursor, raising ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        instrument, timestamp = json.loads(base64.urlsafe_b64decode(padded))
+        return str(instrument), datetime.fromisoformat(timestamp)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+def range_conditions(
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    instruments: Optional[Sequence[str]] = None
+) -> List[Tuple[str, str, Any]]:
+    """(field, Prisma operator, value) conditions selecting the instrument(s)/date range."""
+    conditions: List[Tuple[str, str, Any]] = []
+    if instrument:
+        conditions.append(("instrument", "equals", instrument))
+    if instruments:
+        conditions.append(("instrument", "in", list(instruments)))
+    if start:
+        conditions.append(("datetime", "gte", start))
+    if end:
+        conditions.append(("datetime", "lte", end))
+    return conditions
+
+def build_where(
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Cursor] = None,
+    instruments: Optional[Sequence[str]] = None
+) -> Dict[str, Any]:
+    """Build a Prisma filter for the instrument(s)/date range, resuming after a cursor."""
+    conditions: List[Dict[str, Any]] = [
+        {field: {operator: value}} for field, operator, value in range_conditions(instrument, start, end, instruments)
+    ]
+    if after:
+        after_instrument, after_datetime = after
+        conditions.append({"OR": [
+            {"instrument": {"gt": after_instrument}},
+            {"instrument": after_instrument, "datetime": {"gt": after_datetime}},
+        ]})
+    return {"AND": conditions} if conditions else {}
+
+async def fetch_page(
+    prisma: Prisma,
+    take: int,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Cursor] = None
+) -> list:
+    """Fetch up to `take` rows in (instrument, datetime) order."""
+    return await prisma.stockdata.find_many(
+        where=build_where(instrument, start, end, after),
+        order=STOCK_ORDER,
+        take=take
+    )
+
+async def iter_pages(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[Cursor] = None,
+    page_size: int = DATA_PAGE_SIZE
+) -> AsyncIterator[list]:
+    """Walk the table page by page with keyset pagination, so memory stays flat."""
+    while True:
+        page = await fetch_page(prisma, page_size, instrument, start, end, after)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1].instrument, page[-1].datetime)
+
+def stock_to_dict(stock: Any) -> Dict[str, Any]:
+    """Plain JSON-ready dict for a row, skipping response-model validation."""
+    return {
+        "id": stock.id,
+        "datetime": stock.datetime.isoformat(),
+        "open": float(stock.open),
+        "high": float(stock.high),
+        "low": float(stock.low),
+        "close": float(stock.close),
+        "volume": stock.volume,
+        "instrument": stock.instrument,
+    }
+
+def empty_columns() -> Dict[str, list]:
+    return {field: [] for field in STOCK_FIELDS}
+
+def extend_columns(columns: Dict[str, list], stocks: list) -> Dict[str, list]:
+    """Append rows to per-field arrays (the columnar response layout)."""
+    for stock in stocks:
+        row = stock_to_dict(stock)
+        for field in STOCK_FIELDS:
+            columns[field].append(row[field])
+    return columns
@@ -0,0 +1,181 @@
+import os
+from itertools import repeat
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Dict, Any, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.executor import parallel_pool
+from app.kernels import KERNELS, resolve_backend
+from app.strategy import kernel_performance
+
+# Portfolios with fewer bars than this are backtested in-process
+PORTFOLIO_PARALLEL_BARS = int(os.getenv("PORTFOLIO_PARALLEL_BARS", "1000000"))
+
+# (shared memory block name, shape, dtype) of an array shared with workers
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+class InstrumentArrays(NamedTuple):
+    """
+    Bars of several instruments packed into flat arrays
+
+    Rows of instrument i are close[offsets[i]:offsets[i + 1]] (likewise for
+    datetimes), in time order.
+    """
+    instruments: List[str]
+    offsets: np.ndarray
+    datetimes: pd.DatetimeIndex
+    close: np.ndarray
+
+def _share(array: np.ndarray) -> Tuple[SharedMemory, ArraySpec]:
+    """Copy an array into a new shared memory block."""
+    block = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+def _backtest_instruments(
+    close: np.ndarray,
+    datetimes: pd.DatetimeIndex,
+    equity: np.ndarray,
+    slices: Sequence[Tuple[int, int]],
+    short_window: int,
+    long_window: int,
+    backend: str
+) -> List[Dict[str, Any]]:
+    """Backtest each [start, stop) slice, writing its equity curve into `equity`."""
+    results = []
+    for start, stop in slices:
+        result = KERNELS[backend](close[start:stop], short_window, long_window)
+        equity[start:stop] = result.equity
+        results.append(kernel_performance(datetimes[start:stop], close[start:stop], result, trades="none"))
+    return results
+
+def _shared_worker(
+    specs: Dict[str, ArraySpec],
+    tz: Optional[str],
+    slices: Sequence[Tuple[int, int]],
+    short_window: int,
+    long_window: int,
+    backend: str
+) -> List[Dict[str, Any]]:
+    """Process-pool entry point: attach to the shared arrays and backtest a chunk of instruments."""
+    blocks = {key: SharedMemory(name=name) for key, (name, _, _) in specs.items()}
+    try:
+        views = {
+            key: np.ndarray(shape, dtype=dtype, buffer=blocks[key].buf)
+            for key, (_, shape, dtype) in specs.items()
+        }
+        datetimes = pd.DatetimeIndex(views['datetimes'].copy())
+        if tz is not None:
+            datetimes = datetimes.tz_localize("UTC").tz_convert(tz)
+        results = _backtest_instruments(
+            views['close'], datetimes, views['equity'], slices, short_window, long_window, backend
+        )
+        del views
+        return results
+    finally:
+        for block in blocks.values():
+            block.close()
+
+def _aggregate(arrays: InstrumentArrays, equity: np.ndarray) -> Dict[str, Any]:
+    """Combine per-instrument equity curves into an equal-weight portfolio."""
+    sleeves = pd.concat(
+        [
+            pd.Series(equity[start:stop], index=arrays.datetimes[start:stop])
+            for start, stop in zip(arrays.offsets[:-1], arrays.offsets[1:])
+        ],
+        axis=1
+    ).sort_index()
+    # Each sleeve holds its capital in cash until its first bar and keeps its last value after its last bar
+    portfolio = sleeves.ffill().fillna(1.0).mean(axis=1)
+
+    returns = portfolio.pct_change().fillna(0)
+    peak = portfolio.cummax()
+    std = returns.std()
+    return {
+        'total_returns': float((portfolio.iloc[-1] - 1) * 100),
+        'max_drawdown': float(((peak - portfolio) / peak).max() * 100),
+        'sharpe_ratio': float(returns.mean() / std * np.sqrt(252)) if std > 0 else None,
+        'bars': len(portfolio),
+    }
+
+def run_portfolio_backtest(
+    arrays: InstrumentArrays,
+    short_window: int = 20,
+    long_window: int = 50,
+    max_workers: Optional[int] = None,
+    backend: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Backtest the MA crossover strategy on each instrument and combine them into a portfolio
+
+    Every instrument is an independent sleeve with an equal share of the
+    starting capital. Large portfolios are spread over the shared process pool,
+    which read prices from and write equity curves into shared memory, so
+    only slice bounds and per-instrument metrics cross process boundaries.
+
+    Args:
+        arrays: Packed bars from fetch_instrument_arrays
+        short_window: Short-term moving average window (default: 20)
+        long_window: Long-term moving average window (default: 50)
+        max_workers: Chunks a large portfolio is split into for the shared
+            process pool (default: its size, 1 runs in-process)
+        backend: Array kernel, see app.kernels.resolve_backend ("pandas" runs
+            the NumPy kernel, since only the array kernels emit equity curves)
+
+    Returns:
+        Portfolio total return, drawdown and Sharpe ratio plus per-instrument metrics
+    """
+    backend = resolve_backend(backend)
+    backend = "numpy" if backend == "pandas" else backend
+    close = np.ascontiguousarray(arrays.close, dtype=np.float64)
+    equity = np.empty_like(close)
+    slices = list(zip(arrays.offsets[:-1].tolist(), arrays.offsets[1:].tolist()))
+    if not slices:
+        return {
+            'short_window': short_window,
+            'long_window': long_window,
+            'total_returns': 0.0,
+            'max_drawdown': 0.0,
+            'sharpe_ratio': None,
+            'bars': 0,
+            'instruments': [],
+        }
+
+    max_workers = min(max_workers or parallel_pool.workers, len(slices))
+    if max_workers > 1 and len(close) >= PORTFOLIO_PARALLEL_BARS:
+        shared = {
+            'close': _share(close),
+            'datetimes': _share(arrays.datetimes.asi8),
+            'equity': _share(equity),
+        }
+        try:
+            specs = {key: spec for key, (_, spec) in shared.items()}
+            tz = str(arrays.datetimes.tz) if arrays.datetimes.tz is not None else None
+            chunks = [chunk.tolist() for chunk in np.array_split(np.array(slices), max_workers)]
+            parts = parallel_pool.map(
+                _shared_worker, repeat(specs), repeat(tz), chunks,
+                repeat(short_window), repeat(long_window), repeat(backend)
+            )
+            performances = [performance for part in parts for performance in part]
+            _, shape, dtype = specs['equity']
+            equity[:] = np.ndarray(shape, dtype=dtype, buffer=shared['equity'][0].buf)
+        finally:
+            for block, _ in shared.values():
+                block.close()
+                block.unlink()
+    else:
+        performances = _backtest_instruments(
+            close, arrays.datetimes, equity, slices, short_window, long_window, backend
+        )
+
+    return {
+        'short_window': short_window,
+        'long_window': long_window,
+        **_aggregate(arrays, equity),
+        'instruments': [
+            {'instrument': instrument, 'bars': stop - start, **performance}
+            for instrument, (start, stop), performance in zip(arrays.instruments, slices, performances)
+        ],
+    }
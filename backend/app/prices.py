@@ -0,0 +1,140 @@
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from prisma import Prisma
+
+from app.metrics import timed
+from app.pagination import STOCK_ORDER, build_where
+from app.portfolio import InstrumentArrays
+from app.raw_db import raw_reader
+
+
+BAR_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+class PriceSeries(NamedTuple):
+    """Columnar bars for one series, ready for the strategy engine."""
+    datetimes: pd.DatetimeIndex
+    close: np.ndarray
+
+
+class BarArrays(NamedTuple):
+    """
+    OHLCV bars of one or more instruments as flat columns
+
+    Rows of instrument i are columns[...][offsets[i]:offsets[i + 1]] in time
+    order; columns["datetime"] is naive UTC datetime64[ns].
+    """
+    instruments: List[str]
+    offsets: np.ndarray
+    columns: Dict[str, np.ndarray]
+
+
+def utc_datetime64(datetimes: Sequence[datetime]) -> np.ndarray:
+    """Naive UTC datetime64[ns] array from datetimes (naive ones are taken as UTC, like Prisma does)."""
+    return pd.to_datetime(list(datetimes), utc=True).tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+def group_offsets(names: np.ndarray) -> np.ndarray:
+    """Start offsets of each run of equal names (plus the total length)."""
+    boundaries = np.flatnonzero(names[1:] != names[:-1]) + 1
+    offsets = np.concatenate(([0], boundaries, [len(names)])) if len(names) else np.zeros(1, dtype=np.int64)
+    return offsets.astype(np.int64)
+
+
+async def fetch_price_arrays(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> PriceSeries:
+    """
+    Load close prices as a float64 array with their timestamps.
+    
+    Prices are stored as double precision, so values are copied straight into
+    the array without the per-field Decimal/float conversions of the row path.
+    With a raw read driver configured the rows skip Prisma altogether.
+    """
+    if raw_reader.enabled:
+        with timed("db_fetch"):
+            columns = await raw_reader.fetch_columns(("datetime", "close"), instrument, start, end)
+        return PriceSeries(
+            datetimes=pd.DatetimeIndex(columns["datetime"]).tz_localize("UTC"),
+            close=columns["close"]
+        )
+    with timed("db_fetch"):
+        stocks = await prisma.stockdata.find_many(
+            where=build_where(instrument, start, end),
+            order=STOCK_ORDER if instrument else [{"datetime": "asc"}]
+        )
+    with timed("decode"):
+        return PriceSeries(
+            datetimes=pd.DatetimeIndex([stock.datetime for stock in stocks]),
+            close=np.fromiter((stock.close for stock in stocks), dtype=np.float64, count=len(stocks))
+        )
+
+
+async def fetch_instrument_arrays(
+    prisma: Prisma,
+    instruments: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> InstrumentArrays:
+    """Load close prices of the given instruments (default: all) with one query."""
+    if raw_reader.enabled:
+        with timed("db_fetch"):
+            names, offsets, columns = await raw_reader.fetch_grouped(("datetime", "close"), instruments, start, end)
+        return InstrumentArrays(
+            instruments=names,
+            offsets=offsets,
+            datetimes=pd.DatetimeIndex(columns["datetime"]).tz_localize("UTC"),
+            close=columns["close"]
+        )
+    with timed("db_fetch"):
+        stocks = await prisma.stockdata.find_many(
+            where=build_where(start=start, end=end, instruments=instruments),
+            order=STOCK_ORDER
+        )
+    with timed("decode"):
+        names = np.array([stock.instrument for stock in stocks], dtype=object)
+        offsets = group_offsets(names)
+        return InstrumentArrays(
+            instruments=[str(name) for name in names[offsets[:-1]]],
+            offsets=offsets,
+            datetimes=pd.DatetimeIndex([stock.datetime for stock in stocks]),
+            close=np.fromiter((stock.close for stock in stocks), dtype=np.float64, count=len(stocks))
+        )
+
+
+async def fetch_bar_arrays(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> BarArrays:
+    """Load OHLCV columns of one instrument (default: all, grouped by instrument) with one query."""
+    instruments = [instrument] if instrument else None
+    if raw_reader.enabled:
+        with timed("db_fetch"):
+            names, offsets, columns = await raw_reader.fetch_grouped(("datetime",) + BAR_COLUMNS, instruments, start, end)
+        return BarArrays(instruments=names, offsets=offsets, columns=columns)
+
+    with timed("db_fetch"):
+        stocks = await prisma.stockdata.find_many(
+            where=build_where(start=start, end=end, instruments=instruments),
+            order=STOCK_ORDER
+        )
+    with timed("decode"):
+        names = np.array([stock.instrument for stock in stocks], dtype=object)
+        offsets = group_offsets(names)
+        columns = {"datetime": utc_datetime64([stock.datetime for stock in stocks])}
+        for name in BAR_COLUMNS:
+            dtype = np.int64 if name == "volume" else np.float64
+            columns[name] = np.fromiter((getattr(stock, name) for stock in stocks), dtype=dtype, count=len(stocks))
+    return BarArrays(
+        instruments=[str(name) for name in names[offsets[:-1]]],
+        offsets=offsets,
+        columns=columns
+    )
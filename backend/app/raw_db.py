@@ -0,0 +1,285 @@
+"""
+Raw-driver read path for analytic queries, bypassing the Prisma engine.
+
+Prisma returns one model object per row, which the strategy code then
+unpacks field by field. For bulk reads of fixed-width columns this module
+runs `COPY (SELECT ...) TO STDOUT WITH (FORMAT binary)` through psycopg2 or
+asyncpg and decodes the stream straight into NumPy arrays. Prisma remains
+the default and is always used for CRUD endpoints.
+"""
+import asyncio
+import io
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.ingest import utc_naive
+from app.pagination import range_conditions
+
+try:
+    import psycopg2
+    from psycopg2.pool import ThreadedConnectionPool
+except ImportError:  # pragma: no cover - psycopg2 is optional for raw reads
+    psycopg2 = None
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - asyncpg is optional for raw reads
+    asyncpg = None
+
+# Driver for analytic reads: prisma (default), psycopg2, asyncpg or auto (asyncpg if installed, else psycopg2)
+RAW_READ_DRIVER = os.getenv("RAW_READ_DRIVER", "prisma")
+# Connections kept open by the raw read pool
+RAW_DB_POOL_SIZE = int(os.getenv("RAW_DB_POOL_SIZE", "4"))
+
+DRIVERS = ("prisma", "psycopg2", "asyncpg")
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+COPY_TRAILER = b"\xff\xff"
+# Binary timestamps count microseconds from 2000-01-01
+POSTGRES_EPOCH_US = 946_684_800_000_000
+# SQL comparison of each pagination.range_conditions operator
+SQL_OPERATORS = {"equals": "= %s", "in": "= ANY(%s)", "gte": ">= %s", "lte": "<= %s", "gt": "> %s"}
+# Big-endian wire type of each StockData column that can be read raw (all NOT NULL)
+COLUMN_TYPES = {
+    "datetime": ">i8",
+    "open": ">f8",
+    "high": ">f8",
+    "low": ">f8",
+    "close": ">f8",
+    "volume": ">i8",
+}
+
+
+def resolve_driver(driver: Optional[str] = None) -> str:
+    """Map a driver name (or "auto"/None) to the one that will be used."""
+    driver = driver or RAW_READ_DRIVER
+    if driver == "auto":
+        if asyncpg is not None:
+            return "asyncpg"
+        return "psycopg2" if psycopg2 is not None else "prisma"
+    if driver not in DRIVERS:
+        raise ValueError(f"Unknown raw read driver: {driver}")
+    if driver == "psycopg2" and psycopg2 is None:
+        raise ValueError("The psycopg2 raw read driver requires the psycopg2 package")
+    if driver == "asyncpg" and asyncpg is None:
+        raise ValueError("The asyncpg raw read driver requires the asyncpg package")
+    return driver
+
+
+def decode_copy(data: Any, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Decode binary COPY output of NOT NULL fixed-width columns into arrays
+
+    Every tuple then has the same size (field count, then length and value
+    per column), so the body is viewed as one packed structured array and
+    each column is byte-swapped in a single pass. Datetimes come back as
+    naive UTC datetime64[ns].
+    """
+    buffer = memoryview(data).cast("B")
+    if bytes(buffer[:len(COPY_SIGNATURE)]) != COPY_SIGNATURE:
+        raise ValueError("Not a binary COPY stream")
+    extension = int.from_bytes(buffer[15:19], "big")
+    body = buffer[19 + extension:]
+
+    fields = [("count", ">i2")]
+    for name in columns:
+        fields += [(f"{name}_length", ">i4"), (name, COLUMN_TYPES[name])]
+    dtype = np.dtype(fields)
+    rows, remainder = divmod(len(body) - len(COPY_TRAILER), dtype.itemsize)
+    if remainder or bytes(body[len(body) - len(COPY_TRAILER):]) != COPY_TRAILER:
+        raise ValueError("Binary COPY stream has variable-width or NULL fields")
+    records = np.frombuffer(body, dtype=dtype, count=rows)
+    if (records["count"] != len(columns)).any() or any(
+        (records[f"{name}_length"] != np.dtype(COLUMN_TYPES[name]).itemsize).any() for name in columns
+    ):
+        raise ValueError("Binary COPY stream has variable-width or NULL fields")
+
+    decoded = {}
+    for name in columns:
+        values = records[name].astype(COLUMN_TYPES[name].lstrip(">"))
+        if name == "datetime":
+            values = (values + POSTGRES_EPOCH_US).astype("datetime64[us]").astype("datetime64[ns]")
+        decoded[name] = values
+    return decoded
+
+
+def build_where(
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[datetime] = None,
+    instruments: Optional[Sequence[str]] = None
+) -> Tuple[str, List[Any]]:
+    """SQL WHERE clause (psycopg2 %s placeholders) and its arguments for pagination.range_conditions."""
+    filters = range_conditions(instrument, start, end, instruments)
+    if after:
+        filters.append(("datetime", "gt", after))
+    conditions: List[str] = []
+    args: List[Any] = []
+    for field, operator, value in filters:
+        conditions.append(f"{field} {SQL_OPERATORS[operator]}")
+        args.append(utc_naive(value) if isinstance(value, datetime) else value)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), args
+
+
+def numbered_placeholders(sql: str) -> str:
+    """Rewrite %s placeholders as asyncpg's $1, $2, ..."""
+    parts = sql.split("%s")
+    return parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+
+
+class RawReader:
+    """
+    Bulk column reads over a small connection pool of its own
+
+    Statements of one read run in a single read-only REPEATABLE READ
+    transaction, so a row count and the COPY that follows it see the same
+    snapshot.
+    """
+
+    def __init__(self, driver: Optional[str] = None, dsn: Optional[str] = None, pool_size: int = RAW_DB_POOL_SIZE):
+        self.driver = resolve_driver(driver)
+        self.dsn = dsn
+        self.pool_size = max(pool_size, 1)
+        self._pool: Any = None
+        self._pool_lock = asyncio.Lock()
+        self._thread_lock = threading.Lock()
+        # ThreadedConnectionPool raises instead of waiting when every connection is checked out
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self.reads = 0
+        self.rows = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.driver != "prisma"
+
+    def _dsn(self) -> Optional[str]:
+        if self.dsn is None:
+            from app.database import libpq_dsn
+            self.dsn = libpq_dsn()
+        return self.dsn
+
+    async def _asyncpg_pool(self):
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(self._dsn(), min_size=1, max_size=self.pool_size)
+        return self._pool
+
+    def _psycopg2_run(self, steps: List[Tuple[str, str, List[Any]]]) -> List[Any]:
+        with self._thread_lock:
+            if self._pool is None:
+                self._pool = ThreadedConnectionPool(1, self.pool_size, self._dsn())
+        with self._slots:
+            connection = self._pool.getconn()
+            try:
+                return self._psycopg2_steps(connection, steps)
+            finally:
+                self._pool.putconn(connection)
+
+    def _psycopg2_steps(self, connection: Any, steps: List[Tuple[str, str, List[Any]]]) -> List[Any]:
+        results = []
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+                for kind, sql, args in steps:
+                    if kind == "copy":
+                        output = io.BytesIO()
+                        cursor.copy_expert(cursor.mogrify(sql, args).decode("utf-8"), output)
+                        results.append(output.getbuffer())
+                    else:
+                        cursor.execute(sql, args)
+                        results.append(cursor.fetchall())
+        finally:
+            # Read-only: end the transaction without committing anything
+            connection.rollback()
+        return results
+
+    async def _asyncpg_run(self, steps: List[Tuple[str, str, List[Any]]]) -> List[Any]:
+        pool = await self._asyncpg_pool()
+        results = []
+        async with pool.acquire() as connection:
+            async with connection.transaction(isolation="repeatable_read", readonly=True):
+                for kind, sql, args in steps:
+                    sql = numbered_placeholders(sql)
+                    if kind == "copy":
+                        chunks: List[bytes] = []
+
+                        async def sink(chunk: bytes) -> None:
+                            chunks.append(chunk)
+
+                        await connection.copy_from_query(sql, *args, output=sink, format="binary")
+                        results.append(b"".join(chunks))
+                    else:
+                        results.append([tuple(record) for record in await connection.fetch(sql, *args)])
+        return results
+
+    async def _run(self, steps: List[Tuple[str, str, List[Any]]]) -> List[Any]:
+        if self.driver == "psycopg2":
+            return await asyncio.to_thread(self._psycopg2_run, steps)
+        if self.driver == "asyncpg":
+            return await self._asyncpg_run(steps)
+        raise RuntimeError("Raw reads are disabled (RAW_READ_DRIVER=prisma)")
+
+    def _copy_sql(self, columns: Sequence[str], where: str, order: str) -> str:
+        selected = ", ".join(f'"{name}"' for name in columns)
+        return f'COPY (SELECT {selected} FROM "StockData"{where} ORDER BY {order}) TO STDOUT WITH (FORMAT binary)'
+
+    async def fetch_columns(
+        self,
+        columns: Sequence[str],
+        instrument: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        after: Optional[datetime] = None
+    ) -> Dict[str, np.ndarray]:
+        """Read columns of one instrument (or all rows, in datetime order) into arrays."""
+        where, args = build_where(instrument, start, end, after)
+        order = "instrument, datetime" if instrument else "datetime"
+        [data] = await self._run([("copy", self._copy_sql(columns, where, order), args)])
+        decoded = decode_copy(data, columns)
+        self.reads += 1
+        self.rows += len(decoded[columns[0]])
+        return decoded
+
+    async def fetch_grouped(
+        self,
+        columns: Sequence[str],
+        instruments: Optional[Sequence[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Read columns of several instruments in (instrument, datetime) order
+
+        Returns the instruments, offsets such that instrument i owns rows
+        offsets[i]:offsets[i + 1], and the decoded columns. Instrument names
+        come from a GROUP BY count, so no text column is copied per row.
+        """
+        where, args = build_where(start=start, end=end, instruments=instruments)
+        counts, data = await self._run([
+            ("fetch", f'SELECT instrument, count(*) FROM "StockData"{where} GROUP BY instrument ORDER BY instrument', args),
+            ("copy", self._copy_sql(columns, where, "instrument, datetime"), args),
+        ])
+        decoded = decode_copy(data, columns)
+        offsets = np.concatenate(([0], np.cumsum([count for _, count in counts], dtype=np.int64)))
+        self.reads += 1
+        self.rows += int(offsets[-1])
+        return [name for name, _ in counts], offsets.astype(np.int64), decoded
+
+    def stats(self) -> Dict[str, Any]:
+        return {"driver": self.driver, "reads": self.reads, "rows": self.rows}
+
+    async def close(self) -> None:
+        if self._pool is None:
+            return
+        if self.driver == "asyncpg":
+            await self._pool.close()
+        else:
+            self._pool.closeall()
+        self._pool = None
+
+
+raw_reader = RawReader()
@@ -0,0 +1,156 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bucket width of each interval in seconds; weeks start on Monday like Postgres date_trunc('week')
+INTERVALS = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "4h": 14400,
+    "1d": 86400,
+    "1w": 7 * 86400,
+}
+NS = 1_000_000_000
+# 1970-01-01 was a Thursday (weekday 3), so Monday-based weeks are offset by 3 days from the epoch
+WEEK_OFFSET_NS = 3 * 86400 * NS
+
+def bucket_starts(datetimes: np.ndarray, interval: str) -> np.ndarray:
+    """Start of the (UTC) interval each datetime64[ns] timestamp falls in."""
+    width = INTERVALS[interval] * NS
+    stamps = datetimes.astype("datetime64[ns]").view(np.int64)
+    if interval == "1w":
+        return ((stamps + WEEK_OFFSET_NS) // width * width - WEEK_OFFSET_NS).view("datetime64[ns]")
+    return (stamps // width * width).view("datetime64[ns]")
+
+def resample_ohlcv(
+    offsets: np.ndarray,
+    columns: Dict[str, np.ndarray],
+    interval: str
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Aggregate bars into interval bars, per instrument
+
+    Rows of instrument i are columns[...][offsets[i]:offsets[i + 1]] in time
+    order. A bar starts wherever the bucket or the instrument changes; open
+    and close are the first and last value of the bar, high/low/volume are
+    reduced with np.maximum/np.minimum/np.add.reduceat.
+
+    Returns:
+        The instrument index of each output bar and the aggregated columns
+        (datetime is the bucket start)
+    """
+    buckets = bucket_starts(columns["datetime"], interval)
+    n = len(buckets)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), {name: values[:0] for name, values in columns.items()}
+
+    boundary = np.zeros(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = buckets[1:] != buckets[:-1]
+    boundary[offsets[1:-1]] = True
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], n) - 1
+
+    instrument_index = np.searchsorted(offsets, starts, side="right") - 1
+    return instrument_index, {
+        "datetime": buckets[starts],
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends],
+        "volume": np.add.reduceat(columns["volume"], starts),
+    }
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Keeps the first and last point and, from each of points - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket. Triangle areas
+    are computed for a whole bucket at once.
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    n = len(y)
+    if points < 3:
+        raise ValueError("LTTB needs at least 3 points")
+    if points >= n:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        next_y = y[hi:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def minmax_decimate(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Keep the minimum and maximum of each of points // 2 equal buckets
+
+    Preserves spikes that averaging or LTTB can smooth away. Buckets are
+    assigned by position and sorted by (bucket, value) in one lexsort, so
+    the first and last element of each bucket are its min and max.
+
+    Returns:
+        Sorted, unique indices of the kept points
+    """
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.diff(bucket[order], prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate((order[starts], order[ends])))
+
+def source_interval(target: str, available: Sequence[str]) -> Optional[str]:
+    """
+    Coarsest available interval whose buckets nest exactly in `target` buckets
+
+    Every interval up to a day divides a day and weeks start at midnight, so
+    nesting reduces to the target width being a multiple of the source width.
+    """
+    candidates = [interval for interval in available if INTERVALS[target] % INTERVALS[interval] == 0]
+    return max(candidates, key=INTERVALS.get) if candidates else None
+
+def bucket_bounds(
+    start: Optional[np.datetime64],
+    end: Optional[np.datetime64],
+    interval: str,
+    resolution: np.timedelta64 = np.timedelta64(1, "ms")
+) -> Tuple[Optional[np.datetime64], Optional[np.datetime64]]:
+    """
+    Range of bucket starts [lo, hi) whose buckets lie entirely inside [start, end]
+
+    lo is the first bucket starting at or after start, hi the bucket holding
+    the instant after end (timestamps are stored with `resolution`), so the
+    partial buckets at either edge are left out. None leaves a side open.
+    """
+    lo = hi = None
+    if start is not None:
+        lo = bucket_starts(np.array([start], dtype="datetime64[ns]"), interval)[0]
+        if lo < start:
+            lo = lo + np.timedelta64(INTERVALS[interval], "s")
+    if end is not None:
+        hi = bucket_starts(np.array([end + resolution], dtype="datetime64[ns]"), interval)[0]
+    return lo, hi
@@ -0,0 +1,305 @@
+"""
+Materialized OHLCV rollups of StockData per instrument and interval.
+
+StockRollup holds one row per (instrument, interval, bucket start). Rows
+added through the API recompute only the buckets they touch, with one
+INSERT ... SELECT ... ON CONFLICT DO UPDATE per interval, and reads of a
+coarse interval are answered from the coarsest rollup whose buckets nest in
+it: interior buckets come from the rollup, the partial buckets at the edges
+of a date range from raw rows, so a long range never scans the raw table.
+
+Rebuild the rollups after loading rows outside the API (from backend/):
+    python -m app.rollups                     # every instrument
+    python -m app.rollups --instrument HINDALCO
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from prisma import Prisma
+
+from app.bar_cache import load_bar_arrays
+from app.prices import BAR_COLUMNS, BarArrays, PriceSeries, utc_datetime64
+from app.resample import INTERVALS, bucket_bounds, bucket_starts, resample_ohlcv, source_interval
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated intervals kept as rollups (empty disables them)
+ROLLUP_INTERVALS = [interval.strip() for interval in os.getenv("ROLLUP_INTERVALS", "1h,1d,1w").split(",") if interval.strip()]
+
+# Bucket expression per interval; date_trunc where Postgres has a matching unit
+TRUNC_UNITS = {"1h": "hour", "1d": "day", "1w": "week"}
+
+
+def bucket_sql(interval: str) -> str:
+    if interval in TRUNC_UNITS:
+        return f"date_trunc('{TRUNC_UNITS[interval]}', \"datetime\")"
+    width = INTERVALS[interval]
+    return f"to_timestamp(floor(extract(epoch FROM \"datetime\") / {width}) * {width}) AT TIME ZONE 'UTC'"
+
+
+def refresh_sql(interval: str, bounded: bool) -> str:
+    """Upsert the rollup rows of one instrument's buckets (those in [$3, $4) when bounded)."""
+    window = ' AND "datetime" >= $3::timestamp AND "datetime" < $4::timestamp' if bounded else ""
+    return f"""
+        INSERT INTO "StockRollup" ("instrument", "interval", "datetime", "open", "high", "low", "close", "volume", "bars")
+        SELECT "instrument", $2, {bucket_sql(interval)} AS bucket,
+               (array_agg("open" ORDER BY "datetime"))[1], max("high"), min("low"),
+               (array_agg("close" ORDER BY "datetime" DESC))[1], sum("volume")::bigint, count(*)::int
+        FROM "StockData"
+        WHERE "instrument" = $1{window}
+        GROUP BY "instrument", bucket
+        ON CONFLICT ("instrument", "interval", "datetime") DO UPDATE SET
+            "open" = EXCLUDED."open", "high" = EXCLUDED."high", "low" = EXCLUDED."low",
+            "close" = EXCLUDED."close", "volume" = EXCLUDED."volume", "bars" = EXCLUDED."bars"
+    """
+
+
+def _to_datetime(value: np.datetime64) -> datetime:
+    return pd.Timestamp(value).tz_localize("UTC").to_pydatetime()
+
+
+def _sql_timestamp(value: np.datetime64) -> str:
+    # Raw query arguments travel as JSON, so timestamps are passed as text and cast in SQL
+    return str(np.datetime_as_string(value, unit="ms"))
+
+
+def resample_bars(bars: BarArrays, interval: str) -> BarArrays:
+    """Aggregate BarArrays (raw bars or finer rollups) to `interval`."""
+    instrument_index, columns = resample_ohlcv(bars.offsets, bars.columns, interval)
+    counts = np.bincount(instrument_index, minlength=len(bars.instruments))
+    present = np.flatnonzero(counts)
+    return BarArrays(
+        instruments=[bars.instruments[i] for i in present],
+        offsets=np.concatenate(([0], np.cumsum(counts[present]))).astype(np.int64),
+        columns=columns
+    )
+
+
+def concat_bars(instrument: str, parts: List[BarArrays]) -> BarArrays:
+    """Concatenate consecutive pieces of one instrument's bars."""
+    columns = {
+        name: np.concatenate([part.columns[name] for part in parts])
+        for name in ("datetime",) + BAR_COLUMNS
+    }
+    rows = len(columns["datetime"])
+    return BarArrays(
+        instruments=[instrument] if rows else [],
+        offsets=np.array([0, rows] if rows else [0], dtype=np.int64),
+        columns=columns
+    )
+
+
+class RollupStore:
+    """
+    Maintains and reads StockRollup rows
+
+    An instrument's rollups are built in full the first time they are
+    needed (or by the rebuild command) and then kept current by refresh(),
+    which API ingestion calls with the datetime range of committed rows.
+    Rollups of an instrument that has none yet are not refreshed piecemeal,
+    so existing rows always mean a complete rollup.
+    """
+
+    def __init__(self, intervals: List[str] = ROLLUP_INTERVALS):
+        unknown = [interval for interval in intervals if interval not in INTERVALS]
+        if unknown:
+            raise ValueError(f"Unknown rollup intervals: {', '.join(unknown)}")
+        self.intervals = sorted(intervals, key=INTERVALS.get)
+        # Instruments known to have complete rollups in this process
+        self.ready: Set[str] = set()
+        # Instruments whose last refresh failed; rebuilt before their next read
+        self.dirty: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.failures = 0
+        self.reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.intervals)
+
+    def source_for(self, interval: str) -> Optional[str]:
+        return source_interval(interval, self.intervals) if self.enabled else None
+
+    async def rebuild(self, prisma: Prisma, instrument: str) -> None:
+        """Recompute every rollup row of an instrument from its raw bars (an upsert, so reads stay valid meanwhile)."""
+        for interval in self.intervals:
+            await prisma.execute_raw(refresh_sql(interval, bounded=False), instrument, interval)
+        self.rebuilds += 1
+        self.dirty.discard(instrument)
+        self.ready.add(instrument)
+
+    async def ensure(self, prisma: Prisma, instrument: str, build: bool = True) -> bool:
+        """Make sure an instrument's rollups are complete; returns whether they can be used."""
+        if instrument in self.ready and instrument not in self.dirty:
+            return True
+        async with self._locks.setdefault(instrument, asyncio.Lock()):
+            if instrument in self.dirty:
+                if not build:
+                    return False
+                await self.rebuild(prisma, instrument)
+            elif instrument not in self.ready:
+                existing = await prisma.stockrollup.find_first(where={"instrument": instrument})
+                if existing is not None:
+                    self.ready.add(instrument)
+                elif build:
+                    await self.rebuild(prisma, instrument)
+        return instrument in self.ready and instrument not in self.dirty
+
+    def invalidate(self, instrument: str) -> None:
+        """Rebuild an instrument's rollups before their next read, after rows changed without a refresh."""
+        self.dirty.add(instrument)
+
+    async def refresh(self, prisma: Prisma, instrument: str, first: datetime, last: datetime) -> None:
+        """Recompute the rollup buckets holding [first, last] after rows in that range changed."""
+        if not self.enabled:
+            return
+        try:
+            if not await self.ensure(prisma, instrument, build=False):
+                return
+            stamps = utc_datetime64([first, last])
+            for interval in self.intervals:
+                lo, hi = bucket_starts(stamps, interval)
+                hi = hi + np.timedelta64(INTERVALS[interval], "s")
+                await prisma.execute_raw(
+                    refresh_sql(interval, bounded=True), instrument, interval,
+                    _sql_timestamp(lo), _sql_timestamp(hi)
+                )
+            self.refreshes += 1
+        except Exception:
+            # The rows are already committed: serve raw reads and rebuild on the next rollup read
+            logger.exception("Rollup refresh failed for %s", instrument)
+            self.failures += 1
+            self.dirty.add(instrument)
+
+    async def fetch(
+        self,
+        prisma: Prisma,
+        instrument: str,
+        interval: str,
+        lo: Optional[np.datetime64] = None,
+        hi: Optional[np.datetime64] = None
+    ) -> BarArrays:
+        """Rollup bars of an instrument with bucket starts in [lo, hi)."""
+        where: Dict[str, Any] = {"instrument": instrument, "interval": interval}
+        window = {}
+        if lo is not None:
+            window["gte"] = _to_datetime(lo)
+        if hi is not None:
+            window["lt"] = _to_datetime(hi)
+        if window:
+            where["datetime"] = window
+        rows = await prisma.stockrollup.find_many(where=where, order={"datetime": "asc"})
+        columns = {"datetime": utc_datetime64([row.datetime for row in rows])}
+        for name in BAR_COLUMNS:
+            dtype = np.int64 if name == "volume" else np.float64
+            columns[name] = np.fromiter((getattr(row, name) for row in rows), dtype=dtype, count=len(rows))
+        self.reads += 1
+        return BarArrays(
+            instruments=[instrument] if rows else [],
+            offsets=np.array([0, len(rows)] if rows else [0], dtype=np.int64),
+            columns=columns
+        )
+
+    async def bars(
+        self,
+        prisma: Prisma,
+        instrument: str,
+        interval: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> BarArrays:
+        """
+        One instrument's `interval` bars over [start, end], identical to resampling its raw rows
+
+        Reads the coarsest rollup that nests in `interval` for the buckets
+        entirely inside the range and raw rows for the partial buckets at
+        its edges, then aggregates the pieces to `interval`.
+        """
+        source = self.source_for(interval)
+        if source is None or not await self.ensure(prisma, instrument):
+            raw = await load_bar_arrays(prisma, instrument, start, end)
+            return await asyncio.to_thread(resample_bars, raw, interval)
+
+        start64 = utc_datetime64([start])[0] if start is not None else None
+        end64 = utc_datetime64([end])[0] if end is not None else None
+        lo, hi = bucket_bounds(start64, end64, source)
+        if lo is not None and hi is not None and lo >= hi:
+            # The whole range falls inside one source bucket
+            return resample_bars(await load_bar_arrays(prisma, instrument, start, end), interval)
+
+        one_ms = np.timedelta64(1, "ms")
+        parts = []
+        if start64 is not None and start64 < lo:
+            edge = await load_bar_arrays(prisma, instrument, start, _to_datetime(lo - one_ms))
+            parts.append(resample_bars(edge, source))
+        parts.append(await self.fetch(prisma, instrument, source, lo, hi))
+        if end64 is not None and hi <= end64:
+            edge = await load_bar_arrays(prisma, instrument, _to_datetime(hi), end)
+            parts.append(resample_bars(edge, source))
+
+        combined = concat_bars(instrument, parts)
+        return combined if source == interval else resample_bars(combined, interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "intervals": self.intervals,
+            "ready_instruments": len(self.ready),
+            "dirty_instruments": len(self.dirty),
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "failures": self.failures,
+            "reads": self.reads,
+        }
+
+
+rollup_store = RollupStore()
+
+
+async def load_interval_series(
+    prisma: Prisma,
+    instrument: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> PriceSeries:
+    """Close prices of an instrument's `interval` bars (dated by bucket start) for the strategy engine."""
+    bars = await rollup_store.bars(prisma, instrument, interval, start, end)
+    return PriceSeries(
+        datetimes=pd.DatetimeIndex(bars.columns["datetime"]).tz_localize("UTC"),
+        close=bars.columns["close"]
+    )
+
+
+async def rebuild(instruments: Optional[List[str]] = None) -> None:
+    from app.database import get_prisma_client
+
+    async with get_prisma_client() as prisma:
+        if not instruments:
+            rows = await prisma.stockdata.find_many(distinct=["instrument"], order={"instrument": "asc"})
+            instruments = [row.instrument for row in rows]
+        for instrument in instruments:
+            start = time.perf_counter()
+            await rollup_store.rebuild(prisma, instrument)
+            print(f"{instrument}: {', '.join(rollup_store.intervals)} rebuilt in {time.perf_counter() - start:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instrument", action="append", help="Instrument to rebuild (repeatable, default: all)")
+    args = parser.parse_args()
+    if not rollup_store.enabled:
+        raise SystemExit("No rollup intervals configured (ROLLUP_INTERVALS)")
+    asyncio.run(rebuild(args.instrument))
+
+
+if __name__ == "__main__":
+    main()
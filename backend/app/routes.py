@@ -1,35 +1,302 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from prisma import Prisma
-from app.database import get_prisma
-from app.schemas import StockDataCreate, StockData, MovingAverageParams
-from app.strategy import calculate_ma_strategy
-from typing import List
+from app.database import get_prisma, get_pool_metrics
+from app.schemas import StockDataCreate, StockData, MovingAverageParams, StrategyRequest, TradeSelection, PoolHealth, SweepParams, SweepResult, WalkForwardParams, WalkForwardResult, DataQueryParams, ResampleParams, ResampledBar, ChartParams, ChartSeries, IndicatorParams, IndicatorSeries, BulkIngestResult, CacheStats, BarCacheStats, RollupStats, StreamSubscription, StreamCommand, StreamStats, PortfolioParams, PortfolioResult, ExecutorStats, JobCreate, JobStatus
+from app.pagination import (
+    DATA_PAGE_SIZE, decode_cursor, encode_cursor, fetch_page, iter_pages,
+    stock_to_dict, empty_columns, extend_columns
+)
+from app.ingest import IngestError, DEFAULT_BATCH_SIZE, detect_format, iter_records, iter_batches, make_writer, ingest, staging_pool
+from app.strategy import run_ma_backtest, select_trades
+from app.prices import BarArrays, PriceSeries, fetch_instrument_arrays, utc_datetime64
+from app.bar_cache import bar_cache, load_bar_arrays, load_price_arrays
+from app.resample import lttb, minmax_decimate
+from app.indicators import compute_indicators, parse_spec
+from app.engine import compile_spec, require_single_series, resolve_strategy, run_strategy, spec_json
+from app.rollups import load_interval_series, resample_bars, rollup_store
+from app.cache import cache_key, data_versions, strategy_cache
+from app.incremental import MAStrategyState, incremental_engine
+from app.streaming import stream_hub
+from app.serialization import ORJSONResponse, dumps, trusted_response
+from app.metrics import CONTENT_TYPE, render_metrics, render_stats
+from app.executor import ExecutorSaturated, parallel_pool, strategy_executor
+from app.sweep import run_ma_sweep
+from app.walkforward import run_walk_forward
+from app.portfolio import run_portfolio_backtest
+from app.jobs import job_runner
+from pydantic import ValidationError
+from typing import List, Optional
 from datetime import datetime
+import asyncio
+import functools
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def load_price_series(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Optional[str] = None
+) -> PriceSeries:
+    """Load a close-price series for the strategy endpoints (optionally of `interval` bars), 404 if it is empty."""
+    if interval is None:
+        series = await load_price_arrays(prisma, instrument, start, end)
+    elif instrument:
+        series = await load_interval_series(prisma, instrument, interval, start, end)
+    else:
+        raise HTTPException(status_code=400, detail="interval requires an instrument")
+    
+    if len(series.close) == 0:
+        raise HTTPException(
+            status_code=404,
+            detail="No stock data found"
+        )
+    return series
+
+async def load_bars(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Optional[str] = None
+) -> BarArrays:
+    """Load OHLCV bars (optionally of `interval`, from rollups) for indicators and strategy specs, 404 if empty."""
+    if interval is None:
+        bars = await load_bar_arrays(prisma, instrument, start, end)
+    elif instrument:
+        bars = await rollup_store.bars(prisma, instrument, interval, start, end)
+    else:
+        raise HTTPException(status_code=400, detail="interval requires an instrument")
+    
+    if not bars.instruments:
+        raise HTTPException(
+            status_code=404,
+            detail="No stock data found"
+        )
+    return bars
+
+async def load_strategy_bars(
+    prisma: Prisma,
+    instrument: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval: Optional[str] = None
+) -> BarArrays:
+    """Bars of one series for a strategy spec: 400 if no instrument is given and several are stored."""
+    bars = await load_bars(prisma, instrument, start, end, interval)
+    try:
+        require_single_series(bars.instruments)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return bars
+
+async def run_strategy_job(fn, *args):
+    """Run a strategy computation on the bounded executor: 429 when saturated, 504 on timeout."""
+    try:
+        return await strategy_executor.run(fn, *args)
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Strategy computation exceeded {strategy_executor.timeout:g}s"
+        )
+
+def drop_cached_state(instrument: str) -> None:
+    """Forget everything derived from an instrument's rows, so the next reads rebuild it from the database."""
+    bar_cache.delete(instrument)
+    rollup_store.invalidate(instrument)
+    incremental_engine.invalidate(instrument)
+    # Results are keyed by data version, which may not have been bumped
+    strategy_cache.clear()
+
+async def on_rows_committed(prisma: Prisma, rows: List[StockDataCreate], inserted: int) -> None:
+    """
+    Refresh caches and rollups, bump data versions, fold the new bars into incremental strategy state and stream them.
+
+    The rows are already committed, so a failure here never fails the
+    write: it is logged and the instrument's cached state is dropped.
+    """
+    by_instrument = {}
+    for row in rows:
+        by_instrument.setdefault(row.instrument, []).append(row)
+    for instrument, instrument_rows in by_instrument.items():
+        try:
+            instrument_bars = [(row.datetime, row.close) for row in instrument_rows]
+            stamps = utc_datetime64([timestamp for timestamp, _ in instrument_bars])
+            first, last = (pd.Timestamp(value).tz_localize("UTC").to_pydatetime() for value in (stamps.min(), stamps.max()))
+            bar_cache.invalidate(instrument, first)
+            await rollup_store.refresh(prisma, instrument, first, last)
+            version = await data_versions.bump(instrument)
+            incremental_engine.on_bars(instrument, instrument_bars, version, complete=inserted == len(rows))
+            stream_hub.publish(instrument, instrument_rows, version, complete=inserted == len(rows))
+        except Exception:
+            logger.exception("Post-commit refresh failed for %s", instrument)
+            try:
+                drop_cached_state(instrument)
+            except Exception:
+                logger.exception("Could not drop cached state of %s", instrument)
+
+@router.get("/health/db", response_model=PoolHealth)
+async def get_db_health():
+    """Report connection pool health and saturation for the shared client."""
+    return await get_pool_metrics()
+
+@router.get("/health/executor", response_model=ExecutorStats)
+async def get_executor_health():
+    """Report strategy executor load, rejections, timeouts and queue wait vs compute time."""
+    return strategy_executor.stats()
+
+@router.get("/cache/stats", response_model=CacheStats)
+async def get_cache_stats():
+    """Report strategy result cache hits, misses, evictions and size."""
+    return strategy_cache.stats()
+
+@router.get("/cache/bars", response_model=BarCacheStats)
+async def get_bar_cache_stats():
+    """Report on-disk bar cache hits, incremental refreshes and invalidations."""
+    return bar_cache.stats()
+
+@router.get("/cache/rollups", response_model=RollupStats)
+async def get_rollup_stats():
+    """Report rollup intervals, refreshes on ingest, rebuilds and reads."""
+    return rollup_store.stats()
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics():
+    """
+    Prometheus metrics: request latency per route, hot-path stage timings,
+    DB pool, strategy executor, result cache, COPY staging pool and
+    shared process pool statistics.
+    """
+    pool = await get_pool_metrics()
+    engine = {key.replace(".", "_"): value for key, value in pool.pop("engine").items()}
+    executor = strategy_executor.stats()
+    return Response(
+        render_metrics(
+            render_stats("db_pool", pool, counters=("checkouts", "saturated_checkouts", "connects")),
+            render_stats("db_engine", engine),
+            render_stats(
+                "strategy_executor", executor,
+                counters=("submitted", "completed", "failed", "rejected", "timed_out")
+            ),
+            render_stats(
+                "strategy_cache", strategy_cache.stats(),
+                counters=("hits", "misses", "shared_hits", "evictions", "expirations")
+            ),
+            render_stats("ingest_staging", staging_pool.stats(), counters=("acquired", "waited", "connects")),
+            render_stats("parallel_pool", parallel_pool.stats(), counters=("submitted", "restarts"))
+        ),
+        media_type=CONTENT_TYPE
+    )
+
+@router.get("/stream/stats", response_model=StreamStats)
+async def get_stream_stats():
+    """Report live stream subscribers and topics, coalesced updates and bars dropped for slow consumers."""
+    return stream_hub.stats()
+
 @router.get("/data", response_model=List[StockData])
-async def get_stock_data(prisma: Prisma = Depends(get_prisma)):
-    """Fetch all stock data records from the database."""
+async def get_stock_data(
+    params: DataQueryParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Fetch stock data records in (instrument, datetime) order.
+    
+    Query parameters:
+    - instrument: Filter by instrument (optional)
+    - start / end: Inclusive datetime range (optional)
+    - limit: Page size; the next page's cursor is returned in the
+      X-Next-Cursor header (omit to stream every matching row)
+    - cursor: Resume after the row a previous page ended on
+    - format: json (array of rows), ndjson (one row per line) or
+      columnar (one array per field, requires limit)
+    """
     try:
-        stocks = await prisma.stockdata.find_many()
-        return stocks
+        after = decode_cursor(params.cursor) if params.cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Every field array must be complete before the next one starts, so a columnar body cannot be streamed
+    if params.format == "columnar" and params.limit is None:
+        raise HTTPException(
+            status_code=400,
+            detail="format=columnar requires a limit; page through the rows with next_cursor"
+        )
+    filters = dict(instrument=params.instrument, start=params.start, end=params.end, after=after)
+    
+    try:
+        if params.limit is not None:
+            rows = await fetch_page(prisma, params.limit + 1, **filters)
+            next_cursor = None
+            if len(rows) > params.limit:
+                rows = rows[:params.limit]
+                next_cursor = encode_cursor(rows[-1].instrument, rows[-1].datetime)
+            headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+            
+            if params.format == "columnar":
+                body = extend_columns(empty_columns(), rows)
+                body["next_cursor"] = next_cursor
+                return ORJSONResponse(body, headers=headers)
+            if params.format == "ndjson":
+                content = b"".join(dumps(stock_to_dict(row)) + b"\n" for row in rows)
+                return Response(content, media_type="application/x-ndjson", headers=headers)
+            return ORJSONResponse([stock_to_dict(row) for row in rows], headers=headers)
+        
+        # Unbounded reads are streamed page by page so memory stays flat
+        first_page = await fetch_page(prisma, DATA_PAGE_SIZE, **filters)
+        if params.format == "ndjson":
+            return StreamingResponse(
+                _stream_ndjson(prisma, first_page, filters),
+                media_type="application/x-ndjson"
+            )
+        return StreamingResponse(
+            _stream_json_array(prisma, first_page, filters),
+            media_type="application/json"
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+async def _remaining_pages(prisma: Prisma, first_page: list, filters: dict):
+    yield first_page
+    if len(first_page) == DATA_PAGE_SIZE:
+        last = first_page[-1]
+        async for page in iter_pages(prisma, **{**filters, "after": (last.instrument, last.datetime)}):
+            yield page
+
+async def _stream_ndjson(prisma: Prisma, first_page: list, filters: dict):
+    async for page in _remaining_pages(prisma, first_page, filters):
+        yield b"".join(dumps(stock_to_dict(row)) + b"\n" for row in page)
+
+async def _stream_json_array(prisma: Prisma, first_page: list, filters: dict):
+    separator = b"["
+    async for page in _remaining_pages(prisma, first_page, filters):
+        if page:
+            yield separator + b",".join(dumps(stock_to_dict(row)) for row in page)
+            separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
 @router.post("/data", response_model=StockData)
 async def create_stock_data(data: StockDataCreate, prisma: Prisma = Depends(get_prisma)):
     """Add a new stock data record to the database."""
     try:
-        # Check if record with this datetime already exists
+        # Check if this instrument already has a record at this datetime
         existing = await prisma.stockdata.find_unique(
-            where={"datetime": data.datetime}
+            where={"instrument_datetime": {"instrument": data.instrument, "datetime": data.datetime}}
         )
         
         if existing:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Record with datetime {data.datetime} already exists"
+                detail=f"Record for {data.instrument} with datetime {data.datetime} already exists"
             )
         
         # Create new record
@@ -44,11 +311,184 @@ async def create_stock_data(data: StockDataCreate, prisma: Prisma = Depends(get_
                 "instrument": data.instrument
             }
         )
-        return new_record
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    # The row is committed: refresh failures are logged by the hook, never reported as a failed write
+    await on_rows_committed(prisma, [data], 1)
+    return new_record
+
+@router.post("/data/bulk", response_model=BulkIngestResult)
+async def create_stock_data_bulk(
+    request: Request,
+    batch_size: int = Query(default=DEFAULT_BATCH_SIZE, gt=0, le=100000),
+    method: str = Query(default="copy", pattern="^(copy|insert)$"),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Load many stock data records in one request.
+    
+    The body is a JSON array (application/json), one record per line
+    (application/x-ndjson) or CSV with a header row (text/csv). Records are
+    validated and written in batches; rows whose key already exists are
+    skipped. Returns inserted/skipped counts per batch.
+    
+    Query parameters:
+    - batch_size: Rows per write (default: 5000)
+    - method: copy (COPY into a staging table, then upsert) or insert
+      (multi-row INSERT through Prisma)
+    """
+    try:
+        body_format = detect_format(request.headers.get("content-type"))
+        batches = iter_batches(iter_records(request.stream(), body_format), batch_size)
+        return await ingest(batches, make_writer(method, prisma), on_commit=functools.partial(on_rows_committed, prisma))
+    except IngestError as e:
+        detail = str(e)
+        if e.inserted:
+            detail += f" ({e.inserted} rows from earlier batches were committed)"
+        raise HTTPException(status_code=422, detail=detail)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def _isoformat(datetimes) -> List[str]:
+    # Same representation as stock_to_dict: UTC with an explicit offset
+    return [timestamp.isoformat() for timestamp in pd.DatetimeIndex(datetimes).tz_localize("UTC")]
+
+def _utc_index(datetimes) -> pd.DatetimeIndex:
+    # Bar arrays hold naive UTC; strategy trades are dated like PriceSeries (tz-aware UTC)
+    return pd.DatetimeIndex(datetimes).tz_localize("UTC")
+
+@router.get("/data/resample", response_model=List[ResampledBar])
+async def get_resampled_data(
+    params: ResampleParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Aggregate bars into OHLCV bars of a coarser interval, per instrument.
+    
+    Buckets are aligned to UTC like Postgres date_trunc (weeks start on
+    Monday): open/close are the first/last price in the bucket, high/low
+    the extremes and volume the sum. For one instrument the bars come from
+    the coarsest maintained rollup that nests in the interval.
+    
+    Query parameters:
+    - interval: 1m, 5m, 15m, 30m, 1h, 4h, 1d (default) or 1w
+    - instrument: Filter by instrument (optional)
+    - start / end: Inclusive datetime range (optional)
+    - format: json (array of bars) or columnar (one array per field)
+    """
+    try:
+        if params.instrument and rollup_store.source_for(params.interval):
+            bars = await rollup_store.bars(prisma, params.instrument, params.interval, params.start, params.end)
+        else:
+            raw = await load_bar_arrays(prisma, params.instrument, params.start, params.end)
+            bars = await run_strategy_job(resample_bars, raw, params.interval)
+        
+        columns = bars.columns
+        body = {
+            "instrument": np.repeat(bars.instruments, np.diff(bars.offsets)).tolist(),
+            "datetime": _isoformat(columns["datetime"]),
+            **{name: columns[name].tolist() for name in ("open", "high", "low", "close", "volume")},
+        }
+        if params.format == "columnar":
+            return ORJSONResponse(body)
+        return ORJSONResponse([dict(zip(body, row)) for row in zip(*body.values())])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error resampling data: {str(e)}")
+
+@router.get("/data/chart", response_model=ChartSeries)
+async def get_chart_data(
+    params: ChartParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Close prices of an instrument decimated to at most `points` points for plotting.
+    
+    Query parameters:
+    - instrument: Instrument to plot
+    - points: Target point count (default: 1000)
+    - method: lttb (Largest-Triangle-Three-Buckets, keeps the visual shape)
+      or minmax (minimum and maximum of each bucket, keeps every spike)
+    - start / end: Inclusive datetime range (optional)
+    """
+    try:
+        series = await load_price_series(prisma, params.instrument, params.start, params.end)
+        stamps = series.datetimes.asi8
+        if params.method == "lttb":
+            keep = await run_strategy_job(lttb, stamps, series.close, params.points)
+        else:
+            keep = await run_strategy_job(minmax_decimate, series.close, params.points)
+        
+        return ORJSONResponse({
+            "instrument": params.instrument,
+            "method": params.method,
+            "source_points": len(series.close),
+            "datetime": [timestamp.isoformat() for timestamp in series.datetimes[keep]],
+            "close": series.close[keep].tolist(),
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error decimating data: {str(e)}")
+
+def _nullable(values: np.ndarray) -> list:
+    return np.where(np.isnan(values), None, values).tolist()
+
+@router.get("/indicators", response_model=IndicatorSeries)
+async def get_indicators(
+    params: IndicatorParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Compute several technical indicators of an instrument over one data load.
+    
+    Indicators share their intermediates (prefix sums, true range, EMAs of
+    the same span), so e.g. sma:20 with bollinger:20, or ema:12 with macd,
+    cost little more than one of them.
+    
+    Query parameters:
+    - instrument: Instrument to analyse
+    - indicators: Comma-separated specs name[:arg...] (default: sma:20,ema:20,rsi:14):
+      sma:window, ema:span, wma:window, rsi:period, macd:fast:slow:signal,
+      bollinger:window:num_std, atr:period
+    - start / end: Inclusive datetime range (optional)
+    - interval: Compute on bars of this interval, served from rollups (optional)
+    """
+    try:
+        specs = [parse_spec(spec) for spec in params.spec_list()]
+        if not specs:
+            raise ValueError("No indicators requested")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        bars = await load_bars(prisma, params.instrument, params.start, params.end, params.interval)
+        columns = bars.columns
+        results = await run_strategy_job(compute_indicators, specs, columns["close"], columns["high"], columns["low"])
+        return ORJSONResponse({
+            "instrument": params.instrument,
+            "interval": params.interval,
+            "datetime": _isoformat(columns["datetime"]),
+            "close": columns["close"].tolist(),
+            "indicators": {
+                key: {name: _nullable(values) for name, values in outputs.items()}
+                for key, outputs in results.items()
+            },
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating indicators: {str(e)}")
+
+def _select_trades(performance: dict, params: TradeSelection) -> dict:
+    """Page and lay out the cached columnar trades of a performance result as requested."""
+    return select_trades(
+        performance, params.include_trades, params.trades_offset, params.trades_limit, params.trades_format
+    )
 
 @router.get("/strategy/performance")
 async def get_strategy_performance(
@@ -62,42 +502,386 @@ async def get_strategy_performance(
     - short_window: Short-term moving average window (default: 20)
     - long_window: Long-term moving average window (default: 50)
     - instrument: Filter by instrument (optional)
+    - start / end: Inclusive datetime range (optional)
+    - interval: Run on bars of this interval (1m to 1w, served from rollups;
+      requires an instrument) instead of the stored bars (optional)
+    - strategy: Built-in strategy (default: ma_crossover; also macd_crossover,
+      rsi_reversion, bollinger_reversion with their default parameters);
+      the latter need an instrument when several are stored
+    - include_trades: none (metrics only; no trade objects are built),
+      page (trades_limit trades from trades_offset) or all (default)
+    - trades_offset / trades_limit: Page of trades, in exit order (default: 0 / 100)
+    - trades_format: records (one object per trade, default) or columns
+      (one array per field)
     """
     try:
-        # Query stock data
-        where = {}
-        if params.instrument:
-            where["instrument"] = params.instrument
+        spec = resolve_strategy(params.strategy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        version = await data_versions.get(params.instrument)
+        detail = params.trade_detail()
+        key = cache_key(
+            "performance", params.instrument, params.short_window, params.long_window,
+            params.start, params.end, params.interval, params.strategy, detail, version
+        )
+        cached = await strategy_cache.get(key)
+        if cached is not None:
+            return trusted_response(_select_trades(cached, params))
+        
+        if params.strategy != "ma_crossover":
+            bars = await load_strategy_bars(prisma, params.instrument, params.start, params.end, params.interval)
+            performance = await run_strategy_job(
+                run_strategy, _utc_index(bars.columns["datetime"]), bars.columns, spec, detail
+            )
+        elif params.instrument and params.start is None and params.end is None and params.interval is None:
+            # Full-history requests are served from incremental state, which
+            # POST /data and /data/bulk keep current bar by bar
+            state = incremental_engine.get(params.instrument, params.short_window, params.long_window, version)
+            if state is None:
+                series = await load_price_series(prisma, params.instrument)
+                state = incremental_engine.add(params.instrument, version, await run_strategy_job(
+                    MAStrategyState.from_arrays, series.datetimes, series.close,
+                    params.short_window, params.long_window
+                ))
+            performance = state.snapshot(detail)
+        else:
+            series = await load_price_series(prisma, params.instrument, params.start, params.end, params.interval)
             
-        stocks = await prisma.stockdata.find_many(
-            where=where,
-            order=[{"datetime": "asc"}]  # Fixed: Correct Prisma syntax
+            # Calculate strategy performance directly on the float64 arrays, off the event loop
+            performance = await run_strategy_job(
+                functools.partial(run_ma_backtest, trades=detail),
+                series.datetimes,
+                series.close,
+                params.short_window,
+                params.long_window
+            )
+        
+        await strategy_cache.set(key, performance)
+        return trusted_response(_select_trades(performance, params))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating strategy: {str(e)}")
+
+@router.post("/strategy/performance")
+async def run_strategy_spec(
+    request: StrategyRequest,
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Backtest a declarative strategy: a built-in by name or a spec in the body.
+    
+    The spec names indicators (/indicators syntax, with {param}
+    placeholders) and entry/exit expressions over them, e.g.
+    {"indicators": {"rsi": "rsi:14"}, "entry": "rsi < 30", "exit": "rsi > 70"};
+    see app.engine for the expression syntax. Metrics and trades have the
+    same shape as GET /strategy/performance.
+    
+    Body fields:
+    - strategy or spec: Built-in strategy name, or a strategy spec
+    - params: Overrides of the strategy's params (optional)
+    - instrument, start, end, interval: Same as GET /strategy/performance;
+      the instrument is required when several are stored
+    - include_trades, trades_offset, trades_limit, trades_format: Same as
+      GET /strategy/performance
+    """
+    try:
+        spec = resolve_strategy(request.strategy, request.spec, request.params)
+        compile_spec(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        version = await data_versions.get(request.instrument)
+        detail = request.trade_detail()
+        key = cache_key(
+            "spec", request.instrument, spec_json(spec),
+            request.start, request.end, request.interval, detail, version
+        )
+        cached = await strategy_cache.get(key)
+        if cached is not None:
+            return trusted_response(_select_trades(cached, request))
+        
+        bars = await load_strategy_bars(prisma, request.instrument, request.start, request.end, request.interval)
+        performance = await run_strategy_job(
+            run_strategy, _utc_index(bars.columns["datetime"]), bars.columns, spec, detail
+        )
+        await strategy_cache.set(key, performance)
+        return trusted_response(_select_trades(performance, request))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating strategy: {str(e)}")
+
+@router.get("/strategy/sweep", response_model=SweepResult)
+async def get_strategy_sweep(
+    params: SweepParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Evaluate the Moving Average Crossover Strategy over a grid of windows.
+    
+    Data is loaded once and every (short_window, long_window) pair is
+    computed in one batched pass.
+    
+    Query parameters:
+    - short_min / short_max / short_step: Short window range (inclusive)
+    - long_min / long_max / long_step: Long window range (inclusive)
+    - instrument: Filter by instrument (optional)
+    - start / end: Inclusive datetime range (optional)
+    - interval: Run on bars of this interval, see /strategy/performance (optional)
+    """
+    try:
+        short_windows, long_windows = params.windows()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        version = await data_versions.get(params.instrument)
+        key = cache_key(
+            "sweep", params.instrument, short_windows, long_windows,
+            params.start, params.end, params.interval, version
+        )
+        cached = await strategy_cache.get(key)
+        if cached is not None:
+            return trusted_response(cached)
+        
+        series = await load_price_series(prisma, params.instrument, params.start, params.end, params.interval)
+        results = await run_strategy_job(run_ma_sweep, series.close, short_windows, long_windows)
+        sweep = {
+            "short_windows": short_windows,
+            "long_windows": long_windows,
+            "results": results
+        }
+        await strategy_cache.set(key, sweep)
+        return trusted_response(sweep)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating sweep: {str(e)}")
+
+@router.get("/strategy/walkforward", response_model=WalkForwardResult)
+async def get_strategy_walkforward(
+    params: WalkForwardParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Walk-forward optimization of the Moving Average Crossover windows.
+    
+    The series is split into train/test folds; on each train fold the
+    window pair that maximizes the objective is chosen and then evaluated
+    on the following test fold. The test folds together give the
+    out-of-sample performance.
+    
+    Query parameters:
+    - short_min / short_max / short_step, long_min / long_max / long_step:
+      Window grid, see /strategy/sweep
+    - train_bars / test_bars: Bars per train and test fold (default: 756 / 252)
+    - step: Bars between fold starts (default: test_bars)
+    - anchored: Train every fold from the first bar (default: false)
+    - objective: sharpe_ratio (default) or total_returns
+    - instrument, start, end, interval: Data selection, see /strategy/sweep
+    """
+    try:
+        short_windows, long_windows = params.windows()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        version = await data_versions.get(params.instrument)
+        key = cache_key(
+            "walkforward", params.instrument, short_windows, long_windows, params.train_bars,
+            params.test_bars, params.step, params.anchored, params.objective,
+            params.start, params.end, params.interval, version
+        )
+        cached = await strategy_cache.get(key)
+        if cached is not None:
+            return trusted_response(cached)
+        
+        series = await load_price_series(prisma, params.instrument, params.start, params.end, params.interval)
+        try:
+            result = await run_strategy_job(
+                run_walk_forward, series.datetimes, series.close, short_windows, long_windows,
+                params.train_bars, params.test_bars, params.step, params.anchored, params.objective
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        await strategy_cache.set(key, result)
+        return trusted_response(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running walk-forward optimization: {str(e)}")
+
+@router.get("/strategy/portfolio", response_model=PortfolioResult)
+async def get_strategy_portfolio(
+    params: PortfolioParams = Depends(),
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Run the Moving Average Crossover Strategy on several instruments as an equal-weight portfolio.
+    
+    Each instrument is backtested on its own series (never mixed with other
+    instruments) and the equity curves are combined into portfolio equity.
+    
+    Query parameters:
+    - short_window: Short-term moving average window (default: 20)
+    - long_window: Long-term moving average window (default: 50)
+    - instruments: Comma-separated instruments (default: all instruments)
+    - start / end: Inclusive datetime range (optional)
+    """
+    try:
+        instruments = params.instrument_list()
+        version = await data_versions.get(None)
+        key = cache_key(
+            "portfolio", ",".join(instruments or []), params.short_window, params.long_window,
+            params.start, params.end, version
         )
+        cached = await strategy_cache.get(key)
+        if cached is not None:
+            return trusted_response(cached)
         
-        if not stocks:
+        arrays = await fetch_instrument_arrays(prisma, instruments, params.start, params.end)
+        if not arrays.instruments:
             raise HTTPException(
                 status_code=404,
                 detail="No stock data found"
             )
-        
-        # Convert Prisma models to dictionaries for the strategy function
-        stock_data = []
-        for stock in stocks:
-            stock_dict = dict(stock)
-            # Convert decimal values to floats for JSON serialization
-            for key in ['open', 'high', 'low', 'close']:
-                stock_dict[key] = float(stock_dict[key])
-            stock_data.append(stock_dict)
-        
-        # Calculate strategy performance
-        performance = calculate_ma_strategy(
-            stock_data, 
-            short_window=params.short_window, 
-            long_window=params.long_window
+        portfolio = await run_strategy_job(
+            run_portfolio_backtest, arrays, params.short_window, params.long_window
         )
-        
-        return performance
+        await strategy_cache.set(key, portfolio)
+        return trusted_response(portfolio)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error calculating strategy: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error calculating portfolio: {str(e)}")
+
+def _job_status(job, include_result: bool = False) -> dict:
+    status = {
+        "id": job.id,
+        "kind": job.kind,
+        "params": job.params,
+        "status": job.status,
+        "progress": job.progress,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+    if include_result:
+        status["result"] = job.result
+    return status
+
+@router.post("/strategy/jobs", response_model=JobStatus, status_code=202)
+async def create_strategy_job(
+    job: JobCreate,
+    response: Response,
+    prisma: Prisma = Depends(get_prisma)
+):
+    """
+    Submit a long-running strategy computation as a background job.
+    
+    The body names the job kind (performance, sweep, portfolio or
+    walkforward) and the same parameters as the corresponding GET
+    endpoint. Submitting the same kind and parameters again, before new
+    bars arrive for the job's instrument, returns the existing job (200)
+    instead of a new one; set rerun to recompute a finished job.
+    """
+    try:
+        stored, queued = await job_runner.submit(prisma, job.kind, job.params, rerun=job.rerun)
+        if not queued:
+            response.status_code = 200
+        return _job_status(stored)
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error submitting job: {str(e)}")
+
+@router.get("/strategy/jobs/{job_id}", response_model=JobStatus)
+async def get_strategy_job(job_id: str, prisma: Prisma = Depends(get_prisma)):
+    """Return a job's status and progress, with its result once it has succeeded."""
+    try:
+        job = await prisma.strategyjob.find_unique(where={"id": job_id})
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return trusted_response(_job_status(job, include_result=True))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.delete("/strategy/jobs/{job_id}", response_model=JobStatus)
+async def cancel_strategy_job(job_id: str, prisma: Prisma = Depends(get_prisma)):
+    """Cancel a queued or running job (409 if it has already finished)."""
+    try:
+        job = await job_runner.cancel(prisma, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status != "cancelled":
+            raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+        return _job_status(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.get("/stream/bars")
+async def stream_bars(params: StreamSubscription = Depends()):
+    """
+    Stream newly ingested bars and the live MA crossover signal as Server-Sent Events.
+    
+    The first event is a snapshot of the strategy over the instrument's
+    history; every write through the API then sends an update event with
+    the new bars, moving averages, position, crossovers and metrics.
+    Updates a slow client has not read yet are merged into one.
+    
+    Query parameters:
+    - instrument: Instrument to follow
+    - short_window / long_window: Moving average periods (default: 20 / 50)
+    """
+    return StreamingResponse(
+        stream_hub.sse([params.key()]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/stream/ws")
+async def stream_websocket(websocket: WebSocket):
+    """
+    Live bars and MA crossover signals over a WebSocket.
+    
+    Clients send {"action": "subscribe" | "unsubscribe", "instrument": ...,
+    "short_window": ..., "long_window": ...} to follow or drop topics and
+    receive the /stream/bars events as JSON objects with a "type" field.
+    Invalid commands are answered with an error message.
+    """
+    await websocket.accept()
+    subscriber = stream_hub.connect()
+    
+    async def receive_commands():
+        while True:
+            try:
+                command = StreamCommand.model_validate(await websocket.receive_json())
+                if command.action == "subscribe":
+                    stream_hub.subscribe(subscriber, command.key())
+                else:
+                    stream_hub.unsubscribe(subscriber, command.key())
+            except ValueError as e:
+                subscriber.offer("error", {"type": "error", "detail": str(e)})
+    
+    # Commands are read concurrently; a disconnect ends the reader and closes the subscriber
+    reader = asyncio.create_task(receive_commands())
+    reader.add_done_callback(lambda _: subscriber.close())
+    try:
+        async for messages in stream_hub.batches(subscriber):
+            for message in messages:
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        stream_hub.disconnect(subscriber)
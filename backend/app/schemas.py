@@ -1,7 +1,10 @@
 # In backend/app/schemas.py
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, ClassVar, Dict, List, Literal, Optional, Tuple, Union
+
+# Bar intervals understood by resampling and rollups (see app.resample.INTERVALS)
+Interval = Literal["1m", "5m", "15m", "30m", "1h", "4h", "1d", "1w"]
 
 class StockDataBase(BaseModel):
     datetime: datetime
@@ -31,9 +34,339 @@ class StrategyPerformance(BaseModel):
     average_loss: float
     max_drawdown: float
     sharpe_ratio: Optional[float] = None
-    trades: List[dict] = []
+    # One object per trade, or one array per field with trades_format=columns
+    trades: Union[List[dict], Dict[str, List[Any]]] = []
+
+class TradeSelection(BaseModel):
+    """Which trades a performance result lists, and in which layout."""
+    # none: metrics only; page: trades_limit trades from trades_offset, in exit order; all
+    include_trades: Literal["none", "page", "all"] = "all"
+    trades_offset: int = Field(default=0, ge=0)
+    trades_limit: int = Field(default=100, gt=0, le=100000)
+    # records: one object per trade; columns: one array per field
+    trades_format: Literal["records", "columns"] = "records"
+
+    def trade_detail(self) -> str:
+        """Detail to compute and cache: columnar trades are paged and reshaped per request."""
+        return "none" if self.include_trades == "none" else "columns"
 
-class MovingAverageParams(BaseModel):
+class MovingAverageParams(TradeSelection):
     short_window: int = Field(default=20, gt=0)
     long_window: int = Field(default=50, gt=0)
-    instrument: Optional[str] = None
\ No newline at end of file
+    instrument: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    interval: Optional[Interval] = None
+    # Built-in strategy (see app.engine.BUILTIN_STRATEGIES); the windows apply to ma_crossover
+    strategy: str = "ma_crossover"
+
+class StrategySpec(BaseModel):
+    """
+    Declarative strategy: named indicators and entry/exit conditions
+
+    Indicator specs use the /indicators syntax and may reference params as
+    {name}; conditions are expressions over the indicators, params and the
+    bar columns (see app.engine). Without an exit condition the position is
+    closed whenever the entry condition is false.
+    """
+    params: Dict[str, float] = {}
+    indicators: Dict[str, str] = {}
+    entry: str
+    exit: Optional[str] = None
+    # long: long or flat; long_short: long while in position, short otherwise
+    side: Literal["long", "long_short"] = "long"
+
+class StrategyRequest(TradeSelection):
+    """Body of POST /strategy/performance: a built-in strategy name or a spec, plus data filters."""
+    strategy: Optional[str] = None
+    spec: Optional[StrategySpec] = None
+    params: Dict[str, float] = {}
+    instrument: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    interval: Optional[Interval] = None
+
+class DataQueryParams(BaseModel):
+    instrument: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    limit: Optional[int] = Field(default=None, gt=0, le=100000)
+    cursor: Optional[str] = None
+    format: Literal["json", "ndjson", "columnar"] = "json"
+
+class ResampleParams(BaseModel):
+    instrument: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    interval: Interval = "1d"
+    format: Literal["json", "columnar"] = "json"
+
+class ResampledBar(BaseModel):
+    instrument: str
+    datetime: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+
+class ChartParams(BaseModel):
+    instrument: str
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    points: int = Field(default=1000, ge=3, le=100000)
+    method: Literal["lttb", "minmax"] = "lttb"
+
+class ChartSeries(BaseModel):
+    instrument: str
+    method: str
+    source_points: int
+    datetime: List[datetime]
+    close: List[float]
+
+class IndicatorParams(BaseModel):
+    instrument: str
+    indicators: str = "sma:20,ema:20,rsi:14"
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    interval: Optional[Interval] = None
+
+    def spec_list(self) -> List[str]:
+        """Indicator specs from the comma-separated parameter, in request order."""
+        return [spec.strip() for spec in self.indicators.split(",") if spec.strip()]
+
+class IndicatorSeries(BaseModel):
+    instrument: str
+    interval: Optional[str] = None
+    datetime: List[datetime]
+    close: List[float]
+    # Output series per canonical spec (e.g. "macd:12:26:9" -> macd/signal/histogram); null during warm-up
+    indicators: Dict[str, Dict[str, List[Optional[float]]]]
+
+class BulkBatchResult(BaseModel):
+    batch: int
+    received: int
+    inserted: int
+    skipped: int
+
+class BulkIngestResult(BaseModel):
+    method: str
+    received: int
+    inserted: int
+    skipped: int
+    batches: List[BulkBatchResult]
+
+class SweepParams(BaseModel):
+    MAX_PAIRS: ClassVar[int] = 20000
+
+    short_min: int = Field(default=5, gt=0)
+    short_max: int = Field(default=50, gt=0)
+    short_step: int = Field(default=5, gt=0)
+    long_min: int = Field(default=20, gt=0)
+    long_max: int = Field(default=200, gt=0)
+    long_step: int = Field(default=10, gt=0)
+    instrument: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    interval: Optional[Interval] = None
+
+    def windows(self) -> Tuple[List[int], List[int]]:
+        """Short and long windows of the grid; ValueError if it is empty or too large."""
+        short_windows = list(range(self.short_min, self.short_max + 1, self.short_step))
+        long_windows = list(range(self.long_min, self.long_max + 1, self.long_step))
+        if not short_windows or not long_windows:
+            raise ValueError("Window ranges are empty")
+        if len(short_windows) * len(long_windows) > self.MAX_PAIRS:
+            raise ValueError(f"Sweep grid is limited to {self.MAX_PAIRS} window pairs")
+        return short_windows, long_windows
+
+class SweepPoint(BaseModel):
+    short_window: int
+    long_window: int
+    total_returns: float
+    win_rate: float
+    total_trades: int
+    profitable_trades: int
+    losing_trades: int
+    average_win: float
+    average_loss: float
+    max_drawdown: float
+    sharpe_ratio: Optional[float] = None
+
+class SweepResult(BaseModel):
+    short_windows: List[int]
+    long_windows: List[int]
+    results: List[SweepPoint]
+
+class WalkForwardParams(SweepParams):
+    train_bars: int = Field(default=756, ge=2)
+    test_bars: int = Field(default=252, ge=1)
+    step: Optional[int] = Field(default=None, gt=0)
+    anchored: bool = False
+    objective: Literal["sharpe_ratio", "total_returns"] = "sharpe_ratio"
+
+class WalkForwardFold(BaseModel):
+    train_start: datetime
+    train_end: datetime
+    test_start: datetime
+    test_end: datetime
+    short_window: int
+    long_window: int
+    train_score: Optional[float] = None
+    test: StrategyPerformance
+
+class WalkForwardSummary(BaseModel):
+    bars: int
+    total_returns: float
+    max_drawdown: float
+    sharpe_ratio: Optional[float] = None
+    total_trades: int
+
+class WalkForwardResult(BaseModel):
+    objective: str
+    folds: List[WalkForwardFold]
+    out_of_sample: WalkForwardSummary
+
+class PortfolioParams(BaseModel):
+    short_window: int = Field(default=20, gt=0)
+    long_window: int = Field(default=50, gt=0)
+    instruments: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+    def instrument_list(self) -> Optional[List[str]]:
+        """Instruments from the comma-separated parameter, None for all instruments."""
+        if not self.instruments:
+            return None
+        names = [name.strip() for name in self.instruments.split(",") if name.strip()]
+        return sorted(set(names)) or None
+
+class PortfolioInstrument(BaseModel):
+    instrument: str
+    bars: int
+    total_returns: float
+    win_rate: float
+    total_trades: int
+    profitable_trades: int
+    losing_trades: int
+    average_win: float
+    average_loss: float
+    max_drawdown: float
+    sharpe_ratio: Optional[float] = None
+
+class PortfolioResult(BaseModel):
+    short_window: int
+    long_window: int
+    total_returns: float
+    max_drawdown: float
+    sharpe_ratio: Optional[float] = None
+    bars: int
+    instruments: List[PortfolioInstrument]
+
+class JobCreate(BaseModel):
+    kind: Literal["performance", "sweep", "portfolio", "walkforward"]
+    params: Dict[str, Any] = {}
+    rerun: bool = False
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    progress: float
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+
+class StreamSubscription(BaseModel):
+    """A live stream topic: one instrument's bars with the MA crossover for a pair of windows."""
+    MAX_WINDOW: ClassVar[int] = 10000
+
+    instrument: str = Field(min_length=1)
+    short_window: int = Field(default=20, gt=0, le=MAX_WINDOW)
+    long_window: int = Field(default=50, gt=0, le=MAX_WINDOW)
+
+    def key(self) -> Tuple[str, int, int]:
+        return (self.instrument, self.short_window, self.long_window)
+
+class StreamCommand(StreamSubscription):
+    """WebSocket message subscribing to or unsubscribing from a topic."""
+    action: Literal["subscribe", "unsubscribe"] = "subscribe"
+
+class StreamStats(BaseModel):
+    subscribers: int
+    topics: int
+    published: int
+    updates: int
+    rebuilds: int
+    failures: int
+    delivered: int
+    coalesced: int
+    dropped_bars: int
+
+class CacheStats(BaseModel):
+    entries: int
+    size_bytes: int
+    max_bytes: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_rate: float
+    shared_hits: int
+    evictions: int
+    expirations: int
+    shared_backend: bool
+
+class BarCacheStats(BaseModel):
+    enabled: bool
+    directory: str
+    hits: int
+    refreshes: int
+    rows_appended: int
+    invalidations: int
+
+class RollupStats(BaseModel):
+    intervals: List[str]
+    ready_instruments: int
+    dirty_instruments: int
+    refreshes: int
+    rebuilds: int
+    failures: int
+    reads: int
+
+class TimingSummary(BaseModel):
+    count: int
+    mean_seconds: float
+    p50_seconds: float
+    p95_seconds: float
+    max_seconds: float
+
+class ExecutorStats(BaseModel):
+    kind: str
+    workers: int
+    queue_limit: int
+    timeout_seconds: float
+    in_flight: int
+    queued: int
+    peak_in_flight: int
+    submitted: int
+    completed: int
+    failed: int
+    rejected: int
+    timed_out: int
+    queue_wait: TimingSummary
+    compute: TimingSummary
+
+class PoolHealth(BaseModel):
+    connected: bool
+    connection_limit: int
+    in_use: int
+    peak_in_use: int
+    saturation: float
+    checkouts: int
+    saturated_checkouts: int
+    connects: int
+    last_connect_seconds: Optional[float] = None
+    engine: Dict[str, float] = {}
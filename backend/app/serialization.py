@@ -0,0 +1,236 @@
+"""
+JSON encoding and compression of API responses.
+
+ORJSONResponse encodes with orjson when it is installed (NumPy arrays and
+scalars natively, datetimes and pandas Timestamps as ISO 8601) and with
+the standard json module otherwise. Routes return trusted_response() for
+results they computed themselves: FastAPI then skips validating and
+re-encoding the value against the route's response_model, which is kept
+for the OpenAPI schema only (VALIDATE_RESPONSES=1 restores validation).
+
+CompressionMiddleware compresses bodies of at least
+RESPONSE_COMPRESSION_MIN_BYTES with zstd (if the zstandard package is
+installed) or gzip, whichever the client accepts first in the configured
+order. Streamed responses are compressed chunk by chunk; event streams are
+left alone.
+"""
+import json
+import math
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, encoding falls back to json
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional, responses fall back to gzip
+    zstandard = None
+
+# Set to 1 to validate results of trusted_response() against the route's response_model
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "0") == "1"
+# Content encodings offered, in order of preference (empty disables compression)
+RESPONSE_COMPRESSION = [
+    encoding.strip() for encoding in os.getenv("RESPONSE_COMPRESSION", "zstd,gzip").split(",") if encoding.strip()
+]
+# Smallest body in bytes worth compressing
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "16384"))
+# Compression levels: low ones keep compression time well below encoding time
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+RESPONSE_ZSTD_LEVEL = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+
+
+def _default(value: Any) -> Any:
+    """Types neither encoder handles natively."""
+    if isinstance(value, (datetime, date)):
+        # Also pandas Timestamps, which orjson does not accept as datetimes
+        return value.isoformat()
+    if isinstance(value, np.ndarray):
+        return np.datetime_as_string(value).tolist() if value.dtype.kind == "M" else value.tolist()
+    if isinstance(value, np.datetime64):
+        return str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _nan_to_null(value: Any) -> Any:
+    """Copy of a value with NaN and infinities replaced by None, as orjson encodes them."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _nan_to_null(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_nan_to_null(item) for item in value]
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    return _nan_to_null(_default(value))
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a value as compact JSON
+
+    NaN and infinities encode as null, with orjson and with the json
+    fallback alike (which only walks the value to replace them when
+    encoding it as is fails).
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    try:
+        encoded = json.dumps(value, default=_default, allow_nan=False, separators=(",", ":"))
+    except ValueError:
+        encoded = json.dumps(_nan_to_null(value), default=_default, allow_nan=False, separators=(",", ":"))
+    return encoded.encode()
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return dumps(content)
+
+
+def trusted_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+    """Return internally computed content without response_model validation (unless VALIDATE_RESPONSES)."""
+    if VALIDATE_RESPONSES:
+        return content
+    return ORJSONResponse(content, headers=headers)
+
+
+def available_encodings(encodings: List[str] = RESPONSE_COMPRESSION) -> List[str]:
+    """Configured encodings this process can produce."""
+    unknown = [encoding for encoding in encodings if encoding not in ("gzip", "zstd")]
+    if unknown:
+        raise ValueError(f"Unknown response compression: {', '.join(unknown)}")
+    return [encoding for encoding in encodings if encoding != "zstd" or zstandard is not None]
+
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int = RESPONSE_GZIP_LEVEL, zstd_level: int = RESPONSE_ZSTD_LEVEL):
+        if encoding == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+        else:
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._stream = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._stream.compress(data)
+
+    def finish(self) -> bytes:
+        return self._stream.flush()
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def negotiate(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """First of `encodings` the Accept-Encoding header allows (q > 0), or None."""
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for encoding in encodings:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing large response bodies with the best accepted encoding."""
+
+    def __init__(
+        self,
+        app: Any,
+        encodings: List[str] = RESPONSE_COMPRESSION,
+        minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES
+    ):
+        self.app = app
+        self.encodings = available_encodings(encodings)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        encoding = None
+        if scope["type"] == "http" and self.encodings:
+            encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """Wraps an ASGI send callable, deciding on the first body chunk whether to compress."""
+
+    def __init__(self, send: Any, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[Dict[str, Any]] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if (
+                "content-encoding" in headers
+                or headers.get("content-type", "").startswith("text/event-stream")
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = Compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                with timed("compress"):
+                    body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            await self.send(start)
+
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
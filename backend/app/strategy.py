@@ -1,11 +1,180 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple
+from app.kernels import KERNELS, KernelResult, resolve_backend
+from app.metrics import timed
+
+# How a backtest returns its trades: one dictionary per trade, one list per
+# field (TRADE_FIELDS), or not at all (summary metrics only)
+TradeDetail = Literal["records", "columns", "none"]
+TRADE_FIELDS = ('entry_date', 'exit_date', 'entry_price', 'exit_price', 'profit_pct', 'type')
+
+def extract_trades(
+    datetimes: pd.Series,
+    close: np.ndarray,
+    position: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Pair entry/exit crossovers into long trades using array operations only
+    
+    An exit closes a trade only when the event right before it is an entry,
+    which is exactly when the reference loop is holding a position; the
+    entry price is that of the most recent entry.
+    
+    Args:
+        datetimes: Bar timestamps, aligned with close and position
+        close: Close prices
+        position: Crossover events (+1 entry, -1 exit, 0/NaN otherwise)
+        
+    Returns:
+        List of trade dictionaries, in exit order
+    """
+    return build_trades(datetimes, close, *trade_bars(position))
+
+def trade_bars(position: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Entry and exit bar indices of the long trades in a crossover event array (see extract_trades)."""
+    events = np.flatnonzero((position == 1) | (position == -1))
+    kinds = position[events]
+    closes = (kinds[1:] == -1) & (kinds[:-1] == 1)
+    return events[:-1][closes], events[1:][closes]
+
+def _trade_profits(close: np.ndarray, entries: np.ndarray, exits: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    entry_prices = close[entries].astype(float)
+    exit_prices = close[exits].astype(float)
+    return entry_prices, exit_prices, (exit_prices - entry_prices) / entry_prices * 100
+
+def trade_columns(
+    datetimes: Any,
+    close: np.ndarray,
+    entries: np.ndarray,
+    exits: np.ndarray
+) -> Dict[str, List[Any]]:
+    """
+    Build the columnar trade list from paired entry/exit bar indices
+    
+    Args:
+        datetimes: Bar timestamps, aligned with close
+        close: Close prices
+        entries: Entry bar index of each trade
+        exits: Exit bar index of each trade
+        
+    Returns:
+        One JSON-ready list per field of TRADE_FIELDS, in exit order
+    """
+    entry_prices, exit_prices, profits = _trade_profits(close, entries, exits)
+    dates = pd.DatetimeIndex(datetimes)
+    return {
+        'entry_date': [date.isoformat() for date in dates[entries]],
+        'exit_date': [date.isoformat() for date in dates[exits]],
+        'entry_price': entry_prices.tolist(),
+        'exit_price': exit_prices.tolist(),
+        'profit_pct': profits.tolist(),
+        'type': ['long'] * len(entries)
+    }
+
+def build_trades(
+    datetimes: Any,
+    close: np.ndarray,
+    entries: np.ndarray,
+    exits: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Build trade dictionaries from paired entry/exit bar indices
+    
+    Args:
+        datetimes: Bar timestamps, aligned with close
+        close: Close prices
+        entries: Entry bar index of each trade
+        exits: Exit bar index of each trade
+        
+    Returns:
+        List of trade dictionaries, in exit order
+    """
+    return columns_to_records(trade_columns(datetimes, close, entries, exits))
+
+def columns_to_records(columns: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Turn columnar trades into one dictionary per trade."""
+    return [dict(zip(TRADE_FIELDS, values)) for values in zip(*(columns[field] for field in TRADE_FIELDS))]
+
+def records_to_columns(trades: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Turn trade dictionaries into one list per field."""
+    return {field: [trade[field] for trade in trades] for field in TRADE_FIELDS}
+
+def _format_trades(trades: List[Dict[str, Any]], detail: TradeDetail) -> Any:
+    """Trade dictionaries in the requested detail (None for "none")."""
+    if detail == "none":
+        return None
+    return records_to_columns(trades) if detail == "columns" else trades
+
+def select_trades(
+    performance: Dict[str, Any],
+    include: str = "all",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    trades_format: str = "records"
+) -> Dict[str, Any]:
+    """
+    Shape the trades of a performance result computed with detail="columns"
+    
+    Args:
+        performance: Metrics with columnar trades (or none at all)
+        include: "none" (metrics only), "page" (trades offset to
+            offset + limit, in exit order) or "all"
+        offset: First trade of a page
+        limit: Trades in a page (default: all from offset)
+        trades_format: "records" (one dictionary per trade) or "columns"
+        
+    Returns:
+        A new dictionary; the cached result passed in is left untouched
+    """
+    result = {key: value for key, value in performance.items() if key != 'trades'}
+    columns = performance.get('trades')
+    if include == "none" or columns is None:
+        return result
+    if include == "page":
+        stop = None if limit is None else offset + limit
+        columns = {field: values[offset:stop] for field, values in columns.items()}
+    result['trades'] = columns if trades_format == "columns" else columns_to_records(columns)
+    return result
+
+def _extract_trades_loop(
+    datetimes: pd.Series,
+    close: np.ndarray,
+    position: np.ndarray
+) -> List[Dict[str, Any]]:
+    """Reference per-bar trade loop, kept for regression tests and benchmarks."""
+    trades = []
+    current_position = 0
+    entry_price = 0
+    entry_date = None
+    
+    for date, price, pos in zip(pd.DatetimeIndex(datetimes), close, position):
+        if pos == 1:
+            entry_price = price
+            entry_date = date
+            current_position = 1
+        elif pos == -1 and current_position == 1:
+            exit_price = price
+            exit_date = date
+            profit = (exit_price - entry_price) / entry_price * 100
+            trades.append({
+                'entry_date': entry_date.isoformat(),
+                'exit_date': exit_date.isoformat(),
+                'entry_price': float(entry_price),
+                'exit_price': float(exit_price),
+                'profit_pct': float(profit),
+                'type': 'long'
+            })
+            current_position = 0
+    
+    return trades
 
 def calculate_ma_strategy(
     stock_data: List[Dict[str, Any]], 
     short_window: int = 20, 
-    long_window: int = 50
+    long_window: int = 50,
+    vectorized: bool = True,
+    backend: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Calculate Moving Average Crossover Strategy performance
@@ -14,6 +183,9 @@ def calculate_ma_strategy(
         stock_data: List of stock data records
         short_window: Short-term moving average window (default: 20)
         long_window: Long-term moving average window (default: 50)
+        vectorized: Extract trades with NumPy array operations instead of
+            the reference per-bar loop (default: True, pandas backend only)
+        backend: Backtest backend, see run_ma_backtest (default: auto)
         
     Returns:
         Dictionary with strategy performance metrics
@@ -33,16 +205,17 @@ def calculate_ma_strategy(
             "error": "Stock data is empty."
         }
     
-    df = pd.DataFrame(stock_data)
-    
-    if 'datetime' not in df or 'close' not in df:
-        return {
-            "error": "Missing required columns ('datetime', 'close')."
-        }
-    
-    df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
-    df['close'] = pd.to_numeric(df['close'], errors='coerce')
-    df = df.dropna(subset=['datetime', 'close'])
+    with timed("frame"):
+        df = pd.DataFrame(stock_data)
+        
+        if 'datetime' not in df or 'close' not in df:
+            return {
+                "error": "Missing required columns ('datetime', 'close')."
+            }
+        
+        df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
+        df['close'] = pd.to_numeric(df['close'], errors='coerce')
+        df = df.dropna(subset=['datetime', 'close']).sort_values('datetime')
     
     if df.empty:
         return {
@@ -59,59 +232,168 @@ def calculate_ma_strategy(
             "error": "No valid stock data available."
         }
     
-    df = df.sort_values('datetime')
+    return run_ma_backtest(
+        df['datetime'],
+        df['close'].to_numpy(dtype=float),
+        short_window=short_window,
+        long_window=long_window,
+        vectorized=vectorized,
+        backend=backend
+    )
+
+def run_ma_backtest(
+    datetimes: Any,
+    close: np.ndarray,
+    short_window: int = 20,
+    long_window: int = 50,
+    vectorized: bool = True,
+    backend: Optional[str] = None,
+    trades: TradeDetail = "records"
+) -> Dict[str, Any]:
+    """
+    Run the Moving Average Crossover Strategy on time-ordered arrays
     
-    df['short_ma'] = df['close'].rolling(window=short_window, min_periods=1).mean()
-    df['long_ma'] = df['close'].rolling(window=long_window, min_periods=1).mean()
+    This is the core of calculate_ma_strategy for callers that already hold
+    columnar float64 data (e.g. from fetch_price_arrays) and so can skip
+    building per-row dictionaries.
     
-    df['signal'] = np.where(df['short_ma'] > df['long_ma'], 1, -1)
-    df['position'] = df['signal'].diff()
-    df['returns'] = df['close'].pct_change().fillna(0)
-    df['strategy_returns'] = df['signal'].shift(1).fillna(0) * df['returns']
-    df['cumulative_returns'] = (1 + df['strategy_returns']).cumprod()
+    Args:
+        datetimes: Bar timestamps in ascending order (array-like)
+        close: Close prices as float64, aligned with datetimes
+        short_window: Short-term moving average window (default: 20)
+        long_window: Long-term moving average window (default: 50)
+        vectorized: Extract trades with NumPy array operations (default: True, pandas backend only)
+        backend: "pandas" (DataFrame column chain), "numpy" (plain arrays),
+            "numba" (compiled single pass) or "auto"/None for BACKTEST_BACKEND,
+            which picks numba when it is installed
+        trades: Trade list as "records" (default), "columns" or "none"; with
+            "none" no per-trade objects are built at all
+        
+    Returns:
+        Dictionary with strategy performance metrics
+    """
+    close = np.asarray(close, dtype=float)
     
-    trades = []
-    current_position = 0
-    entry_price = 0
-    entry_date = None
+    if len(close) == 0:
+        return _with_trades({
+            "total_returns": 0,
+            "win_rate": 0,
+            "total_trades": 0,
+            "profitable_trades": 0,
+            "losing_trades": 0,
+            "average_win": 0,
+            "average_loss": 0,
+            "max_drawdown": 0,
+            "sharpe_ratio": None,
+            "error": "No valid stock data available."
+        }, _format_trades([], trades))
     
-    for index, row in df.iterrows():
-        if row['position'] == 1:
-            entry_price = row['close']
-            entry_date = row['datetime']
-            current_position = 1
-        elif row['position'] == -1 and current_position == 1:
-            exit_price = row['close']
-            exit_date = row['datetime']
-            profit = (exit_price - entry_price) / entry_price * 100
-            trades.append({
-                'entry_date': entry_date.isoformat(),
-                'exit_date': exit_date.isoformat(),
-                'entry_price': float(entry_price),
-                'exit_price': float(exit_price),
-                'profit_pct': float(profit),
-                'type': 'long'
-            })
-            current_position = 0
+    backend = resolve_backend(backend)
+    if backend == "pandas":
+        return _pandas_backtest(datetimes, close, short_window, long_window, vectorized, trades)
     
-    profits = [t['profit_pct'] for t in trades]
-    total_trades = len(trades)
-    profitable_trades = sum(1 for p in profits if p > 0)
-    losing_trades = total_trades - profitable_trades
-    win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
-    avg_win = np.mean([p for p in profits if p > 0]) if profitable_trades > 0 else 0
-    avg_loss = np.mean([p for p in profits if p <= 0]) if losing_trades > 0 else 0
+    with timed("kernel"):
+        result = KERNELS[backend](close, short_window, long_window)
+    return kernel_performance(datetimes, close, result, trades)
+
+def kernel_performance(
+    datetimes: Any,
+    close: np.ndarray,
+    result: KernelResult,
+    trades: TradeDetail = "records"
+) -> Dict[str, Any]:
+    """
+    Turn the arrays and statistics of a backtest kernel into performance metrics
+    
+    Args:
+        datetimes: Bar timestamps the kernel ran over
+        close: Close prices the kernel ran over (non-empty)
+        result: Output of a kernel from app.kernels
+        trades: Trade list as "records" (default), "columns" or "none"
+        
+    Returns:
+        Dictionary with strategy performance metrics
+    """
+    with timed("trades"):
+        if trades == "none":
+            trade_list = None
+            profits = _trade_profits(close, result.entries, result.exits)[2]
+        else:
+            trade_list = trade_columns(datetimes, close, result.entries, result.exits)
+            profits = np.asarray(trade_list['profit_pct'], dtype=float)
+            if trades == "records":
+                trade_list = columns_to_records(trade_list)
+    strategy_std = np.sqrt(result.m2_return / (len(close) - 1)) if len(close) > 1 else np.nan
+    return _summarize(
+        profits,
+        trade_list,
+        total_return=(result.equity[-1] - 1) * 100,
+        max_drawdown=result.max_drawdown * 100,
+        sharpe_ratio=(result.mean_return / strategy_std * np.sqrt(252)) if strategy_std > 0 else None
+    )
+
+def _pandas_backtest(
+    datetimes: Any,
+    close: np.ndarray,
+    short_window: int,
+    long_window: int,
+    vectorized: bool,
+    trades: TradeDetail = "records"
+) -> Dict[str, Any]:
+    """Reference implementation: the strategy as a chain of DataFrame columns."""
+    with timed("frame"):
+        df = pd.DataFrame({'datetime': pd.DatetimeIndex(datetimes), 'close': close})
+    
+    with timed("rolling"):
+        df['short_ma'] = df['close'].rolling(window=short_window, min_periods=1).mean()
+        df['long_ma'] = df['close'].rolling(window=long_window, min_periods=1).mean()
+        
+        df['signal'] = np.where(df['short_ma'] > df['long_ma'], 1, -1)
+        # signal flips between -1 and 1, so normalise the diff to +1 (entry) / -1 (exit)
+        df['position'] = np.sign(df['signal'].diff())
+        df['returns'] = df['close'].pct_change().fillna(0)
+        df['strategy_returns'] = df['signal'].shift(1).fillna(0) * df['returns']
+        df['cumulative_returns'] = (1 + df['strategy_returns']).cumprod()
+    
+    with timed("trades"):
+        if vectorized:
+            trade_list = extract_trades(df['datetime'], df['close'].to_numpy(), df['position'].to_numpy())
+        else:
+            trade_list = _extract_trades_loop(df['datetime'], df['close'].to_numpy(), df['position'].to_numpy())
     
     peak = df['cumulative_returns'].cummax()
     drawdown = (peak - df['cumulative_returns']) / peak
-    max_drawdown = drawdown.max() * 100 if not drawdown.empty else 0
     
     strategy_std = df['strategy_returns'].std()
-    sharpe_ratio = (df['strategy_returns'].mean() / strategy_std * np.sqrt(252)) if strategy_std > 0 else None
-    
-    total_return = (df['cumulative_returns'].iloc[-1] - 1) * 100 if not df.empty else 0
+    return _summarize(
+        np.array([t['profit_pct'] for t in trade_list], dtype=float),
+        _format_trades(trade_list, trades),
+        total_return=(df['cumulative_returns'].iloc[-1] - 1) * 100,
+        max_drawdown=drawdown.max() * 100,
+        sharpe_ratio=(df['strategy_returns'].mean() / strategy_std * np.sqrt(252)) if strategy_std > 0 else None
+    )
+
+def _with_trades(performance: Dict[str, Any], trades: Any) -> Dict[str, Any]:
+    if trades is not None:
+        performance['trades'] = trades
+    return performance
+
+def _summarize(
+    profits: np.ndarray,
+    trades: Any,
+    total_return: float,
+    max_drawdown: float,
+    sharpe_ratio: Optional[float]
+) -> Dict[str, Any]:
+    """Assemble the performance dictionary shared by every backend from the per-trade profits."""
+    total_trades = len(profits)
+    profitable_trades = int(np.count_nonzero(profits > 0))
+    losing_trades = total_trades - profitable_trades
+    win_rate = (profitable_trades / total_trades * 100) if total_trades > 0 else 0
+    avg_win = profits[profits > 0].mean() if profitable_trades > 0 else 0
+    avg_loss = profits[profits <= 0].mean() if losing_trades > 0 else 0
     
-    return {
+    return _with_trades({
         'total_returns': float(total_return),
         'win_rate': float(win_rate),
         'total_trades': total_trades,
@@ -120,6 +402,5 @@ def calculate_ma_strategy(
         'average_win': float(avg_win),
         'average_loss': float(avg_loss),
         'max_drawdown': float(max_drawdown),
-        'sharpe_ratio': float(sharpe_ratio) if sharpe_ratio is not None else None,
-        'trades': trades
-    }
+        'sharpe_ratio': float(sharpe_ratio) if sharpe_ratio is not None else None
+    }, trades)
@@ -0,0 +1,390 @@
+"""
+In-process pub/sub of newly ingested bars and live MA crossover signals.
+
+Clients subscribe to topics (instrument, short_window, long_window). Each
+topic holds one MAStrategyState, the incremental engine's O(1)-per-bar
+strategy state, so a write is folded in once per topic however many clients
+follow it; the resulting update is then offered to every subscriber without
+awaiting any of them.
+
+A subscriber keeps at most one pending message per topic. Updates arriving
+before the previous one has been sent are merged into it: new bars and
+crossovers are appended, while the position, moving averages and metrics
+are replaced by the latest. A consumer more than STREAM_MAX_PENDING_BARS
+bars behind loses the oldest ones and is told how many were dropped, so a
+stalled connection costs one bounded buffer and never slows down ingestion.
+
+A topic whose state cannot be advanced bar by bar (an out-of-order or
+partly duplicate write, or one only visible through the data version, such
+as a write made by another API process) is rebuilt from the database and
+sent again as a snapshot.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.cache import data_versions
+from app.executor import strategy_executor
+from app.incremental import MAStrategyState, to_utc
+
+logger = logging.getLogger(__name__)
+
+# Bars buffered per topic for a slow consumer before the oldest are dropped
+STREAM_MAX_PENDING_BARS = int(os.getenv("STREAM_MAX_PENDING_BARS", "1000"))
+# Seconds between keep-alives on an idle stream; idle topics also check their data version this often
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+# Topics one connection may subscribe to
+STREAM_MAX_TOPICS = int(os.getenv("STREAM_MAX_TOPICS", "32"))
+
+TopicKey = Tuple[str, int, int]
+
+
+def bar_to_dict(row: Any) -> Dict[str, Any]:
+    return {
+        "datetime": to_utc(row.datetime).isoformat(),
+        "open": row.open,
+        "high": row.high,
+        "low": row.low,
+        "close": row.close,
+        "volume": row.volume,
+    }
+
+
+def state_fields(state: MAStrategyState) -> Dict[str, Any]:
+    """Latest bar, moving averages, position and metrics of a topic's state."""
+    if state.count == 0:
+        short_ma = long_ma = None
+    else:
+        short_ma, long_ma = state.averages()
+    return {
+        "datetime": None if state.last_datetime is None else state.last_datetime.isoformat(),
+        "close": state.last_close,
+        "short_ma": short_ma,
+        "long_ma": long_ma,
+        "position": {1: "long", -1: "short"}.get(state.last_signal),
+        "metrics": state.metrics(),
+    }
+
+
+class Subscriber:
+    """
+    One client connection: its topics and at most one pending message per topic
+
+    offer() never blocks; the connection drains pending messages with
+    next_batch() at its own pace.
+    """
+
+    def __init__(self, max_pending_bars: int = STREAM_MAX_PENDING_BARS):
+        self.max_pending_bars = max_pending_bars
+        self.topics: Set[TopicKey] = set()
+        self.pending: Dict[Any, Dict[str, Any]] = {}
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped_bars = 0
+
+    def offer(self, key: Any, message: Dict[str, Any]) -> None:
+        """Queue a message, merging an update into the topic's pending message."""
+        pending = self.pending.get(key)
+        if pending is not None and message["type"] == "update" and pending["type"] != "error":
+            self.coalesced += 1
+            pending["bars"].extend(message["bars"])
+            pending["crossovers"].extend(message["crossovers"])
+            pending["dropped"] += message["dropped"]
+            # Keep a pending snapshot a snapshot: the client has not received its starting point yet
+            pending.update({
+                name: value for name, value in message.items()
+                if name not in ("type", "bars", "crossovers", "dropped")
+            })
+        else:
+            pending = dict(message)
+            if "bars" in pending:
+                pending["bars"] = list(pending["bars"])
+                pending["crossovers"] = list(pending["crossovers"])
+            self.pending[key] = pending
+
+        overflow = len(pending.get("bars", ())) - self.max_pending_bars
+        if overflow > 0:
+            del pending["bars"][:overflow]
+            pending["dropped"] += overflow
+            self.dropped_bars += overflow
+            first = pending["bars"][0]["datetime"] if pending["bars"] else None
+            pending["crossovers"] = [
+                crossover for crossover in pending["crossovers"]
+                if first is not None and crossover["datetime"] >= first
+            ]
+        self.wakeup.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """Pending messages, waiting up to `timeout` seconds for one; [] on timeout or close."""
+        if not self.pending and not self.closed:
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        messages = list(self.pending.values())
+        self.pending.clear()
+        self.delivered += len(messages)
+        return messages
+
+    def close(self) -> None:
+        self.closed = True
+        self.wakeup.set()
+
+
+class Topic:
+    def __init__(self, key: TopicKey):
+        self.key = key
+        self.subscribers: Set[Subscriber] = set()
+        self.state: Optional[MAStrategyState] = None
+        # Data version the state reflects
+        self.version = -1
+        self.loading: Optional[asyncio.Task] = None
+        self.checked = 0.0
+
+    def header(self, kind: str) -> Dict[str, Any]:
+        instrument, short_window, long_window = self.key
+        return {
+            "type": kind,
+            "instrument": instrument,
+            "short_window": short_window,
+            "long_window": long_window,
+            "version": self.version,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.header("snapshot"), **state_fields(self.state), "bars": [], "crossovers": [], "dropped": 0}
+
+    def broadcast(self, message: Dict[str, Any]) -> None:
+        for subscriber in self.subscribers:
+            subscriber.offer(self.key, message)
+
+
+class StreamHub:
+    """
+    Fan-out of ingested bars and incremental MA crossover updates to subscribers
+
+    Topics exist while they have subscribers. publish() is called by the
+    ingestion path after each committed batch with the instrument's new
+    data version and is a dictionary lookup for instruments nobody follows.
+    """
+
+    def __init__(
+        self,
+        max_pending_bars: int = STREAM_MAX_PENDING_BARS,
+        heartbeat: float = STREAM_HEARTBEAT_SECONDS,
+        max_topics: int = STREAM_MAX_TOPICS
+    ):
+        self.max_pending_bars = max_pending_bars
+        self.heartbeat = heartbeat
+        self.max_topics = max_topics
+        self.topics: Dict[TopicKey, Topic] = {}
+        self.instruments: Dict[str, Set[TopicKey]] = {}
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.updates = 0
+        self.rebuilds = 0
+        self.failures = 0
+        # Counters of subscribers that have disconnected
+        self._delivered = 0
+        self._coalesced = 0
+        self._dropped_bars = 0
+
+    def connect(self) -> Subscriber:
+        subscriber = Subscriber(self.max_pending_bars)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        for key in list(subscriber.topics):
+            self.unsubscribe(subscriber, key)
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self._delivered += subscriber.delivered
+            self._coalesced += subscriber.coalesced
+            self._dropped_bars += subscriber.dropped_bars
+        subscriber.close()
+
+    def subscribe(self, subscriber: Subscriber, key: TopicKey) -> None:
+        """
+        Follow a topic; its snapshot is sent first, then updates
+
+        Raises:
+            ValueError: The subscriber already follows max_topics topics
+        """
+        if key in subscriber.topics:
+            return
+        if len(subscriber.topics) >= self.max_topics:
+            raise ValueError(f"At most {self.max_topics} subscriptions per connection")
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = Topic(key)
+            self.instruments.setdefault(key[0], set()).add(key)
+        topic.subscribers.add(subscriber)
+        subscriber.topics.add(key)
+        if topic.state is not None:
+            subscriber.offer(key, topic.snapshot())
+        elif topic.loading is None:
+            self._rebuild(topic)
+
+    def unsubscribe(self, subscriber: Subscriber, key: TopicKey) -> None:
+        subscriber.topics.discard(key)
+        subscriber.pending.pop(key, None)
+        topic = self.topics.get(key)
+        if topic is None:
+            return
+        topic.subscribers.discard(subscriber)
+        if not topic.subscribers:
+            if topic.loading is not None:
+                topic.loading.cancel()
+            del self.topics[key]
+            keys = self.instruments[key[0]]
+            keys.discard(key)
+            if not keys:
+                del self.instruments[key[0]]
+
+    def publish(self, instrument: str, rows: List[Any], version: int, complete: bool = True) -> None:
+        """
+        Fold newly committed rows of one instrument into its topics and notify their subscribers
+
+        version is the instrument's data version after the write; complete is
+        False when some of the written rows were skipped as duplicates.
+        """
+        keys = self.instruments.get(instrument)
+        if not keys or not rows:
+            return
+        self.published += 1
+        rows = sorted(rows, key=lambda row: to_utc(row.datetime))
+        bars = [bar_to_dict(row) for row in rows]
+        for key in list(keys):
+            topic = self.topics[key]
+            if topic.loading is not None:
+                # The load re-checks the data version when it finishes
+                continue
+            state = topic.state
+            in_order = state is not None and (
+                state.last_datetime is None or state.align(rows[0].datetime) > state.last_datetime
+            )
+            if not complete or not in_order or topic.version != version - 1:
+                self._rebuild(topic)
+                continue
+
+            crossovers = []
+            for row, bar in zip(rows, bars):
+                previous = state.last_signal
+                state.update(row.datetime, row.close)
+                if previous is not None and state.last_signal != previous:
+                    crossovers.append({
+                        "datetime": bar["datetime"],
+                        "close": bar["close"],
+                        "signal": "buy" if state.last_signal == 1 else "sell",
+                    })
+            topic.version = version
+            self.updates += 1
+            topic.broadcast({
+                **topic.header("update"), **state_fields(state),
+                "bars": bars, "crossovers": crossovers, "dropped": 0,
+            })
+
+    async def check(self, subscriber: Subscriber) -> None:
+        """Rebuild the subscriber's idle topics whose data version moved without a publish (writes elsewhere)."""
+        now = time.monotonic()
+        for key in list(subscriber.topics):
+            topic = self.topics.get(key)
+            if topic is None or topic.loading is not None or now - topic.checked < self.heartbeat / 2:
+                continue
+            topic.checked = now
+            if topic.state is None or await data_versions.get(key[0]) != topic.version:
+                self._rebuild(topic)
+
+    def _rebuild(self, topic: Topic) -> None:
+        topic.state = None
+        topic.loading = asyncio.create_task(self._load(topic))
+
+    async def _load(self, topic: Topic) -> None:
+        from app.bar_cache import load_price_arrays
+        from app.database import get_prisma_client
+
+        instrument, short_window, long_window = topic.key
+        stale = False
+        try:
+            version = await data_versions.get(instrument)
+            async with get_prisma_client() as prisma:
+                series = await load_price_arrays(prisma, instrument)
+            state = await strategy_executor.run(
+                MAStrategyState.from_arrays, series.datetimes, series.close, short_window, long_window
+            )
+            topic.state = state
+            topic.version = version
+            topic.checked = time.monotonic()
+            self.rebuilds += 1
+            topic.broadcast(topic.snapshot())
+            # Writes published while loading were skipped; they may or may not be in the series
+            stale = await data_versions.get(instrument) != version
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Stream topic load failed for %s", topic.key)
+            self.failures += 1
+            topic.broadcast({**topic.header("error"), "detail": f"Error loading {instrument}: {str(e)}"})
+        finally:
+            topic.loading = None
+        if stale and topic.subscribers:
+            self._rebuild(topic)
+
+    async def batches(self, subscriber: Subscriber) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Pending messages of a subscriber as they arrive, until it is closed
+
+        Yields [] every `heartbeat` seconds without messages, after checking
+        the subscriber's topics for writes made elsewhere.
+        """
+        while not subscriber.closed:
+            messages = await subscriber.next_batch(self.heartbeat)
+            if not messages:
+                if subscriber.closed:
+                    return
+                await self.check(subscriber)
+            yield messages
+
+    async def sse(self, keys: List[TopicKey]) -> AsyncIterator[str]:
+        """Server-Sent Events of a new subscriber to `keys`: one event per message, comments as keep-alives."""
+        subscriber = self.connect()
+        try:
+            for key in keys:
+                self.subscribe(subscriber, key)
+            async for messages in self.batches(subscriber):
+                if not messages:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(
+                    f"event: {message['type']}\ndata: {json.dumps(message)}\n\n" for message in messages
+                )
+        finally:
+            self.disconnect(subscriber)
+
+    def close(self) -> None:
+        """End every stream (shutdown)."""
+        for subscriber in list(self.subscribers):
+            self.disconnect(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "topics": len(self.topics),
+            "published": self.published,
+            "updates": self.updates,
+            "rebuilds": self.rebuilds,
+            "failures": self.failures,
+            "delivered": self._delivered + sum(subscriber.delivered for subscriber in self.subscribers),
+            "coalesced": self._coalesced + sum(subscriber.coalesced for subscriber in self.subscribers),
+            "dropped_bars": self._dropped_bars + sum(subscriber.dropped_bars for subscriber in self.subscribers),
+        }
+
+
+stream_hub = StreamHub()
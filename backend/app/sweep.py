@@ -0,0 +1,171 @@
+import os
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from app.executor import parallel_pool
+
+# Number of (pair, bar) cells evaluated per batch, bounds peak memory
+SWEEP_CHUNK_CELLS = int(os.getenv("SWEEP_CHUNK_CELLS", "4000000"))
+# Grids smaller than this many cells are not worth shipping to worker processes
+SWEEP_PARALLEL_CELLS = int(os.getenv("SWEEP_PARALLEL_CELLS", "20000000"))
+
+METRICS = (
+    'total_returns', 'win_rate', 'total_trades', 'profitable_trades', 'losing_trades',
+    'average_win', 'average_loss', 'max_drawdown', 'sharpe_ratio'
+)
+
+def rolling_means(close: np.ndarray, windows: Sequence[int]) -> np.ndarray:
+    """
+    Compute trailing means for several windows from a single cumulative sum
+
+    Matches pandas' rolling(window, min_periods=1).mean(): the first bars
+    average over however many values are available.
+
+    Args:
+        close: Close prices in time order
+        windows: Window lengths
+
+    Returns:
+        Array of shape (len(windows), len(close))
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    csum = np.concatenate(([0.0], np.cumsum(close)))
+    ends = np.arange(1, n + 1)
+    means = np.empty((len(windows), n))
+    for row, window in enumerate(windows):
+        starts = np.maximum(ends - window, 0)
+        means[row] = (csum[ends] - csum[starts]) / (ends - starts)
+    return means
+
+def evaluate_signals(close: np.ndarray, signal: np.ndarray, seeded: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Evaluate a batch of long/short signal rows against one close series
+
+    Args:
+        close: Close prices, shape (n,)
+        signal: Signals of 1 / -1, shape (pairs, n)
+        seeded: The first bar is the one before the evaluated range (e.g.
+            the last in-sample bar): returns and equity cover bars 1..n-1,
+            so the first evaluated bar earns its return as it would in a
+            backtest of the whole series
+
+    Returns:
+        Dictionary of metric arrays, one value per signal row, with the same
+        definitions as calculate_ma_strategy
+    """
+    pairs, n = signal.shape
+    returns = np.zeros(n)
+    returns[1:] = close[1:] / close[:-1] - 1
+
+    strategy_returns = np.zeros((pairs, n))
+    strategy_returns[:, 1:] = signal[:, :-1] * returns[1:]
+    if seeded:
+        strategy_returns = strategy_returns[:, 1:]
+    equity = np.cumprod(1 + strategy_returns, axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    max_drawdown = ((peak - equity) / peak).max(axis=1) * 100
+    total_returns = (equity[:, -1] - 1) * 100
+
+    mean = strategy_returns.mean(axis=1)
+    std = strategy_returns.std(axis=1, ddof=1) if strategy_returns.shape[1] > 1 else np.full(pairs, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(252), np.nan)
+
+    # Crossover events: the column where the signal lands on its new value
+    rows, cols = np.nonzero(signal[:, 1:] != signal[:, :-1])
+    cols = cols + 1
+    kinds = signal[rows, cols]
+    closes = (kinds[1:] == -1) & (kinds[:-1] == 1) & (rows[1:] == rows[:-1])
+    trade_rows = rows[1:][closes]
+    entries = cols[:-1][closes]
+    exits = cols[1:][closes]
+    profits = (close[exits] - close[entries]) / close[entries] * 100
+    wins = profits > 0
+
+    total_trades = np.bincount(trade_rows, minlength=pairs)
+    profitable_trades = np.bincount(trade_rows, weights=wins, minlength=pairs).astype(int)
+    losing_trades = total_trades - profitable_trades
+    win_sum = np.bincount(trade_rows, weights=np.where(wins, profits, 0), minlength=pairs)
+    loss_sum = np.bincount(trade_rows, weights=np.where(wins, 0, profits), minlength=pairs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(total_trades > 0, profitable_trades / total_trades * 100, 0.0)
+        average_win = np.where(profitable_trades > 0, win_sum / profitable_trades, 0.0)
+        average_loss = np.where(losing_trades > 0, loss_sum / losing_trades, 0.0)
+
+    return {
+        'total_returns': total_returns,
+        'win_rate': win_rate,
+        'total_trades': total_trades,
+        'profitable_trades': profitable_trades,
+        'losing_trades': losing_trades,
+        'average_win': average_win,
+        'average_loss': average_loss,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe,
+    }
+
+def _sweep_pairs(close: np.ndarray, pairs: np.ndarray) -> Dict[str, np.ndarray]:
+    """Evaluate (short_window, long_window) pairs in memory-bounded batches."""
+    windows, index = np.unique(pairs, return_inverse=True)
+    index = index.reshape(pairs.shape)
+    means = rolling_means(close, windows)
+
+    batch = max(1, SWEEP_CHUNK_CELLS // max(len(close), 1))
+    parts = []
+    for start in range(0, len(pairs), batch):
+        rows = index[start:start + batch]
+        signal = np.where(means[rows[:, 0]] > means[rows[:, 1]], 1, -1).astype(np.int8)
+        parts.append(evaluate_signals(close, signal))
+    return {key: np.concatenate([part[key] for part in parts]) for key in METRICS}
+
+def run_ma_sweep(
+    close: np.ndarray,
+    short_windows: Sequence[int],
+    long_windows: Sequence[int],
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate the MA crossover strategy for every (short, long) window pair
+
+    Args:
+        close: Close prices in time order
+        short_windows: Short-term moving average windows
+        long_windows: Long-term moving average windows
+        max_workers: Chunks a large grid is split into for the shared
+            process pool (default: its size, 1 computes in-process)
+
+    Returns:
+        One metrics dictionary per pair, short window varying slowest
+    """
+    close = np.asarray(close, dtype=float)
+    pairs = np.array([(s, l) for s in short_windows for l in long_windows], dtype=np.int64).reshape(-1, 2)
+    if len(close) == 0 or len(pairs) == 0:
+        return []
+
+    max_workers = max_workers or parallel_pool.workers
+    if max_workers > 1 and len(pairs) * len(close) >= SWEEP_PARALLEL_CELLS:
+        chunks = np.array_split(pairs, min(max_workers, len(pairs)))
+        parts = parallel_pool.map(_sweep_pairs, [close] * len(chunks), chunks)
+        metrics = {key: np.concatenate([part[key] for part in parts]) for key in METRICS}
+    else:
+        metrics = _sweep_pairs(close, pairs)
+
+    results = []
+    for i, (short_window, long_window) in enumerate(pairs.tolist()):
+        sharpe = metrics['sharpe_ratio'][i]
+        results.append({
+            'short_window': short_window,
+            'long_window': long_window,
+            'total_returns': float(metrics['total_returns'][i]),
+            'win_rate': float(metrics['win_rate'][i]),
+            'total_trades': int(metrics['total_trades'][i]),
+            'profitable_trades': int(metrics['profitable_trades'][i]),
+            'losing_trades': int(metrics['losing_trades'][i]),
+            'average_win': float(metrics['average_win'][i]),
+            'average_loss': float(metrics['average_loss'][i]),
+            'max_drawdown': float(metrics['max_drawdown'][i]),
+            'sharpe_ratio': None if np.isnan(sharpe) else float(sharpe),
+        })
+    return results
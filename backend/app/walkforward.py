@@ -0,0 +1,275 @@
+"""
+Walk-forward optimization of the MA crossover windows.
+
+The series is split into consecutive folds of train_bars followed by
+test_bars (rolling, or anchored at the first bar). On every train fold
+the whole (short_window, long_window) grid is scored and the best pair is
+then backtested on the fold's test bars, which it has never seen; the
+test folds stitched together give the out-of-sample performance. Each
+test fold is seeded with the last in-sample bar, so its first bar earns
+the return of the position held going into it, as in a backtest of the
+whole series.
+
+Moving averages are computed once, over the full series, from one
+cumulative sum (sweep.rolling_means), and every fold works on slices of
+them. Since signals are +/-1, a pair's summed strategy return over a fold
+is a dot product with the bar returns and its sum of squares is the same
+for every pair, so Sharpe ratios and total returns of a whole block of
+pairs are one matrix product. Large jobs spread chunks of folds over the
+shared process pool, each chunk shipped with the moving averages.
+
+Run from backend/ against the database:
+    python -m app.walkforward --instrument HINDALCO --train-bars 756 --test-bars 252
+"""
+import argparse
+import asyncio
+import json
+import time
+from itertools import repeat
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.executor import parallel_pool
+from app.sweep import METRICS, SWEEP_PARALLEL_CELLS, evaluate_signals, rolling_means
+
+OBJECTIVES = ("sharpe_ratio", "total_returns")
+
+
+class Fold(NamedTuple):
+    train_start: int
+    train_end: int
+    test_start: int
+    test_end: int
+
+
+def walk_forward_folds(n: int, train_bars: int, test_bars: int, step: Optional[int] = None, anchored: bool = False) -> List[Fold]:
+    """
+    [start, end) bar ranges of each fold
+
+    Folds advance by `step` bars (default: test_bars, so test folds tile
+    the series); anchored folds always train from bar 0.
+
+    Raises:
+        ValueError: Invalid sizes or a series shorter than one fold
+    """
+    step = step or test_bars
+    if train_bars < 2 or test_bars < 1 or step < 1:
+        raise ValueError("train_bars must be at least 2, test_bars and step at least 1")
+    if n < train_bars + test_bars:
+        raise ValueError(f"{n} bars are fewer than one fold ({train_bars} train + {test_bars} test)")
+    folds = []
+    for train_end in range(train_bars, n - test_bars + 1, step):
+        train_start = 0 if anchored else train_end - train_bars
+        folds.append(Fold(train_start, train_end, train_end, train_end + test_bars))
+    return folds
+
+
+def score_grid(
+    close: np.ndarray,
+    short_means: np.ndarray,
+    long_means: np.ndarray,
+    start: int,
+    end: int,
+    objective: str = "sharpe_ratio"
+) -> np.ndarray:
+    """
+    Objective of every (short, long) pair over bars [start, end)
+
+    Same definitions as evaluate_signals: the first bar of the range earns
+    nothing and the Sharpe ratio uses all end - start strategy returns.
+
+    Returns:
+        Array of shape (len(short_means), len(long_means)); NaN where the
+        objective is undefined (zero volatility)
+    """
+    bars = end - start
+    returns = close[start + 1:end] / close[start:end - 1] - 1
+    # Long on a bar earns log(1 + r) on the next one, short earns log(1 - r)
+    log_long = np.log(np.maximum(1 + returns, 1e-300))
+    log_short = np.log(np.maximum(1 - returns, 1e-300))
+    weights = np.column_stack((returns, log_long - log_short))
+    long_block = long_means[:, start:end - 1]
+
+    scores = np.empty((len(short_means), len(long_means)))
+    sum_squares = returns @ returns
+    for row, short_mean in enumerate(short_means[:, start:end - 1]):
+        held = (short_mean > long_block).astype(np.float64)
+        held_returns, held_log = (held @ weights).T
+        if objective == "total_returns":
+            scores[row] = (np.exp(held_log + log_short.sum()) - 1) * 100
+        else:
+            mean = (2 * held_returns - returns.sum()) / bars
+            variance = (sum_squares - bars * mean ** 2) / (bars - 1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores[row] = np.where(variance > 1e-300, mean / np.sqrt(variance) * np.sqrt(252), np.nan)
+    return scores
+
+
+def _best_pairs(
+    close: np.ndarray,
+    short_means: np.ndarray,
+    long_means: np.ndarray,
+    folds: Sequence[Fold],
+    objective: str
+) -> List[Tuple[int, int, float]]:
+    """(short index, long index, train score) of the best pair on each fold's train range."""
+    best = []
+    for fold in folds:
+        scores = score_grid(close, short_means, long_means, fold.train_start, fold.train_end, objective)
+        if np.isnan(scores).all():
+            best.append((0, 0, float("nan")))
+            continue
+        short_index, long_index = np.unravel_index(np.nanargmax(scores), scores.shape)
+        best.append((int(short_index), int(long_index), float(scores[short_index, long_index])))
+    return best
+
+
+def _metrics(values: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    metrics = {key: values[key][0].item() for key in METRICS}
+    if np.isnan(metrics["sharpe_ratio"]):
+        metrics["sharpe_ratio"] = None
+    return metrics
+
+
+def run_walk_forward(
+    datetimes: Any,
+    close: np.ndarray,
+    short_windows: Sequence[int],
+    long_windows: Sequence[int],
+    train_bars: int,
+    test_bars: int,
+    step: Optional[int] = None,
+    anchored: bool = False,
+    objective: str = "sharpe_ratio",
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Walk-forward optimization of the MA crossover over a window grid
+
+    Args:
+        datetimes: Bar timestamps, aligned with close
+        close: Close prices in time order
+        short_windows / long_windows: Window grid searched on each train fold
+        train_bars / test_bars / step / anchored: Fold layout, see walk_forward_folds
+        objective: Train-fold score to maximize, "sharpe_ratio" or "total_returns"
+        max_workers: Chunks of folds a large job is split into for the
+            shared process pool (default: its size, 1 runs in-process)
+
+    Returns:
+        Per-fold chosen windows, train score and test metrics, plus the
+        metrics of the stitched out-of-sample test folds
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    close = np.asarray(close, dtype=np.float64)
+    folds = walk_forward_folds(len(close), train_bars, test_bars, step, anchored)
+    windows = np.unique(np.concatenate((short_windows, long_windows)))
+    means = rolling_means(close, windows)
+    short_means = means[np.searchsorted(windows, short_windows)]
+    long_means = means[np.searchsorted(windows, long_windows)]
+
+    cells = sum(fold.train_end - fold.train_start for fold in folds) * len(short_windows) * len(long_windows)
+    max_workers = min(max_workers or parallel_pool.workers, len(folds))
+    if max_workers > 1 and cells >= SWEEP_PARALLEL_CELLS:
+        chunks = [list(chunk) for chunk in np.array_split(np.arange(len(folds)), max_workers)]
+        parts = parallel_pool.map(
+            _best_pairs, repeat(close), repeat(short_means), repeat(long_means),
+            [[folds[i] for i in chunk] for chunk in chunks], repeat(objective)
+        )
+        best = [pair for part in parts for pair in part]
+    else:
+        best = _best_pairs(close, short_means, long_means, folds, objective)
+
+    dates = pd.DatetimeIndex(datetimes)
+    results = []
+    stitched = []
+    for fold, (short_index, long_index, train_score) in zip(folds, best):
+        # Seeded with the last in-sample bar: its close and signal give the first test bar's return
+        seeded = slice(fold.test_start - 1, fold.test_end)
+        test_close = close[seeded]
+        signal = np.where(short_means[short_index, seeded] > long_means[long_index, seeded], 1, -1).astype(np.int8)
+        stitched.append(signal[:-1] * (test_close[1:] / test_close[:-1] - 1))
+        results.append({
+            "train_start": dates[fold.train_start].isoformat(),
+            "train_end": dates[fold.train_end - 1].isoformat(),
+            "test_start": dates[fold.test_start].isoformat(),
+            "test_end": dates[fold.test_end - 1].isoformat(),
+            "short_window": int(short_windows[short_index]),
+            "long_window": int(long_windows[long_index]),
+            "train_score": None if np.isnan(train_score) else train_score,
+            "test": _metrics(evaluate_signals(test_close, signal[None, :], seeded=True)),
+        })
+
+    returns = np.concatenate(stitched)
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(equity)
+    std = returns.std(ddof=1) if len(returns) > 1 else 0.0
+    return {
+        "objective": objective,
+        "folds": results,
+        "out_of_sample": {
+            "bars": len(returns),
+            "total_returns": float((equity[-1] - 1) * 100),
+            "max_drawdown": float(((peak - equity) / peak).max() * 100),
+            "sharpe_ratio": float(returns.mean() / std * np.sqrt(252)) if std > 0 else None,
+            "total_trades": sum(fold["test"]["total_trades"] for fold in results),
+        },
+    }
+
+
+async def _load(instrument: str) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    from app.bar_cache import load_price_arrays
+    from app.database import get_prisma_client
+
+    async with get_prisma_client() as prisma:
+        series = await load_price_arrays(prisma, instrument)
+    return series.datetimes, series.close
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instrument", required=True)
+    parser.add_argument("--short", type=int, nargs=3, default=[5, 50, 5], metavar=("MIN", "MAX", "STEP"))
+    parser.add_argument("--long", type=int, nargs=3, default=[20, 200, 10], metavar=("MIN", "MAX", "STEP"))
+    parser.add_argument("--train-bars", type=int, default=756)
+    parser.add_argument("--test-bars", type=int, default=252)
+    parser.add_argument("--step", type=int, default=None)
+    parser.add_argument("--anchored", action="store_true")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="sharpe_ratio")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args()
+
+    datetimes, close = asyncio.run(_load(args.instrument))
+    if len(close) == 0:
+        raise SystemExit(f"No stock data found for {args.instrument}")
+    start = time.perf_counter()
+    result = run_walk_forward(
+        datetimes, close,
+        list(range(args.short[0], args.short[1] + 1, args.short[2])),
+        list(range(args.long[0], args.long[1] + 1, args.long[2])),
+        args.train_bars, args.test_bars, args.step, args.anchored, args.objective, args.workers
+    )
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for fold in result["folds"]:
+        print(
+            f"{fold['test_start'][:10]} .. {fold['test_end'][:10]}  "
+            f"windows {fold['short_window']:>3}/{fold['long_window']:<3}  "
+            f"test return {fold['test']['total_returns']:8.2f}%  trades {fold['test']['total_trades']}"
+        )
+    summary = result["out_of_sample"]
+    sharpe = "n/a" if summary["sharpe_ratio"] is None else f"{summary['sharpe_ratio']:.2f}"
+    print(
+        f"out of sample: {summary['bars']} bars, return {summary['total_returns']:.2f}%, "
+        f"max drawdown {summary['max_drawdown']:.2f}%, sharpe {sharpe}  ({elapsed:.2f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
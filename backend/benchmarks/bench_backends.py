@@ -0,0 +1,57 @@
+"""
+Compare the pandas, NumPy and compiled (Numba) backtest backends.
+
+Each backend runs the full MA crossover on a synthetic random walk for every
+bar count; the compiled backend is timed after a warm-up call so JIT
+compilation is excluded. Backends that are not installed are skipped.
+
+Usage (from backend/):
+    python -m benchmarks.bench_backends --bars 10000 1000000 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.kernels import BACKENDS, HAS_NUMBA
+from app.strategy import run_ma_backtest
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--short-window", type=int, default=20)
+    parser.add_argument("--long-window", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backends = [backend for backend in BACKENDS if backend != "numba" or HAS_NUMBA]
+    rng = np.random.default_rng(0)
+    for bars in args.bars:
+        close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+        datetimes = pd.date_range("2000-01-01", periods=bars, freq="min")
+
+        def backtest(backend):
+            return run_ma_backtest(datetimes, close, args.short_window, args.long_window, backend=backend)
+
+        print(f"bars={bars:,} trades={backtest('numpy')['total_trades']:,}")
+        baseline = None
+        for backend in backends:
+            backtest(backend)
+            elapsed = best_of(lambda: backtest(backend), args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {backend:<8} {elapsed * 1000:10.1f} ms  ({baseline / elapsed:.1f}x vs pandas)")
+
+
+if __name__ == "__main__":
+    main()
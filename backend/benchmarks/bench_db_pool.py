@@ -0,0 +1,65 @@
+"""
+Compare query latency of a per-request Prisma client against the shared pool.
+
+Usage (from backend/, with DATABASE_URL pointing at a seeded database):
+    python -m benchmarks.bench_db_pool --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from prisma import Prisma
+
+from app.database import build_database_url, connect_prisma, disconnect_prisma, prisma
+
+
+async def per_request_query() -> float:
+    # Old behaviour: spawn an engine and handshake for every request
+    start = time.perf_counter()
+    client = Prisma(datasource={"url": build_database_url()})
+    await client.connect()
+    try:
+        await client.stockdata.find_first()
+    finally:
+        await client.disconnect()
+    return time.perf_counter() - start
+
+
+async def shared_query() -> float:
+    start = time.perf_counter()
+    await prisma.stockdata.find_first()
+    return time.perf_counter() - start
+
+
+async def run(query, requests: int, concurrency: int) -> np.ndarray:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with semaphore:
+            return await query()
+
+    return np.array(await asyncio.gather(*(one() for _ in range(requests))))
+
+
+def report(name: str, latencies: np.ndarray) -> None:
+    p50, p99 = np.percentile(latencies * 1000, [50, 99])
+    print(f"{name:<12} n={len(latencies):<5} p50={p50:8.2f} ms  p99={p99:8.2f} ms")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    report("per-request", await run(per_request_query, args.requests, args.concurrency))
+    await connect_prisma()
+    try:
+        report("shared pool", await run(shared_query, args.requests, args.concurrency))
+    finally:
+        await disconnect_prisma()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""
+Measure bulk ingestion throughput (rows per second) against a running API.
+
+Every run uses a fresh instrument name, so the first pass measures inserts
+and the second pass measures the skip-duplicates path.
+
+Usage (from backend/, with the API running):
+    python -m benchmarks.bench_ingest --url http://localhost:8000 --rows 100000
+"""
+import argparse
+import io
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+
+def make_rows(count: int, instrument: str):
+    rng = np.random.default_rng(0)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.001, count))
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            "datetime": (start + timedelta(minutes=i)).isoformat(),
+            "open": float(price), "high": float(price * 1.001),
+            "low": float(price * 0.999), "close": float(price),
+            "volume": 1000 + i, "instrument": instrument,
+        }
+        for i, price in enumerate(close)
+    ]
+
+
+def encode(rows, body_format: str):
+    if body_format == "json":
+        return json.dumps(rows).encode(), "application/json"
+    if body_format == "ndjson":
+        return "".join(json.dumps(row) + "\n" for row in rows).encode(), "application/x-ndjson"
+    buffer = io.StringIO()
+    buffer.write(",".join(rows[0]) + "\n")
+    for row in rows:
+        buffer.write(",".join(str(value) for value in row.values()) + "\n")
+    return buffer.getvalue().encode(), "text/csv"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=None) as client:
+        for method in ("copy", "insert"):
+            for body_format in ("json", "ndjson", "csv"):
+                rows = make_rows(args.rows, f"BENCH-{uuid.uuid4().hex[:8]}")
+                body, content_type = encode(rows, body_format)
+                for attempt in ("insert", "re-run"):
+                    start = time.perf_counter()
+                    response = client.post(
+                        "/data/bulk",
+                        params={"method": method, "batch_size": args.batch_size},
+                        content=body,
+                        headers={"content-type": content_type},
+                    )
+                    elapsed = time.perf_counter() - start
+                    response.raise_for_status()
+                    result = response.json()
+                    print(
+                        f"{result['method']:<7} {body_format:<7} {attempt:<7} "
+                        f"inserted={result['inserted']:<8} skipped={result['skipped']:<8} "
+                        f"{args.rows / elapsed:12,.0f} rows/s"
+                    )
+
+
+if __name__ == "__main__":
+    main()
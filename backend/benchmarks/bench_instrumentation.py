@@ -0,0 +1,112 @@
+"""
+Measure the overhead of request and stage instrumentation (app.metrics).
+
+Times a timed() stage and a histogram observation on their own, an
+in-process ASGI request to a small route without the middleware, with it,
+and with Server-Timing, and a backtest with stage recording on and off.
+
+Usage (from backend/):
+    python -m benchmarks.bench_instrumentation --requests 5000
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+
+from app import metrics
+from app.metrics import Histogram, MetricsMiddleware, timed
+from app.serialization import ORJSONResponse
+from app.strategy import run_ma_backtest
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def make_app(middleware: bool, server_timing: bool = False) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    if middleware:
+        app.add_middleware(MetricsMiddleware, enabled=True, server_timing=server_timing)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id, "close": 101.5}
+
+    return app
+
+
+def asgi_requests(app: FastAPI, count: int) -> None:
+    """Send `count` GET requests straight to the ASGI app, without a server or client."""
+    async def run():
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        for i in range(count):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": f"/items/{i}", "raw_path": f"/items/{i}".encode(), "query_string": b"",
+                "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+            }
+            await app(scope, receive, send)
+
+    asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--bars", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    def stages():
+        for _ in range(args.calls):
+            with timed("bench"):
+                pass
+
+    histogram = Histogram("bench_seconds", "Benchmark", ("route",))
+    observe = lambda: [histogram.observe(0.003, "/items/{item_id}") for _ in range(args.calls)]
+    print(f"per call ({args.calls:,} calls)")
+    print(f"  timed() stage            {best_of(stages, args.repeat) / args.calls * 1e9:8.0f} ns")
+    metrics.METRICS_ENABLED = False
+    print(f"  timed(), disabled        {best_of(stages, args.repeat) / args.calls * 1e9:8.0f} ns")
+    metrics.METRICS_ENABLED = True
+    print(f"  Histogram.observe        {best_of(observe, args.repeat) / args.calls * 1e9:8.0f} ns")
+
+    print(f"\nASGI request ({args.requests:,} requests)")
+    apps = [
+        ("no middleware", make_app(False)),
+        ("metrics", make_app(True)),
+        ("metrics + Server-Timing", make_app(True, server_timing=True)),
+    ]
+    baseline = None
+    for name, app in apps:
+        seconds = best_of(lambda: asgi_requests(app, args.requests), args.repeat) / args.requests
+        baseline = seconds if baseline is None else baseline
+        print(f"  {name:<24} {seconds * 1e6:8.1f} us  ({(seconds - baseline) * 1e6:+.1f} us)")
+
+    close = 100.0 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, args.bars))
+    datetimes = pd.date_range("2000-01-01", periods=args.bars, freq="min")
+    print(f"\nbacktest, numpy backend ({args.bars:,} bars)")
+    metrics.METRICS_ENABLED = False
+    off = best_of(lambda: run_ma_backtest(datetimes, close, 10, 30, backend="numpy"), args.repeat)
+    metrics.METRICS_ENABLED = True
+    on = best_of(lambda: run_ma_backtest(datetimes, close, 10, 30, backend="numpy"), args.repeat)
+    print(f"  stages off               {off * 1000:8.2f} ms")
+    print(f"  stages on                {on * 1000:8.2f} ms  ({(on / off - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark per-instrument query latency on a multi-instrument table.
+
+Loads --instruments synthetic instruments x --years of daily bars (252 per
+year) with COPY, then times the /strategy/performance and /data queries
+through Prisma and prints the Postgres plan for each.
+
+Usage (from backend/, against a scratch database):
+    python -m benchmarks.bench_queries --instruments 100 --years 10
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import psycopg2
+
+from app.database import connect_prisma, disconnect_prisma, libpq_dsn, prisma
+from app.ingest import CopyBatchWriter, StagingPool
+from app.pagination import fetch_page
+from app.prices import fetch_price_arrays
+from app.schemas import StockDataCreate
+
+PREFIX = "BENCHQ"
+
+
+async def load(instruments: int, bars: int) -> None:
+    pool = StagingPool(size=1)
+    writer = CopyBatchWriter(pool)
+    rng = np.random.default_rng(0)
+    start = datetime(2000, 1, 3)
+    try:
+        for i in range(instruments):
+            close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+            rows = [
+                StockDataCreate.model_construct(
+                    datetime=start + timedelta(days=day), open=price, high=price,
+                    low=price, close=price, volume=1000, instrument=f"{PREFIX}{i:03d}"
+                )
+                for day, price in enumerate(close.tolist())
+            ]
+            await writer.write(rows)
+    finally:
+        await writer.close()
+        await pool.close()
+    with psycopg2.connect(libpq_dsn()) as connection, connection.cursor() as cursor:
+        cursor.execute('ANALYZE "StockData"')
+
+
+def explain(sql: str, params) -> str:
+    with psycopg2.connect(libpq_dsn()) as connection, connection.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql, params)
+        return cursor.fetchone()[0]
+
+
+async def timed(query, repeat: int) -> np.ndarray:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await query()
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+async def run(args) -> None:
+    instrument = f"{PREFIX}{args.instruments // 2:03d}"
+    year_start, year_end = datetime(2005, 1, 1), datetime(2005, 12, 31)
+    queries = {
+        "full history": (
+            lambda: fetch_price_arrays(prisma, instrument),
+            'SELECT * FROM "StockData" WHERE instrument = %s ORDER BY instrument, datetime',
+            (instrument,),
+        ),
+        "one year": (
+            lambda: fetch_price_arrays(prisma, instrument, year_start, year_end),
+            'SELECT * FROM "StockData" WHERE instrument = %s AND datetime BETWEEN %s AND %s '
+            'ORDER BY instrument, datetime',
+            (instrument, year_start, year_end),
+        ),
+        "page of 500": (
+            lambda: fetch_page(prisma, 500, instrument=instrument),
+            'SELECT * FROM "StockData" WHERE instrument = %s ORDER BY instrument, datetime LIMIT 500',
+            (instrument,),
+        ),
+    }
+
+    await connect_prisma()
+    try:
+        for name, (query, sql, params) in queries.items():
+            latencies = await timed(query, args.repeat)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{name:<14} p50={p50:8.2f} ms  p99={p99:8.2f} ms  plan: {explain(sql, params)}")
+    finally:
+        await disconnect_prisma()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--instruments", type=int, default=100)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip-load", action="store_true", help="Reuse rows from a previous run")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        start = time.perf_counter()
+        asyncio.run(load(args.instruments, args.years * 252))
+        print(f"loaded {args.instruments * args.years * 252:,} rows in {time.perf_counter() - start:.1f}s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark rows per second of the Prisma read path vs the raw-driver COPY path.
+
+Loads --bars daily bars of one synthetic instrument with COPY, then reads
+its (datetime, close) columns through fetch_price_arrays on Prisma and
+through app.raw_db with psycopg2 and, if installed, asyncpg.
+--decode-only skips the database and times decode_copy on a synthetic
+binary COPY stream.
+
+Usage (from backend/, against a scratch database):
+    python -m benchmarks.bench_raw_reads --bars 1000000
+    python -m benchmarks.bench_raw_reads --bars 10000000 --decode-only
+"""
+import argparse
+import asyncio
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Tuple
+
+import numpy as np
+
+from app.raw_db import COPY_SIGNATURE, POSTGRES_EPOCH_US, RawReader, asyncpg, decode_copy
+
+INSTRUMENT = "BENCHRAW"
+
+
+def synthetic_stream(bars: int) -> bytes:
+    rng = np.random.default_rng(0)
+    micros = int(datetime(2000, 1, 3).timestamp() * 1_000_000) - POSTGRES_EPOCH_US + np.arange(bars) * 86_400_000_000
+    records = np.empty(bars, dtype=[("count", ">i2"), ("dl", ">i4"), ("datetime", ">i8"), ("cl", ">i4"), ("close", ">f8")])
+    records["count"], records["dl"], records["cl"] = 2, 8, 8
+    records["datetime"] = micros
+    records["close"] = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    return COPY_SIGNATURE + struct.pack(">ii", 0, 0) + records.tobytes() + struct.pack(">h", -1)
+
+
+async def load(bars: int) -> None:
+    from app.ingest import CopyBatchWriter, StagingPool
+    from app.schemas import StockDataCreate
+
+    pool = StagingPool(size=1)
+    writer = CopyBatchWriter(pool)
+    rng = np.random.default_rng(0)
+    start = datetime(2000, 1, 3)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    try:
+        for offset in range(0, bars, 100_000):
+            await writer.write([
+                StockDataCreate.model_construct(
+                    datetime=start + timedelta(days=day), open=price, high=price,
+                    low=price, close=price, volume=1000, instrument=INSTRUMENT
+                )
+                for day, price in enumerate(close[offset:offset + 100_000].tolist(), start=offset)
+            ])
+    finally:
+        await writer.close()
+        await pool.close()
+
+
+def report(name: str, rows: int, seconds: np.ndarray) -> None:
+    best = seconds.min()
+    print(f"{name:<10} rows={rows:>11,}  best={best * 1000:9.1f} ms  {rows / best:>14,.0f} rows/s")
+
+
+async def timed(read, repeat: int) -> Tuple[int, np.ndarray]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(await read())
+        timings.append(time.perf_counter() - start)
+    return rows, np.array(timings)
+
+
+async def run(args) -> None:
+    from app import prices
+    from app.database import connect_prisma, disconnect_prisma, prisma
+
+    readers = [RawReader("psycopg2")] + ([RawReader("asyncpg")] if asyncpg is not None else [])
+    # fetch_price_arrays consults the module-level reader, pinned to Prisma here
+    prices.raw_reader = RawReader("prisma")
+
+    async def read_prisma():
+        return (await prices.fetch_price_arrays(prisma, INSTRUMENT)).close
+
+    await connect_prisma()
+    try:
+        report("prisma", *await timed(read_prisma, args.repeat))
+        for reader in readers:
+            async def read_raw(reader=reader):
+                return (await reader.fetch_columns(("datetime", "close"), INSTRUMENT))["close"]
+
+            report(reader.driver, *await timed(read_raw, args.repeat))
+    finally:
+        for reader in readers:
+            await reader.close()
+        await disconnect_prisma()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--decode-only", action="store_true", help="Time decode_copy on a synthetic stream, no database")
+    parser.add_argument("--skip-load", action="store_true", help="Reuse rows from a previous run")
+    args = parser.parse_args()
+
+    if args.decode_only:
+        stream = synthetic_stream(args.bars)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            decode_copy(stream, ["datetime", "close"])
+            timings.append(time.perf_counter() - start)
+        report("decode", args.bars, np.array(timings))
+        return
+
+    if not args.skip_load:
+        start = time.perf_counter()
+        asyncio.run(load(args.bars))
+        print(f"loaded {args.bars:,} rows in {time.perf_counter() - start:.1f}s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Time response encoding and measure bytes on the wire for large responses.
+
+Compares, for N stock rows (/data) and a strategy result with N trades
+(/strategy/performance): Pydantic response_model validation plus
+FastAPI's jsonable_encoder and json, plain dicts with json, and
+app.serialization.dumps (orjson when installed); then the size and
+compression time of the encoded body with gzip and zstd (if installed).
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --rows 100000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.pagination import stock_to_dict
+from app.schemas import StockData, StrategyPerformance
+from app.serialization import available_encodings, compress, dumps, orjson
+
+
+def make_rows(count: int) -> list:
+    rng = np.random.default_rng(0)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, count))
+    start = datetime(2015, 1, 1, 9, 15)
+    return [
+        SimpleNamespace(
+            id=i + 1, datetime=start + timedelta(minutes=i), open=float(price), high=float(price) * 1.001,
+            low=float(price) * 0.999, close=float(price), volume=int(1000 + i % 500), instrument="HINDALCO"
+        )
+        for i, price in enumerate(close)
+    ]
+
+
+def make_performance(trades: int) -> dict:
+    start = datetime(2015, 1, 1)
+    return {
+        "total_returns": 12.5, "win_rate": 48.0, "total_trades": trades, "profitable_trades": trades // 2,
+        "losing_trades": trades - trades // 2, "average_win": 1.2, "average_loss": -0.9,
+        "max_drawdown": 20.0, "sharpe_ratio": 0.8,
+        "trades": [
+            {
+                "entry_date": (start + timedelta(hours=2 * i)).isoformat(),
+                "exit_date": (start + timedelta(hours=2 * i + 1)).isoformat(),
+                "entry_price": 100.0 + i % 17, "exit_price": 101.0 + i % 13,
+                "profit_pct": (i % 7 - 3) * 0.37, "type": "long",
+            }
+            for i in range(trades)
+        ],
+    }
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name: str, seconds: float, baseline: float) -> None:
+    print(f"  {name:<34} {seconds * 1000:9.1f} ms  ({baseline / seconds:5.1f}x)")
+
+
+def report_wire(body: bytes, repeat: int) -> None:
+    print(f"  {'identity':<34} {len(body) / 1e6:9.2f} MB")
+    for encoding in available_encodings(["gzip", "zstd"]):
+        compressed = compress(body, encoding)
+        seconds = best_of(lambda: compress(body, encoding), repeat)
+        print(f"  {encoding:<34} {len(compressed) / 1e6:9.2f} MB  {len(body) / len(compressed):5.1f}:1  {seconds * 1000:7.1f} ms")
+    if "zstd" not in available_encodings(["zstd"]):
+        print(f"  {'zstd':<34}       n/a  (zstandard not installed)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+
+    rows = make_rows(args.rows)
+    adapter = TypeAdapter(List[StockData])
+    validated = lambda: json.dumps(jsonable_encoder(adapter.validate_python(rows, from_attributes=True))).encode()
+    plain = lambda: json.dumps([stock_to_dict(row) for row in rows]).encode()
+    fast = lambda: dumps([stock_to_dict(row) for row in rows])
+    columns = {
+        "datetime": np.array([row.datetime for row in rows], dtype="datetime64[ms]"),
+        "close": np.array([row.close for row in rows]),
+        "volume": np.array([row.volume for row in rows]),
+    }
+    print(f"\n/data, {args.rows:,} rows")
+    baseline = best_of(validated, args.repeat)
+    report("response_model + jsonable_encoder", baseline, baseline)
+    report("dicts + json", best_of(plain, args.repeat), baseline)
+    report("dicts + dumps", best_of(fast, args.repeat), baseline)
+    report("NumPy columns + dumps (3 fields)", best_of(lambda: dumps(columns), args.repeat), baseline)
+    report_wire(fast(), args.repeat)
+
+    performance = make_performance(args.rows)
+    adapter = TypeAdapter(StrategyPerformance)
+    print(f"\n/strategy/performance, {args.rows:,} trades")
+    baseline = best_of(lambda: json.dumps(jsonable_encoder(performance)).encode(), args.repeat)
+    report("jsonable_encoder + json", baseline, baseline)
+    report("response_model + jsonable_encoder", best_of(
+        lambda: json.dumps(jsonable_encoder(adapter.validate_python(performance))).encode(), args.repeat
+    ), baseline)
+    report("dumps (trusted_response)", best_of(lambda: dumps(performance), args.repeat), baseline)
+    report_wire(dumps(performance), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
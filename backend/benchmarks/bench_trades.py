@@ -0,0 +1,62 @@
+"""
+Time trade extraction: reference per-bar loop vs vectorized NumPy pairing,
+and a full backtest returning trades as records, columns or not at all.
+
+Usage (from backend/):
+    python -m benchmarks.bench_trades --bars 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.strategy import extract_trades, run_ma_backtest, _extract_trades_loop
+
+
+def make_series(bars: int, short_window: int = 10, long_window: int = 30):
+    rng = np.random.default_rng(0)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    datetimes = pd.Series(pd.date_range("2000-01-01", periods=bars, freq="min"))
+    series = pd.Series(close)
+    signal = pd.Series(np.where(
+        series.rolling(short_window, min_periods=1).mean() > series.rolling(long_window, min_periods=1).mean(),
+        1, -1
+    ))
+    return datetimes, close, np.sign(signal.diff()).to_numpy()
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    datetimes, close, position = make_series(args.bars)
+    loop = best_of(lambda: _extract_trades_loop(datetimes, close, position), args.repeat)
+    vectorized = best_of(lambda: extract_trades(datetimes, close, position), args.repeat)
+    trades = len(extract_trades(datetimes, close, position))
+
+    print(f"bars={args.bars} trades={trades}")
+    print(f"loop        {loop * 1000:10.1f} ms")
+    print(f"vectorized  {vectorized * 1000:10.1f} ms  ({loop / vectorized:.1f}x)")
+
+    print("backtest (numpy backend) by trade detail")
+    for detail in ("records", "columns", "none"):
+        seconds = best_of(
+            lambda: run_ma_backtest(datetimes, close, 10, 30, backend="numpy", trades=detail), args.repeat
+        )
+        print(f"  {detail:<9} {seconds * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Time walk-forward optimization of the MA crossover on a synthetic daily series.
+
+The default is the sizing target: 20 years of daily bars (252 per year), a
+50 x 200 window grid (short 1..50, long 5..1000 step 5) and rolling folds of
+3 years train / 1 year test, once in-process and once across processes.
+
+Usage (from backend/):
+    python -m benchmarks.bench_walkforward
+    python -m benchmarks.bench_walkforward --years 40 --workers 1 4 8
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import walkforward
+from app.walkforward import run_walk_forward
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--shorts", type=int, default=50)
+    parser.add_argument("--longs", type=int, default=200)
+    parser.add_argument("--train-bars", type=int, default=756)
+    parser.add_argument("--test-bars", type=int, default=252)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bars = args.years * 252
+    rng = np.random.default_rng(0)
+    close = 100 * np.cumprod(1 + rng.normal(0.0003, 0.012, bars))
+    datetimes = pd.date_range("2000-01-03", periods=bars, freq="B", tz="UTC")
+    short_windows = list(range(1, args.shorts + 1))
+    long_windows = list(range(5, 5 * args.longs + 1, 5))
+    # Time the process pool whenever more than one worker is requested
+    walkforward.SWEEP_PARALLEL_CELLS = 0
+
+    print(f"{bars:,} bars, {len(short_windows)} x {len(long_windows)} grid")
+    for workers in args.workers:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = run_walk_forward(
+                datetimes, close, short_windows, long_windows,
+                args.train_bars, args.test_bars, max_workers=workers
+            )
+            timings.append(time.perf_counter() - start)
+        print(
+            f"workers={workers:<3} folds={len(result['folds']):<3} best={min(timings):7.2f}s  "
+            f"out-of-sample return {result['out_of_sample']['total_returns']:.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
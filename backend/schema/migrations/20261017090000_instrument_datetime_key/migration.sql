@@ -0,0 +1,5 @@
+-- DropIndex
+DROP INDEX "StockData_datetime_key";
+
+-- CreateIndex
+CREATE UNIQUE INDEX "StockData_instrument_datetime_key" ON "StockData"("instrument", "datetime");
@@ -0,0 +1,6 @@
+-- AlterTable
+ALTER TABLE "StockData" ALTER COLUMN "open" SET DATA TYPE DOUBLE PRECISION,
+ALTER COLUMN "high" SET DATA TYPE DOUBLE PRECISION,
+ALTER COLUMN "low" SET DATA TYPE DOUBLE PRECISION,
+ALTER COLUMN "close" SET DATA TYPE DOUBLE PRECISION,
+ALTER COLUMN "volume" SET DATA TYPE BIGINT;
@@ -0,0 +1,23 @@
+-- CreateTable
+CREATE TABLE "StrategyJob" (
+    "id" TEXT NOT NULL,
+    "kind" TEXT NOT NULL,
+    "params" JSONB NOT NULL,
+    "params_hash" TEXT NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'queued',
+    "progress" DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "result" JSONB,
+    "error" TEXT,
+    "created_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updated_at" TIMESTAMP(3) NOT NULL,
+    "started_at" TIMESTAMP(3),
+    "finished_at" TIMESTAMP(3),
+
+    CONSTRAINT "StrategyJob_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "StrategyJob_params_hash_key" ON "StrategyJob"("params_hash");
+
+-- CreateIndex
+CREATE INDEX "StrategyJob_status_created_at_idx" ON "StrategyJob"("status", "created_at");
@@ -0,0 +1,14 @@
+-- CreateTable
+CREATE TABLE "StockRollup" (
+    "instrument" TEXT NOT NULL,
+    "interval" TEXT NOT NULL,
+    "datetime" TIMESTAMP(3) NOT NULL,
+    "open" DOUBLE PRECISION NOT NULL,
+    "high" DOUBLE PRECISION NOT NULL,
+    "low" DOUBLE PRECISION NOT NULL,
+    "close" DOUBLE PRECISION NOT NULL,
+    "volume" BIGINT NOT NULL,
+    "bars" INTEGER NOT NULL,
+
+    CONSTRAINT "StockRollup_pkey" PRIMARY KEY ("instrument","interval","datetime")
+);
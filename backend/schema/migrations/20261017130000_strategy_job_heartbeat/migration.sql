@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "StrategyJob" ADD COLUMN     "heartbeat_at" TIMESTAMP(3);
@@ -0,0 +1,7 @@
+-- CreateTable
+CREATE TABLE "DataVersion" (
+    "instrument" TEXT NOT NULL,
+    "version" INTEGER NOT NULL DEFAULT 0,
+
+    CONSTRAINT "DataVersion_pkey" PRIMARY KEY ("instrument")
+);
@@ -2,17 +2,23 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from datetime import datetime
+import json
+import time
 
-client = TestClient(app)
+@pytest.fixture(scope="module")
+def client():
+    # Entering the client runs the lifespan hook that opens the shared pool
+    with TestClient(app) as test_client:
+        yield test_client
 
-def test_read_data():
+def test_read_data(client):
     """Test GET /data endpoint"""
     response = client.get("/data")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
 
-def test_create_data_valid():
+def test_create_data_valid(client):
     """Test POST /data endpoint with valid data"""
     test_data = {
         "datetime": datetime.now().isoformat(),
@@ -35,7 +41,7 @@ def test_create_data_valid():
         # If it fails, it should be because of duplicate
         assert "already exists" in response.json()["detail"]
 
-def test_create_data_invalid():
+def test_create_data_invalid(client):
     """Test POST /data endpoint with invalid data"""
     # Missing required fields
     test_data = {
@@ -49,7 +55,7 @@ def test_create_data_invalid():
     response = client.post("/data", json=test_data)
     assert response.status_code == 422  # Validation error
 
-def test_strategy_performance():
+def test_strategy_performance(client):
     """Test GET /strategy/performance endpoint"""
     response = client.get("/strategy/performance?short_window=10&long_window=30")
     
@@ -62,4 +68,536 @@ def test_strategy_performance():
         assert "trades" in data
     else:
         assert response.status_code == 404
-        assert "No stock data found" in response.json()["detail"]
\ No newline at end of file
+        assert "No stock data found" in response.json()["detail"]
+
+def test_db_health(client):
+    """Test GET /health/db reports the shared pool"""
+    client.get("/data")
+    response = client.get("/health/db")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["connected"] is True
+    assert data["connects"] == 1  # Requests reuse the lifespan connection
+    assert data["in_use"] == 0
+    assert data["checkouts"] >= 1
+
+def test_executor_health(client):
+    """Test GET /health/executor reports queue wait and compute time"""
+    client.get("/strategy/performance?start=2000-01-01T00:00:00")
+    response = client.get("/health/executor")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["kind"] in ("thread", "process")
+    assert data["in_flight"] <= data["workers"] + data["queue_limit"]
+    assert set(data["queue_wait"]) == set(data["compute"]) >= {"count", "p50_seconds", "p95_seconds"}
+
+def test_strategy_sweep(client):
+    """Test GET /strategy/sweep endpoint"""
+    response = client.get("/strategy/sweep?short_min=5&short_max=10&short_step=5&long_min=20&long_max=40&long_step=20")
+    
+    if response.status_code == 200:
+        data = response.json()
+        assert data["short_windows"] == [5, 10]
+        assert data["long_windows"] == [20, 40]
+        assert len(data["results"]) == 4
+        assert "sharpe_ratio" in data["results"][0]
+    else:
+        assert response.status_code == 404
+
+def test_strategy_sweep_rejects_empty_range(client):
+    """Test GET /strategy/sweep with an empty window range"""
+    response = client.get("/strategy/sweep?short_min=50&short_max=10")
+    assert response.status_code == 400
+
+def test_read_data_pagination(client):
+    """Test GET /data keyset pagination with limit and cursor"""
+    response = client.get("/data?limit=2")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) <= 2
+    
+    next_cursor = response.headers.get("X-Next-Cursor")
+    if next_cursor:
+        second_page = client.get(f"/data?limit=2&cursor={next_cursor}").json()
+        seen = {row["id"] for row in first_page}
+        assert not seen.intersection(row["id"] for row in second_page)
+
+def test_read_data_formats(client):
+    """Test GET /data in ndjson and columnar formats"""
+    response = client.get("/data?limit=5&format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) <= 5
+    
+    response = client.get("/data?limit=5&format=columnar")
+    assert response.status_code == 200
+    columns = response.json()
+    assert set(columns) >= {"datetime", "open", "high", "low", "close", "volume", "instrument"}
+    assert len(columns["close"]) == len(rows)
+    assert client.get("/data?format=columnar").status_code == 400
+
+def test_read_data_invalid_cursor(client):
+    """Test GET /data rejects a malformed cursor"""
+    response = client.get("/data?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+def test_bulk_ingest_is_idempotent(client):
+    """Test POST /data/bulk inserts once and skips re-sent rows"""
+    instrument = f"BULK-{datetime.now().timestamp()}"
+    rows = [
+        {
+            "datetime": datetime(2020, 1, day).isoformat(),
+            "open": 100.0, "high": 105.0, "low": 95.0, "close": 102.0,
+            "volume": 10000, "instrument": instrument
+        }
+        for day in range(1, 11)
+    ]
+    
+    first = client.post("/data/bulk?batch_size=4", json=rows)
+    assert first.status_code == 200
+    assert [batch["received"] for batch in first.json()["batches"]] == [4, 4, 2]
+    
+    ndjson = "\n".join(json.dumps(row) for row in rows)
+    second = client.post("/data/bulk", content=ndjson, headers={"content-type": "application/x-ndjson"})
+    assert second.status_code == 200
+    assert second.json()["inserted"] == 0
+    assert second.json()["skipped"] == len(rows)
+
+def test_bulk_ingest_csv_validation(client):
+    """Test POST /data/bulk reports the failing CSV row"""
+    body = "datetime,open,high,low,close,volume,instrument\n2020-01-01,abc,1,1,1,1,TEST\n"
+    response = client.post("/data/bulk", content=body, headers={"content-type": "text/csv"})
+    assert response.status_code == 422
+    assert "Row 1" in response.json()["detail"]
+
+def test_same_datetime_for_two_instruments(client):
+    """Test POST /data accepts one bar per instrument at the same datetime"""
+    timestamp = datetime.now().isoformat()
+    bar = {"datetime": timestamp, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1}
+    
+    first = client.post("/data", json={**bar, "instrument": "TEST-A"})
+    second = client.post("/data", json={**bar, "instrument": "TEST-B"})
+    duplicate = client.post("/data", json={**bar, "instrument": "TEST-A"})
+    
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert duplicate.status_code == 400
+    assert "already exists" in duplicate.json()["detail"]
+
+
+def test_create_data_high_volume(client):
+    """Test POST /data stores volumes beyond the 32-bit integer range"""
+    test_data = {
+        "datetime": datetime.now().isoformat(),
+        "open": 100.0,
+        "high": 105.0,
+        "low": 95.0,
+        "close": 102.0,
+        "volume": 5_000_000_000,
+        "instrument": "TEST-VOLUME"
+    }
+    
+    response = client.post("/data", json=test_data)
+    assert response.status_code == 200
+    assert response.json()["volume"] == 5_000_000_000
+    assert response.json()["close"] == 102.0
+
+def test_strategy_portfolio(client):
+    """Test GET /strategy/portfolio backtests each instrument separately"""
+    instrument = f"PORT-{datetime.now().timestamp()}"
+    rows = [
+        {
+            "datetime": datetime(2021, 1, day).isoformat(),
+            "open": 100.0 + day, "high": 101.0 + day, "low": 99.0 + day, "close": 100.0 + day,
+            "volume": 1000, "instrument": f"{instrument}-{suffix}"
+        }
+        for suffix in ("A", "B")
+        for day in range(1, 29)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    response = client.get(f"/strategy/portfolio?instruments={instrument}-A,{instrument}-B&short_window=2&long_window=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["instrument"] for item in data["instruments"]] == [f"{instrument}-A", f"{instrument}-B"]
+    assert all(item["bars"] == 28 for item in data["instruments"])
+    assert data["bars"] == 28
+    
+    assert client.get("/strategy/portfolio?instruments=NO-SUCH-INSTRUMENT").status_code == 404
+
+def test_strategy_job_lifecycle(client):
+    """Test POST/GET/DELETE /strategy/jobs with deduplication by parameters"""
+    params = {"short_min": 5, "short_max": 10, "long_min": 20, "long_max": 40, "long_step": 20,
+              "start": datetime.now().isoformat()}
+    first = client.post("/strategy/jobs", json={"kind": "sweep", "params": params})
+    assert first.status_code == 202
+    job = first.json()
+    assert job["status"] == "queued"
+    
+    # The same parameters (defaults spelled out) map to the same job; 202 only if it had already failed
+    duplicate = client.post("/strategy/jobs", json={"kind": "sweep", "params": {**params, "short_step": 5}})
+    assert duplicate.status_code in (200, 202)
+    assert duplicate.json()["id"] == job["id"]
+    
+    status = client.get(f"/strategy/jobs/{job['id']}")
+    assert status.status_code == 200
+    assert status.json()["status"] in ("queued", "running", "succeeded", "failed")
+    
+    cancelled = client.delete(f"/strategy/jobs/{job['id']}")
+    if cancelled.status_code == 200:
+        assert cancelled.json()["status"] == "cancelled"
+    else:
+        assert cancelled.status_code == 409
+
+def test_strategy_job_dedup_follows_new_bars(client):
+    """A job submitted again after new bars for its instrument is a new job, not the old result"""
+    instrument = f"JOBS-{datetime.now().timestamp()}"
+    row = {"open": 100.0, "high": 101.0, "low": 99.0, "close": 100.0, "volume": 1000, "instrument": instrument}
+    assert client.post("/data", json={**row, "datetime": datetime(2021, 1, 4).isoformat()}).status_code == 200
+    job = {"kind": "performance", "params": {"instrument": instrument, "short_window": 2, "long_window": 3}}
+    first = client.post("/strategy/jobs", json=job).json()
+    assert client.post("/strategy/jobs", json=job).json()["id"] == first["id"]
+    
+    assert client.post("/data", json={**row, "datetime": datetime(2021, 1, 5).isoformat()}).status_code == 200
+    assert client.post("/strategy/jobs", json=job).json()["id"] != first["id"]
+
+def test_strategy_job_validation(client):
+    """Test POST /strategy/jobs rejects invalid parameters and unknown jobs 404"""
+    response = client.post("/strategy/jobs", json={"kind": "sweep", "params": {"short_min": 50, "short_max": 10}})
+    assert response.status_code == 422
+    
+    response = client.post("/strategy/jobs", json={"kind": "unknown", "params": {}})
+    assert response.status_code == 422
+    
+    assert client.get("/strategy/jobs/no-such-job").status_code == 404
+    assert client.delete("/strategy/jobs/no-such-job").status_code == 404
+
+def test_bar_cache_appends_and_invalidates(client, tmp_path, monkeypatch):
+    """Test performance served from the bar cache follows appends and backfills"""
+    from app.bar_cache import bar_cache
+    monkeypatch.setattr(bar_cache, "directory", tmp_path)
+    instrument = f"BARS-{datetime.now().timestamp()}"
+    
+    def bars(days):
+        return [
+            {"datetime": datetime(2021, 1, day).isoformat(), "open": 100.0, "high": 101.0, "low": 99.0,
+             "close": 100.0 + (day % 7), "volume": 1000, "instrument": instrument}
+            for day in days
+        ]
+    
+    def performance(**params):
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        response = client.get(f"/strategy/performance?instrument={instrument}&short_window=2&long_window=5&{query}")
+        assert response.status_code == 200
+        return response.json()
+    
+    assert client.post("/data/bulk?method=insert", json=bars(range(10, 20))).status_code == 200
+    windowed = performance(start="2021-01-12T00:00:00", end="2021-01-18T00:00:00")
+    assert bar_cache.path(instrument).exists()
+    
+    # Newer rows are appended to the cached file
+    assert client.post("/data/bulk?method=insert", json=bars(range(20, 29))).status_code == 200
+    assert performance(start="2021-01-12T00:00:00", end="2021-01-18T00:00:00") == windowed
+    appended = performance(start="2021-01-01T00:00:00")
+    assert bar_cache.read(instrument).num_rows == 19
+    
+    # A backfill drops the file, which is rebuilt on the next read
+    assert client.post("/data/bulk?method=insert", json=bars(range(1, 10))).status_code == 200
+    assert not bar_cache.path(instrument).exists()
+    backfilled = performance(start="2021-01-01T00:00:00")
+    assert backfilled != appended
+    assert bar_cache.read(instrument).num_rows == 28
+    
+    bar_cache.enabled = False
+    try:
+        assert performance(start="2021-01-01T00:00:00") == backfilled
+    finally:
+        bar_cache.enabled = True
+
+def test_resample_and_chart(client):
+    """Test GET /data/resample aggregates bars and GET /data/chart decimates them"""
+    instrument = f"RESAMPLE-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2021, 1, 4 + day, 9 + hour).isoformat(), "open": 100.0 + hour, "high": 110.0 + hour,
+         "low": 90.0 - hour, "close": 101.0 + hour, "volume": 10 * (hour + 1), "instrument": instrument}
+        for day in range(10)
+        for hour in range(6)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    response = client.get(f"/data/resample?instrument={instrument}&interval=1d")
+    assert response.status_code == 200
+    bars = response.json()
+    assert len(bars) == 10
+    assert bars[0]["datetime"].startswith("2021-01-04T00:00:00")
+    assert (bars[0]["open"], bars[0]["high"], bars[0]["low"], bars[0]["close"]) == (100.0, 115.0, 85.0, 106.0)
+    assert bars[0]["volume"] == 210
+    
+    weekly = client.get(f"/data/resample?instrument={instrument}&interval=1w&format=columnar").json()
+    assert weekly["volume"] == [210 * 7, 210 * 3]
+    
+    chart = client.get(f"/data/chart?instrument={instrument}&points=12&method=minmax")
+    assert chart.status_code == 200
+    assert chart.json()["source_points"] == 60
+    assert len(chart.json()["close"]) <= 12
+    assert len(client.get(f"/data/chart?instrument={instrument}&points=20").json()["close"]) == 20
+    
+    assert client.get("/data/resample?interval=2d").status_code == 422
+    assert client.get("/data/chart").status_code == 422
+
+def test_resample_from_rollups(client):
+    """Test rollup-backed resampling matches raw resampling and follows new rows"""
+    from app.rollups import rollup_store
+    instrument = f"ROLLUP-{datetime.now().timestamp()}"
+    
+    def bars(days, close=101.0):
+        return [
+            {"datetime": datetime(2021, 1, day, 9 + hour).isoformat(), "open": 100.0 + hour, "high": 110.0 + hour,
+             "low": 90.0 - hour, "close": close + hour, "volume": 10 * (hour + 1), "instrument": instrument}
+            for day in days
+            for hour in range(6)
+        ]
+    
+    def resample(**params):
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        response = client.get(f"/data/resample?instrument={instrument}&{query}")
+        assert response.status_code == 200
+        return response.json()
+    
+    assert client.post("/data/bulk?method=insert", json=bars(range(4, 25))).status_code == 200
+    window = {"start": "2021-01-05T11:30:00", "end": "2021-01-20T10:00:00"}
+    rolled = [resample(interval=interval, **window) for interval in ("4h", "1d", "1w")]
+    assert rollup_store.stats()["ready_instruments"] >= 1 and rollup_store.stats()["reads"] >= 3
+    
+    intervals = rollup_store.intervals
+    rollup_store.intervals = []
+    try:
+        assert [resample(interval=interval, **window) for interval in ("4h", "1d", "1w")] == rolled
+    finally:
+        rollup_store.intervals = intervals
+    
+    # Rows added later refresh only the buckets they touch
+    assert client.post("/data/bulk?method=insert", json=bars(range(25, 28), close=200.0)).status_code == 200
+    weekly = resample(interval="1w", format="columnar")
+    assert weekly["close"][-1] == 205.0
+    assert sum(weekly["volume"]) == 210 * 24
+    
+    performance = client.get(f"/strategy/performance?instrument={instrument}&short_window=2&long_window=5&interval=1d")
+    assert performance.status_code == 200
+    assert client.get("/strategy/performance?short_window=2&long_window=5&interval=1d").status_code == 400
+    assert client.get("/cache/rollups").json()["intervals"] == ["1h", "1d", "1w"]
+
+def test_indicators(client):
+    """Test GET /indicators returns several indicators from one load"""
+    instrument = f"INDICATORS-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2021, 1 + day // 28, 1 + day % 28, 9).isoformat(), "open": 100.0, "high": 103.0 + day % 5,
+         "low": 97.0 - day % 3, "close": 100.0 + day % 9, "volume": 1000, "instrument": instrument}
+        for day in range(60)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    response = client.get(f"/indicators?instrument={instrument}&indicators=sma:5,macd,bollinger:5:2,atr:3,SMA:5")
+    assert response.status_code == 200
+    body = response.json()
+    assert list(body["indicators"]) == ["sma:5", "macd:12:26:9", "bollinger:5:2.0", "atr:3"]
+    assert len(body["datetime"]) == len(body["close"]) == 60
+    sma = body["indicators"]["sma:5"]["sma"]
+    assert sma[:4] == [None] * 4
+    assert sma[4] == pytest.approx(sum(body["close"][:5]) / 5)
+    assert body["indicators"]["bollinger:5:2.0"]["middle"] == sma
+    assert set(body["indicators"]["macd:12:26:9"]) == {"macd", "signal", "histogram"}
+    
+    assert client.get(f"/indicators?instrument={instrument}&indicators=vwap").status_code == 400
+    assert client.get(f"/indicators?instrument={instrument}&indicators=sma:0").status_code == 400
+    assert client.get("/indicators?instrument=NOPE-INDICATORS").status_code == 404
+
+def test_strategy_specs(client):
+    """Test built-in strategies on GET and declarative specs on POST /strategy/performance"""
+    instrument = f"SPEC-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2021, 1 + day // 28, 1 + day % 28).isoformat(), "open": 100.0, "high": 110.0,
+         "low": 90.0, "close": 100.0 + 10 * ((day // 6) % 2) + day % 6, "volume": 1000, "instrument": instrument}
+        for day in range(120)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    default = client.get(f"/strategy/performance?instrument={instrument}&short_window=3&long_window=8&start=2021-01-01T00:00:00")
+    builtin = client.post("/strategy/performance", json={
+        "strategy": "ma_crossover", "params": {"short_window": 3, "long_window": 8},
+        "instrument": instrument, "start": "2021-01-01T00:00:00"
+    })
+    assert default.status_code == builtin.status_code == 200
+    # Same trades; metrics agree up to rounding when the default path runs the compiled kernel
+    expected = default.json()
+    assert builtin.json()["trades"] == expected.pop("trades")
+    assert {key: value for key, value in builtin.json().items() if key != "trades"} == pytest.approx(expected)
+    
+    spec = {
+        "params": {"window": 5},
+        "indicators": {"fast": "ema:3", "slow": "sma:{window}"},
+        "entry": "crosses_above(fast, slow)",
+        "exit": "crosses_below(fast, slow)"
+    }
+    response = client.post("/strategy/performance", json={"spec": spec, "instrument": instrument})
+    assert response.status_code == 200
+    assert response.json()["total_trades"] > 0
+    assert {"entry_date", "exit_date", "profit_pct"} <= set(response.json()["trades"][0])
+    
+    rsi = client.get(f"/strategy/performance?instrument={instrument}&strategy=rsi_reversion")
+    assert rsi.status_code == 200
+    
+    assert client.get(f"/strategy/performance?instrument={instrument}&strategy=nope").status_code == 400
+    assert client.post("/strategy/performance", json={"spec": {**spec, "entry": "fast >"}}).status_code == 400
+    assert client.post("/strategy/performance", json={"instrument": instrument}).status_code == 400
+
+def test_strategy_specs_require_instrument_with_several_stored(client):
+    """Specs are not backtested over several instruments glued into one series"""
+    stamp = datetime.now().timestamp()
+    rows = [
+        {"datetime": datetime(2021, 1, 1 + day).isoformat(), "open": 100.0, "high": 110.0, "low": 90.0,
+         "close": base + day, "volume": 1000, "instrument": f"{name}-{stamp}"}
+        for name, base in (("FIRST", 100.0), ("SECOND", 500.0)) for day in range(20)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    spec = {"strategy": "rsi_reversion"}
+    response = client.post("/strategy/performance", json=spec)
+    assert response.status_code == 400
+    assert "pass an instrument" in response.json()["detail"]
+    assert client.get("/strategy/performance?strategy=macd_crossover").status_code == 400
+    assert client.post("/strategy/performance", json={**spec, "instrument": f"FIRST-{stamp}"}).status_code == 200
+
+def test_post_commit_failure_does_not_fail_write(client, monkeypatch):
+    """A refresh failure after the commit is logged, drops cached state and still answers 200"""
+    from app.cache import data_versions
+    from app.incremental import incremental_engine
+    instrument = f"HOOK-{datetime.now().timestamp()}"
+    row = {"datetime": datetime(2021, 1, 1).isoformat(), "open": 100.0, "high": 110.0, "low": 90.0,
+           "close": 101.0, "volume": 1000, "instrument": instrument}
+    
+    async def failing_bump(name):
+        raise ConnectionError("version store unavailable")
+    monkeypatch.setattr(data_versions, "bump", failing_bump)
+    response = client.post("/data", json=row)
+    assert response.status_code == 200
+    assert response.json()["instrument"] == instrument
+    assert not any(key[0] == instrument for key in incremental_engine.states)
+    assert client.post("/data", json=row).status_code == 400
+
+def test_strategy_performance_trade_selection(client):
+    """include_trades pages or drops the trade list; trades_format=columns returns one array per field"""
+    instrument = f"TRADES-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2021, 1 + day // 28, 1 + day % 28).isoformat(), "open": 100.0, "high": 110.0,
+         "low": 90.0, "close": 100.0 + 10 * ((day // 6) % 2) + day % 6, "volume": 1000, "instrument": instrument}
+        for day in range(120)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    url = f"/strategy/performance?instrument={instrument}&short_window=3&long_window=8"
+    
+    full = client.get(url).json()
+    trades = full.pop("trades")
+    assert len(trades) > 5
+    
+    summary = client.get(f"{url}&include_trades=none").json()
+    assert summary == pytest.approx(full)
+    page = client.get(f"{url}&include_trades=page&trades_offset=2&trades_limit=3").json()
+    assert page["trades"] == trades[2:5] and page["total_trades"] == len(trades)
+    columns = client.get(f"{url}&include_trades=page&trades_limit=2&trades_format=columns").json()["trades"]
+    assert columns["entry_date"] == [trade["entry_date"] for trade in trades[:2]]
+    
+    spec = client.post("/strategy/performance", json={
+        "strategy": "ma_crossover", "params": {"short_window": 3, "long_window": 8}, "instrument": instrument,
+        "include_trades": "page", "trades_offset": 1, "trades_limit": 1
+    }).json()
+    assert spec["trades"] == trades[1:2]
+    assert client.get(f"{url}&include_trades=some").status_code == 422
+
+def test_strategy_walkforward(client):
+    """Test GET /strategy/walkforward reports chosen windows and out-of-sample metrics per fold"""
+    instrument = f"WALK-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2020, 1 + day // 28, 1 + day % 28).isoformat(), "open": 100.0, "high": 120.0,
+         "low": 80.0, "close": 100.0 + 10 * ((day // 9) % 2) + (day * 7) % 5, "volume": 1000, "instrument": instrument}
+        for day in range(300)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    grid = "short_min=2&short_max=6&short_step=2&long_min=10&long_max=30&long_step=10"
+    response = client.get(f"/strategy/walkforward?instrument={instrument}&{grid}&train_bars=100&test_bars=50")
+    assert response.status_code == 200
+    result = response.json()
+    assert len(result["folds"]) == 4
+    assert result["folds"][0]["test_start"].startswith("2020-04-17")
+    assert result["out_of_sample"]["bars"] == 200
+    assert all(fold["short_window"] in (2, 4, 6) and fold["long_window"] in (10, 20, 30) for fold in result["folds"])
+    
+    too_long = client.get(f"/strategy/walkforward?instrument={instrument}&train_bars=300&test_bars=50")
+    assert too_long.status_code == 400
+    
+    params = {"instrument": instrument, "short_max": 10, "long_max": 40, "train_bars": 100, "test_bars": 50}
+    job = client.post("/strategy/jobs", json={"kind": "walkforward", "params": params})
+    assert job.status_code == 202
+    for _ in range(100):
+        status = client.get(f"/strategy/jobs/{job.json()['id']}").json()
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert status["status"] == "succeeded"
+    assert len(status["result"]["folds"]) == 4
+
+def test_stream_websocket(client):
+    """Test /stream/ws sends a snapshot, then an update with the bars of each write"""
+    instrument = f"STREAM-{datetime.now().timestamp()}"
+    rows = [
+        {"datetime": datetime(2021, 3, day).isoformat(), "open": 100.0, "high": 110.0, "low": 90.0,
+         "close": 100.0 + (day % 6), "volume": 1000, "instrument": instrument}
+        for day in range(1, 21)
+    ]
+    assert client.post("/data/bulk?method=insert", json=rows).status_code == 200
+    
+    with client.websocket_connect("/stream/ws") as websocket:
+        websocket.send_json({"action": "subscribe", "instrument": instrument, "short_window": 3, "long_window": 5})
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["datetime"].startswith("2021-03-20")
+        assert snapshot["close"] == 102.0
+        
+        bar = {**rows[-1], "datetime": datetime(2021, 3, 21).isoformat(), "close": 150.0}
+        assert client.post("/data", json=bar).status_code == 200
+        update = websocket.receive_json()
+        assert update["type"] == "update"
+        assert update["version"] == snapshot["version"] + 1
+        assert [new["close"] for new in update["bars"]] == [150.0]
+        assert update["position"] == "long"
+        assert update["short_ma"] == pytest.approx((101.0 + 102.0 + 150.0) / 3)
+        
+        websocket.send_json({"action": "subscribe", "instrument": instrument, "short_window": 0})
+        assert websocket.receive_json()["type"] == "error"
+    
+    stats = client.get("/stream/stats").json()
+    assert stats["published"] >= 1 and stats["updates"] >= 1
+
+def test_large_responses_are_compressed(client):
+    """Test streamed /data is gzip-encoded for clients that accept it and decodes to the same rows"""
+    plain = client.get("/data", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/data", headers={"Accept-Encoding": "gzip"})
+    assert plain.status_code == compressed.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json() == plain.json()
+
+def test_metrics_endpoint(client):
+    """GET /metrics exposes per-route latency histograms, stage timings and pool, executor and cache stats"""
+    client.get("/data?limit=5")
+    client.get("/strategy/performance?short_window=10&long_window=30")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/data",status="200"}' in body
+    assert 'stage_duration_seconds_count{stage="db_fetch"}' in body or 'stage_duration_seconds_count{stage="bar_cache"}' in body
+    for name in ("db_pool_in_use", "db_pool_checkouts_total", "strategy_executor_in_flight", "strategy_cache_hits_total"):
+        assert f"\n{name} " in body
@@ -0,0 +1,129 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from app.cache import StrategyCache, DataVersions, cache_key
+
+class LocalSharedClient:
+    """In-process stand-in for the shared (Redis) backend"""
+    
+    def __init__(self):
+        self.values = {}
+    
+    async def get(self, key):
+        return self.values.get(key)
+    
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+    
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_cache_hit_and_miss_stats():
+    """Lookups are counted as hits or misses"""
+    cache = StrategyCache(max_bytes=10_000, ttl=60)
+    
+    assert run(cache.get("a")) is None
+    run(cache.set("a", {"total_returns": 1.5}))
+    assert run(cache.get("a")) == {"total_returns": 1.5}
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] == len(json.dumps({"total_returns": 1.5}))
+
+def test_cache_evicts_least_recently_used_to_fit_size():
+    """Entries are evicted in LRU order once the byte bound is exceeded"""
+    value = {"trades": "x" * 40}
+    size = len(json.dumps(value))
+    cache = StrategyCache(max_bytes=size * 2, ttl=60)
+    
+    run(cache.set("a", value))
+    run(cache.set("b", value))
+    run(cache.get("a"))  # "b" is now least recently used
+    run(cache.set("c", value))
+    
+    assert run(cache.get("b")) is None
+    assert run(cache.get("a")) == value
+    assert cache.stats()["evictions"] == 1
+    assert cache.size_bytes <= cache.max_bytes
+
+def test_cache_skips_values_larger_than_bound():
+    """A single oversized value is not cached and evicts nothing"""
+    cache = StrategyCache(max_bytes=10, ttl=60)
+    run(cache.set("big", {"payload": "x" * 100}))
+    assert cache.stats()["entries"] == 0
+
+def test_cache_expires_entries(monkeypatch):
+    """Entries older than the TTL are treated as misses"""
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = StrategyCache(max_bytes=10_000, ttl=5)
+    
+    run(cache.set("a", 1))
+    now[0] += 6
+    
+    assert run(cache.get("a")) is None
+    assert cache.stats()["expirations"] == 1
+
+def test_data_version_changes_cache_key():
+    """Bumping an instrument changes its key and the all-instruments key only"""
+    versions = DataVersions()
+    before = {name: run(versions.get(name)) for name in ("A", "B", None)}
+    
+    run(versions.bump("A"))
+    
+    assert run(versions.get("A")) == before["A"] + 1
+    assert run(versions.get(None)) == before[None] + 1
+    assert run(versions.get("B")) == before["B"]
+    assert cache_key("performance", "A", 20, 50, None, None, 0) != cache_key("performance", "A", 20, 50, None, None, 1)
+
+def test_shared_backend_is_visible_to_other_workers():
+    """Results and versions written by one worker are seen by another"""
+    shared = LocalSharedClient()
+    worker_a = StrategyCache(max_bytes=10_000, ttl=60, shared=shared)
+    worker_b = StrategyCache(max_bytes=10_000, ttl=60, shared=shared)
+    
+    run(worker_a.set("k", {"total_trades": 3}))
+    assert run(worker_b.get("k")) == {"total_trades": 3}
+    assert worker_b.stats()["shared_hits"] == 1
+    
+    run(DataVersions(shared).bump("A"))
+    assert run(DataVersions(shared).get("A")) == 1
+
+class VersionTable:
+    """In-process stand-in for the DataVersion table"""
+    
+    def __init__(self):
+        self.rows = {}
+    
+    async def find_unique(self, where):
+        version = self.rows.get(where["instrument"])
+        return None if version is None else SimpleNamespace(instrument=where["instrument"], version=version)
+    
+    async def upsert(self, where, data):
+        name = where["instrument"]
+        if name in self.rows:
+            self.rows[name] += data["update"]["version"]["increment"]
+        else:
+            self.rows[name] = data["create"]["version"]
+        return SimpleNamespace(instrument=name, version=self.rows[name])
+
+def test_database_versions_are_shared_between_processes():
+    """Versions kept in the database are seen by every process, unlike local counters"""
+    client = SimpleNamespace(dataversion=VersionTable())
+    api = DataVersions(store="database", client=client)
+    seed = DataVersions(store="database", client=client)
+    
+    assert run(api.get("A")) == 0
+    assert run(seed.bump("A")) == 1
+    assert run(api.get("A")) == 1
+    assert run(api.get()) == 1
+    assert run(DataVersions().get("A")) == 0
+    with pytest.raises(ValueError):
+        DataVersions(store="memcached")
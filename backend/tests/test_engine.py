@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.engine import BUILTIN_STRATEGIES, compile_spec, resolve_strategy, run_strategy
+from app.schemas import StrategySpec
+from app.strategy import run_ma_backtest
+
+def make_bars(n=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    return pd.date_range("2020-01-01", periods=n, freq="D", tz="UTC"), {
+        "close": close,
+        "high": close * 1.01,
+        "low": close * 0.99,
+        "volume": rng.integers(100, 1000, n).astype(float),
+    }
+
+@pytest.mark.parametrize("short_window,long_window", [(20, 50), (5, 30), (1, 2), (50, 20)])
+def test_ma_crossover_builtin_matches_backtest(short_window, long_window):
+    datetimes, columns = make_bars()
+    spec = resolve_strategy("ma_crossover", params={"short_window": short_window, "long_window": long_window})
+    expected = run_ma_backtest(datetimes, columns["close"], short_window, long_window, backend="numpy")
+    assert run_strategy(datetimes, columns, spec) == expected
+    assert expected["total_trades"] > 0
+
+def test_long_only_positions_follow_entry_and_exit():
+    datetimes, columns = make_bars(500)
+    spec = resolve_strategy("rsi_reversion", params={"period": 5})
+    plan = compile_spec(spec)
+    entry, exit = plan.signals(columns)
+    position = plan.positions(columns)
+
+    expected = np.zeros(len(position))
+    state = 0.0
+    for i in range(len(position)):
+        if exit[i]:
+            state = 0.0
+        elif entry[i]:
+            state = 1.0
+        expected[i] = state
+    np.testing.assert_array_equal(position, expected)
+
+    result = run_strategy(datetimes, columns, spec)
+    assert result["total_trades"] > 0
+    # Every trade enters on an oversold bar
+    entry_bars = datetimes.get_indexer(pd.DatetimeIndex([trade["entry_date"] for trade in result["trades"]]))
+    assert entry[entry_bars].all()
+
+def test_expressions():
+    datetimes, columns = make_bars(300)
+    spec = StrategySpec(
+        params={"k": 1.5},
+        indicators={"m": "macd", "fast": "ema:5"},
+        entry="crosses_above(m.macd, m.signal) and not (close < shift(close, 1) * 0.9) or fast > close * k",
+        exit="crosses_below(m.macd, m.signal)"
+    )
+    entry, exit = compile_spec(spec).signals(columns)
+    assert entry.dtype == bool and entry.shape == (300,)
+    assert not (entry & exit).any()
+
+    close = pd.Series(columns["close"])
+    line = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    above = (line > line.ewm(span=9, adjust=False).mean()).to_numpy()
+    crosses = above & ~np.roll(above, 1)
+    crosses[0] = False
+    fast = close.ewm(span=5, adjust=False).mean().to_numpy()
+    expected = (crosses & ~(close < close.shift(1) * 0.9).to_numpy()) | (fast > columns["close"] * 1.5)
+    np.testing.assert_array_equal(entry, expected)
+    assert compile_spec(spec) is compile_spec(spec.model_copy())
+
+@pytest.mark.parametrize("spec", [
+    {"entry": "unknown > 1"},
+    {"indicators": {"m": "macd"}, "entry": "m > 0"},
+    {"indicators": {"m": "macd"}, "entry": "m.upper > 0"},
+    {"entry": "close > "},
+    {"entry": "__import__('os')"},
+    {"entry": "close.real > 0"},
+    {"entry": "max(close, 1) > 0"},
+    {"entry": "shift(close) > 0"},
+    {"indicators": {"s": "sma:{window}"}, "entry": "s > close"},
+    {"params": {"p": 5}, "indicators": {"s": "rsi:{p.real}"}, "entry": "s > 50"},
+    {"params": {"p": 5}, "indicators": {"s": "rsi:{p[0]}"}, "entry": "s > 50"},
+    {"params": {"p": 5}, "indicators": {"s": "rsi:{p!r}"}, "entry": "s > 50"},
+    {"params": {"p": 5}, "indicators": {"s": "rsi:{p"}, "entry": "s > 50"},
+    {"indicators": {"close": "sma"}, "entry": "close > 0"},
+    {"indicators": {"s": "vwap"}, "entry": "s > close"},
+])
+def test_invalid_specs(spec):
+    with pytest.raises(ValueError):
+        compile_spec(StrategySpec(**spec))
+
+def test_resolve_strategy():
+    assert resolve_strategy("ma_crossover") is BUILTIN_STRATEGIES["ma_crossover"]
+    assert resolve_strategy("rsi_reversion", params={"oversold": 20}).params["oversold"] == 20
+    for kwargs in ({}, {"strategy": "nope"}, {"strategy": "ma_crossover", "params": {"window": 3}},
+                   {"strategy": "ma_crossover", "spec": BUILTIN_STRATEGIES["ma_crossover"]}):
+        with pytest.raises(ValueError):
+            resolve_strategy(**kwargs)
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.executor import ExecutorSaturated, ParallelPool, StrategyExecutor
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def test_runs_off_the_event_loop():
+    """Jobs run on a worker thread and their results come back"""
+    executor = StrategyExecutor(kind="thread", workers=2, queue_limit=0, timeout=5)
+    loop_thread = threading.get_ident()
+    
+    result = run(executor.run(lambda x: (x * 2, threading.get_ident()), 21))
+    
+    assert result[0] == 42
+    assert result[1] != loop_thread
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+def test_rejects_when_saturated():
+    """Jobs beyond workers + queue_limit are rejected instead of queued"""
+    executor = StrategyExecutor(kind="thread", workers=1, queue_limit=1, timeout=5)
+    release = threading.Event()
+    
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(running, queued)
+    
+    run(scenario())
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 2
+    assert stats["peak_in_flight"] == 2
+    assert stats["queue_wait"]["max_seconds"] > 0
+    executor.shutdown()
+
+def test_timeout_frees_slot_only_when_job_finishes():
+    """A timed-out job keeps its worker slot until it actually completes"""
+    executor = StrategyExecutor(kind="thread", workers=1, queue_limit=0, timeout=0.05)
+    release = threading.Event()
+    
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait)
+        assert executor.in_flight == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(time.sleep, 0)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 0
+        await executor.run(time.sleep, 0)
+    
+    run(scenario())
+    assert executor.stats()["timed_out"] == 1
+    executor.shutdown()
+
+def test_records_compute_time_and_failures():
+    executor = StrategyExecutor(kind="thread", workers=1, queue_limit=4, timeout=5)
+    
+    run(executor.run(time.sleep, 0.05))
+    with pytest.raises(ZeroDivisionError):
+        run(executor.run(divmod, 1, 0))
+    
+    stats = executor.stats()
+    assert stats["compute"]["count"] == 1
+    assert stats["compute"]["max_seconds"] >= 0.05
+    assert stats["failed"] == 1
+    executor.shutdown()
+
+def test_process_executor():
+    """Module-level functions run in worker processes"""
+    executor = StrategyExecutor(kind="process", workers=1, queue_limit=0, timeout=30)
+    
+    assert run(executor.run(divmod, 7, 2)) == (3, 1)
+    executor.shutdown()
+
+def test_parallel_pool_is_reused():
+    """The shared process pool starts once, keeps its workers across calls and shuts down"""
+    pool = ParallelPool(workers=2)
+    assert pool.map(pow, [2, 3], [3, 2]) == [8, 9]
+    first = pool.pool
+    assert pool.map(abs, [-1]) == [1]
+    assert pool.pool is first
+    assert pool.stats() == {"workers": 2, "started": True, "submitted": 3, "restarts": 0}
+    pool.shutdown()
+    assert not pool.stats()["started"]
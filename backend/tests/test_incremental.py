@@ -0,0 +1,109 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app.incremental import IncrementalEngine, MAStrategyState
+from app.strategy import run_ma_backtest
+from tests.test_strategy import generate_test_data
+
+def assert_matches_full_recompute(state, datetimes, close, short_window, long_window):
+    expected = run_ma_backtest(datetimes, close, short_window, long_window)
+    result = state.snapshot()
+    
+    assert result["trades"] == expected["trades"]
+    assert state.snapshot("columns")["trades"] == run_ma_backtest(
+        datetimes, close, short_window, long_window, trades="columns"
+    )["trades"]
+    assert "trades" not in state.snapshot("none")
+    for name in ("total_returns", "total_trades", "profitable_trades", "losing_trades", "win_rate", "max_drawdown"):
+        assert result[name] == expected[name], name
+    for name in ("average_win", "average_loss", "sharpe_ratio"):
+        assert result[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-12), name
+
+@pytest.mark.parametrize("short_window,long_window", [(5, 20), (10, 30), (20, 20), (50, 10)])
+def test_incremental_updates_match_full_recompute(short_window, long_window):
+    """Folding bars in one at a time gives the same result as recomputing the whole history"""
+    test_data = generate_test_data(days=400)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data])
+    
+    state = MAStrategyState.from_arrays(datetimes[:100], close[:100], short_window, long_window)
+    assert_matches_full_recompute(state, datetimes[:100], close[:100], short_window, long_window)
+    
+    for i in range(100, len(close)):
+        state.update(datetimes[i], close[i])
+        if i % 50 == 0:
+            assert_matches_full_recompute(state, datetimes[:i + 1], close[:i + 1], short_window, long_window)
+    
+    assert_matches_full_recompute(state, datetimes, close, short_window, long_window)
+    if short_window != long_window:
+        assert state.snapshot()["total_trades"] > 0
+
+def test_incremental_from_empty_state():
+    """A state built bar by bar from nothing matches the full recompute"""
+    test_data = generate_test_data(days=150)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data])
+    
+    state = MAStrategyState(5, 20)
+    for timestamp, price in zip(datetimes, close):
+        state.update(timestamp, price)
+    
+    assert_matches_full_recompute(state, datetimes, close, 5, 20)
+
+def test_engine_applies_in_order_bars_and_drops_stale_state():
+    """New bars at the next version update the state; out-of-order or skipped versions drop it"""
+    test_data = generate_test_data(days=200)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data])
+    engine = IncrementalEngine(max_states=4)
+    
+    engine.seed("TEST", 5, 20, 3, datetimes[:150], close[:150])
+    engine.on_bars("TEST", list(zip(datetimes[150:160], close[150:160])), version=4)
+    engine.on_bars("OTHER", list(zip(datetimes[160:], close[160:])), version=1)
+    
+    state = engine.get("TEST", 5, 20, 4)
+    assert state is not None
+    assert_matches_full_recompute(state, datetimes[:160], close[:160], 5, 20)
+    
+    # A bar older than the last one cannot be appended
+    engine.on_bars("TEST", [(datetimes[10], close[10])], version=5)
+    assert engine.get("TEST", 5, 20, 5) is None
+    
+    # A version gap means another writer changed the data
+    engine.seed("TEST", 5, 20, 5, datetimes[:160], close[:160])
+    engine.on_bars("TEST", [(datetimes[160], close[160])], version=7)
+    assert engine.get("TEST", 5, 20, 7) is None
+    
+    # Rows skipped as duplicates leave the state unknown
+    engine.seed("TEST", 5, 20, 7, datetimes[:160], close[:160])
+    engine.on_bars("TEST", [(datetimes[160], close[160])], version=8, complete=False)
+    assert engine.get("TEST", 5, 20, 8) is None
+
+def test_engine_evicts_least_recently_used():
+    test_data = generate_test_data(days=50)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data])
+    engine = IncrementalEngine(max_states=2)
+    
+    engine.seed("A", 5, 20, 0, datetimes, close)
+    engine.seed("B", 5, 20, 0, datetimes, close)
+    engine.get("A", 5, 20, 0)
+    engine.seed("C", 5, 20, 0, datetimes, close)
+    
+    assert engine.get("A", 5, 20, 0) is not None
+    assert engine.get("B", 5, 20, 0) is None
+
+def test_engine_rebuilds_expired_state(monkeypatch):
+    """States older than the TTL are rebuilt, picking up rows written outside the API"""
+    test_data = generate_test_data(days=50)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data])
+    engine = IncrementalEngine(max_states=2, ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr("app.incremental.time.monotonic", lambda: clock[0])
+    
+    engine.seed("A", 5, 20, 0, datetimes, close)
+    assert engine.get("A", 5, 20, 0) is not None
+    
+    clock[0] += 61
+    assert engine.get("A", 5, 20, 0) is None
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.indicators import INDICATORS, IndicatorContext, compute_indicators, ema_recursive, parse_spec, required_columns
+
+def make_bars(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    high = close * (1 + rng.uniform(0, 0.01, n))
+    low = close * (1 - rng.uniform(0, 0.01, n))
+    return close, high, low
+
+def compute(spec, close, high=None, low=None):
+    results = compute_indicators([parse_spec(spec)], close, high, low)
+    return next(iter(results.values()))
+
+@pytest.mark.parametrize("alpha", [2 / 3, 2 / 21, 2 / 201, 1 / 14, 0.001])
+def test_ema_matches_pandas(alpha):
+    close, _, _ = make_bars(20000)
+    expected = pd.Series(close).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(ema_recursive(close, alpha), expected, rtol=1e-10)
+
+def test_moving_averages_match_pandas():
+    close, _, _ = make_bars()
+    series = pd.Series(close)
+    np.testing.assert_allclose(compute("sma:20", close)["sma"], series.rolling(20).mean(), rtol=1e-10)
+    np.testing.assert_allclose(compute("ema:12", close)["ema"], series.ewm(span=12, adjust=False).mean(), rtol=1e-10)
+    weights = np.arange(1, 11)
+    expected = series.rolling(10).apply(lambda window: window @ weights / weights.sum(), raw=True)
+    np.testing.assert_allclose(compute("wma:10", close)["wma"], expected, rtol=1e-10)
+
+def test_oscillators_and_bands_match_pandas():
+    close, high, low = make_bars()
+    series = pd.Series(close)
+    delta = series.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    np.testing.assert_allclose(compute("rsi", close)["rsi"], 100 - 100 / (1 + gain / loss), rtol=1e-9)
+
+    line = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    signal = line.ewm(span=9, adjust=False).mean()
+    macd = compute("macd", close)
+    np.testing.assert_allclose(macd["macd"], line, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(macd["histogram"], line - signal, rtol=1e-9, atol=1e-12)
+
+    bands = compute("bollinger:20:2.5", close)
+    middle = series.rolling(20).mean()
+    np.testing.assert_allclose(bands["upper"], middle + 2.5 * series.rolling(20).std(ddof=0), rtol=1e-8)
+
+    previous = series.shift()
+    true_range = pd.concat([pd.Series(high - low), (pd.Series(high) - previous).abs(), (pd.Series(low) - previous).abs()], axis=1).max(axis=1)
+    expected = true_range.ewm(alpha=1 / 14, adjust=False, min_periods=14).mean()
+    np.testing.assert_allclose(compute("atr", close, high, low)["atr"], expected, rtol=1e-10)
+
+def test_intermediates_are_shared():
+    close, high, low = make_bars()
+    specs = [parse_spec(spec) for spec in ("sma:20", "bollinger:20", "ema:12", "macd", "ema:26")]
+    ctx = IndicatorContext(close)
+    for name, params in specs:
+        INDICATORS[name].compute(ctx, **params)
+    # cumsum, window sum, cumsum of squares, EMA 12 / 26 and the MACD signal EMA, each once
+    assert ctx.computed == 6
+
+    results = compute_indicators(specs + [parse_spec("sma:20")], close)
+    assert list(results) == ["sma:20", "bollinger:20:2.0", "ema:12", "macd:12:26:9", "ema:26"]
+    np.testing.assert_array_equal(results["ema:12"]["ema"], ctx.ema("close", 2 / 13))
+
+def test_parse_spec():
+    assert parse_spec("MACD:5") == ("macd", {"fast": 5, "slow": 26, "signal": 9})
+    assert parse_spec("bollinger:10:1.5") == ("bollinger", {"window": 10, "num_std": 1.5})
+    assert required_columns([parse_spec("atr"), parse_spec("sma")]) == ["high", "low"]
+    for spec in ("vwap", "sma:20:3", "sma:x", "ema:0"):
+        with pytest.raises(ValueError):
+            parse_spec(spec)
+
+def test_short_and_empty_series():
+    close, high, low = make_bars(5)
+    assert np.isnan(compute("wma:10", close)["wma"]).all()
+    assert np.isnan(compute("atr:14", close, high, low)["atr"]).all()
+    assert len(compute("macd", np.empty(0))["signal"]) == 0
+    with pytest.raises(ValueError):
+        compute("atr", close)
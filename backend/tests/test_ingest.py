@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from app import ingest
+from app.ingest import StagingPool
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        self.connection.statements.append(sql)
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(dsn):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(ingest, "psycopg2", type("psycopg2", (), {"connect": staticmethod(connect)}))
+    return opened
+
+def test_staging_pool_reuses_connections_and_caps_writers(connections):
+    """Started connections are reused with their staging table truncated; a third writer waits"""
+    async def run():
+        pool = StagingPool(size=2, dsn="postgresql://test")
+        await pool.start()
+        first, second = await pool.acquire(), await pool.acquire()
+        waiting = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        await pool.release(first)
+        assert await waiting is first
+        assert first.statements[-1] == "TRUNCATE stock_staging"
+        await pool.release(first)
+        await pool.release(second)
+        await pool.close()
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert len(connections) == 2
+    assert all(c.statements[0].startswith("CREATE TEMP TABLE stock_staging") and c.closed for c in connections)
+    assert stats == {"size": 2, "idle": 0, "acquired": 3, "waited": 1, "connects": 2}
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.metrics import Histogram, MetricsMiddleware, REQUEST_SECONDS, STAGE_SECONDS, render_stats, server_timing, timed
+from app.serialization import ORJSONResponse
+from app.strategy import run_ma_backtest
+
+def make_app(**kwargs):
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(MetricsMiddleware, enabled=True, **kwargs)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with timed("lookup"):
+            return {"id": item_id}
+
+    return app
+
+def test_histogram_renders_cumulative_buckets():
+    """Buckets are cumulative, +Inf equals the count and label values are escaped"""
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(seconds, 'a"b')
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="a\\"b",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="a\\"b",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="a\\"b",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="a\\"b"} 4' in lines
+    assert histogram.count('a"b') == 4
+
+def test_render_stats_types_fields():
+    lines = render_stats("pool", {"in_use": 2, "checkouts": 10, "connected": True, "last": None, "nested": {}}, counters=("checkouts",))
+    assert lines == [
+        "# TYPE pool_in_use gauge", "pool_in_use 2",
+        "# TYPE pool_checkouts_total counter", "pool_checkouts_total 10",
+        "# TYPE pool_connected gauge", "pool_connected 1",
+    ]
+
+def test_middleware_records_route_template_and_server_timing():
+    """Requests are labelled by route template; stages timed while handling them show in Server-Timing"""
+    client = TestClient(make_app(server_timing=True))
+    before = REQUEST_SECONDS.count("GET", "/items/{item_id}", "200")
+    response = client.get("/items/7")
+    assert response.json() == {"id": 7}
+    assert REQUEST_SECONDS.count("GET", "/items/{item_id}", "200") == before + 1
+    stages = dict(part.split(";dur=") for part in response.headers["server-timing"].split(", "))
+    assert {"lookup", "serialize", "app"} <= set(stages)
+    assert float(stages["app"]) >= float(stages["lookup"])
+
+    client.get("/missing")
+    assert REQUEST_SECONDS.count("GET", "unmatched", "404") >= 1
+    assert "server-timing" not in TestClient(make_app()).get("/items/1").headers
+
+def test_backtest_stages_are_recorded():
+    """The kernel and trade extraction of a backtest record their own stages"""
+    before = {stage: STAGE_SECONDS.count(stage) for stage in ("kernel", "trades", "rolling")}
+    close = 100.0 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, 1000))
+    datetimes = pd.date_range("2021-01-01", periods=len(close), freq="min")
+    run_ma_backtest(datetimes, close, 5, 20, backend="numpy")
+    run_ma_backtest(datetimes, close, 5, 20, backend="pandas")
+    assert STAGE_SECONDS.count("kernel") == before["kernel"] + 1
+    assert STAGE_SECONDS.count("trades") == before["trades"] + 2
+    assert STAGE_SECONDS.count("rolling") == before["rolling"] + 1
+
+def test_server_timing_sums_repeated_stages():
+    assert server_timing([("db_fetch", 0.001), ("db_fetch", 0.002)], 0.01) == "db_fetch;dur=3.00, app;dur=10.00"
@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app.portfolio import InstrumentArrays, run_portfolio_backtest
+from app.strategy import run_ma_backtest
+
+def make_arrays(lengths, seed=3):
+    """Pack random-walk instruments with staggered start dates"""
+    rng = np.random.default_rng(seed)
+    datetimes, closes = [], []
+    for i, length in enumerate(lengths):
+        datetimes.append(pd.date_range("2020-01-01", periods=length, freq="D") + pd.Timedelta(days=5 * i))
+        closes.append(100.0 * np.cumprod(1 + rng.normal(0, 0.01, length)))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    arrays = InstrumentArrays(
+        instruments=[f"I{i}" for i in range(len(lengths))],
+        offsets=offsets,
+        datetimes=pd.DatetimeIndex(np.concatenate([d.to_numpy() for d in datetimes])),
+        close=np.concatenate(closes)
+    )
+    return arrays, datetimes, closes
+
+def test_instruments_are_backtested_separately():
+    """Each instrument's metrics equal a single-instrument backtest of its own series"""
+    arrays, datetimes, closes = make_arrays([300, 250, 400])
+    
+    result = run_portfolio_backtest(arrays, 10, 30, max_workers=1, backend="numpy")
+    
+    assert [item["instrument"] for item in result["instruments"]] == ["I0", "I1", "I2"]
+    for item, dates, close in zip(result["instruments"], datetimes, closes):
+        expected = run_ma_backtest(dates, close, 10, 30, backend="numpy")
+        expected.pop("trades")
+        assert item["bars"] == len(close)
+        assert {k: v for k, v in item.items() if k not in ("instrument", "bars")} == expected
+
+def test_single_instrument_portfolio_matches_instrument():
+    arrays, _, _ = make_arrays([500])
+    
+    result = run_portfolio_backtest(arrays, 10, 30, max_workers=1)
+    
+    assert result["bars"] == 500
+    assert result["total_returns"] == pytest.approx(result["instruments"][0]["total_returns"])
+    assert result["max_drawdown"] == pytest.approx(result["instruments"][0]["max_drawdown"])
+
+def test_portfolio_equity_is_equal_weight():
+    """Portfolio return is the mean of sleeve returns over the union of timestamps"""
+    arrays, _, _ = make_arrays([200, 260])
+    
+    result = run_portfolio_backtest(arrays, 5, 20, max_workers=1)
+    
+    assert result["bars"] == 265
+    sleeve_returns = [item["total_returns"] for item in result["instruments"]]
+    assert result["total_returns"] == pytest.approx(np.mean(sleeve_returns))
+
+def test_process_pool_matches_in_process(monkeypatch):
+    """Shared-memory workers produce the same result as the in-process path"""
+    monkeypatch.setattr("app.portfolio.PORTFOLIO_PARALLEL_BARS", 0)
+    arrays, _, _ = make_arrays([300, 250, 400, 350])
+    
+    serial = run_portfolio_backtest(arrays, 10, 30, max_workers=1)
+    parallel = run_portfolio_backtest(arrays, 10, 30, max_workers=2)
+    
+    assert parallel == serial
+
+def test_empty_portfolio():
+    arrays = InstrumentArrays([], np.zeros(1, dtype=np.int64), pd.DatetimeIndex([]), np.empty(0))
+    
+    result = run_portfolio_backtest(arrays)
+    
+    assert result["instruments"] == []
+    assert result["bars"] == 0
@@ -0,0 +1,55 @@
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.raw_db import COPY_SIGNATURE, POSTGRES_EPOCH_US, build_where, decode_copy, numbered_placeholders, resolve_driver
+
+def copy_stream(rows, widths=None):
+    """Encode (datetime, close) rows the way COPY ... (FORMAT binary) does."""
+    body = COPY_SIGNATURE + struct.pack(">ii", 0, 0)
+    for timestamp, close in rows:
+        micros = int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1_000_000) - POSTGRES_EPOCH_US
+        body += struct.pack(">hiqid", 2, 8, micros, 8, close)
+    return body + struct.pack(">h", -1)
+
+def test_decode_copy_matches_rows():
+    rows = [(datetime(2021, 1, day, 9, 15), 100.0 + day / 3) for day in range(1, 29)]
+    decoded = decode_copy(copy_stream(rows), ["datetime", "close"])
+
+    expected = np.array([timestamp for timestamp, _ in rows], dtype="datetime64[ns]")
+    np.testing.assert_array_equal(decoded["datetime"], expected)
+    np.testing.assert_array_equal(decoded["close"], [close for _, close in rows])
+    assert decoded["close"].dtype == np.float64
+    assert decoded["close"].dtype.isnative
+
+def test_decode_copy_empty_and_invalid():
+    decoded = decode_copy(copy_stream([]), ["datetime", "close"])
+    assert len(decoded["datetime"]) == 0 and len(decoded["close"]) == 0
+
+    with pytest.raises(ValueError):
+        decode_copy(b"not a copy stream", ["close"])
+
+    # A NULL field (length -1, no value) breaks the fixed-width layout
+    null_row = COPY_SIGNATURE + struct.pack(">ii", 0, 0) + struct.pack(">hiqi", 2, 8, 0, -1) + struct.pack(">h", -1)
+    with pytest.raises(ValueError):
+        decode_copy(null_row, ["datetime", "close"])
+
+def test_build_where_and_placeholders():
+    start = datetime(2021, 1, 1, 5, 30, tzinfo=timezone.utc)
+    where, args = build_where(instrument="HINDALCO", start=start, end=datetime(2021, 2, 1))
+    assert where == " WHERE instrument = %s AND datetime >= %s AND datetime <= %s"
+    assert args == ["HINDALCO", datetime(2021, 1, 1, 5, 30), datetime(2021, 2, 1)]
+
+    assert build_where() == ("", [])
+    where, args = build_where(instruments=["A", "B"], after=start)
+    assert where == " WHERE instrument = ANY(%s) AND datetime > %s"
+    assert args == [["A", "B"], datetime(2021, 1, 1, 5, 30)]
+    assert numbered_placeholders("a = %s AND b = ANY(%s)") == "a = $1 AND b = ANY($2)"
+
+def test_resolve_driver():
+    assert resolve_driver("prisma") == "prisma"
+    assert resolve_driver("auto") in ("prisma", "psycopg2", "asyncpg")
+    with pytest.raises(ValueError):
+        resolve_driver("odbc")
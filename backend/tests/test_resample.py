@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.resample import bucket_bounds, bucket_starts, lttb, minmax_decimate, resample_ohlcv, source_interval
+
+def make_bars(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    datetimes = (np.datetime64("2021-01-04T03:45") + np.arange(n) * np.timedelta64(15, "m")).astype("datetime64[ns]")
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.002, n))
+    return {
+        "datetime": datetimes,
+        "open": close * (1 + rng.normal(0, 0.001, n)),
+        "high": close * 1.01,
+        "low": close * 0.99,
+        "close": close,
+        "volume": rng.integers(100, 1000, n),
+    }
+
+@pytest.mark.parametrize("interval,period", [("1h", "h"), ("1d", "D"), ("1w", "W-SUN")])
+def test_resample_matches_pandas(interval, period):
+    columns = make_bars()
+    offsets = np.array([0, 2000, 5000])
+    instrument_index, bars = resample_ohlcv(offsets, columns, interval)
+
+    frame = pd.DataFrame(columns)
+    frame["instrument"] = np.repeat([0, 1], [2000, 3000])
+    frame["bucket"] = pd.DatetimeIndex(frame["datetime"]).to_period(period).start_time
+    expected = frame.groupby(["instrument", "bucket"]).agg(
+        open=("open", "first"), high=("high", "max"), low=("low", "min"),
+        close=("close", "last"), volume=("volume", "sum")
+    )
+
+    np.testing.assert_array_equal(instrument_index, expected.index.get_level_values(0))
+    np.testing.assert_array_equal(bars["datetime"], expected.index.get_level_values(1).values)
+    for name in ("open", "high", "low", "close", "volume"):
+        np.testing.assert_allclose(bars[name], expected[name].values)
+
+def test_weeks_start_on_monday():
+    stamps = np.array(["2021-01-03T23:00", "2021-01-04T00:00", "2021-01-10T12:00"], dtype="datetime64[ns]")
+    np.testing.assert_array_equal(
+        bucket_starts(stamps, "1w"),
+        np.array(["2020-12-28", "2021-01-04", "2021-01-04"], dtype="datetime64[ns]")
+    )
+
+def test_resample_empty():
+    columns = {name: values[:0] for name, values in make_bars(10).items()}
+    instrument_index, bars = resample_ohlcv(np.zeros(1, dtype=np.int64), columns, "1d")
+    assert len(instrument_index) == 0 and len(bars["close"]) == 0
+
+def test_lttb_keeps_endpoints_and_extremes():
+    rng = np.random.default_rng(1)
+    y = np.sin(np.arange(20000) / 300) + rng.normal(0, 0.01, 20000)
+    y[12345] = 5.0
+    keep = lttb(np.arange(len(y)), y, 500)
+
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 12345 in keep
+    np.testing.assert_array_equal(lttb(np.arange(10), y[:10], 50), np.arange(10))
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(2)
+    y = rng.normal(0, 1, 10000)
+    keep = minmax_decimate(y, 200)
+
+    assert len(keep) <= 200
+    assert (np.diff(keep) > 0).all()
+    assert y.argmax() in keep and y.argmin() in keep
+    for bucket in np.array_split(np.arange(len(y)), 100):
+        assert bucket[y[bucket].argmax()] in keep
+
+def test_source_interval_nests():
+    assert source_interval("1d", ["1h", "1d", "1w"]) == "1d"
+    assert source_interval("4h", ["1h", "1d", "1w"]) == "1h"
+    assert source_interval("1w", ["1h", "1d"]) == "1d"
+    assert source_interval("15m", ["1h", "1d"]) is None
+    assert source_interval("1d", []) is None
+
+def test_bucket_bounds_drop_partial_edges():
+    day = np.timedelta64(1, "D")
+    start = np.datetime64("2021-01-04T09:15", "ns")
+    end = np.datetime64("2021-01-08T15:30", "ns")
+    assert bucket_bounds(start, end, "1d") == (np.datetime64("2021-01-05", "ns"), np.datetime64("2021-01-08", "ns"))
+
+    # Bucket-aligned start is kept; an end on the last instant of a bucket keeps that bucket
+    aligned = np.datetime64("2021-01-04", "ns")
+    last_instant = np.datetime64("2021-01-07T23:59:59.999", "ns")
+    assert bucket_bounds(aligned, last_instant, "1d") == (aligned, aligned + 4 * day)
+    assert bucket_bounds(None, None, "1d") == (None, None)
@@ -0,0 +1,110 @@
+import gzip
+import json
+from datetime import datetime
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from app.serialization import CompressionMiddleware, ORJSONResponse, compress, dumps, negotiate, trusted_response
+
+class Point(BaseModel):
+    value: int
+
+def make_app(minimum_size=1000):
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, encodings=["gzip"], minimum_size=minimum_size)
+
+    @app.get("/rows")
+    def rows(count: int = 10):
+        return ORJSONResponse({"close": np.linspace(100, 200, count), "datetime": pd.date_range("2021-01-01", periods=count).to_numpy()})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((dumps({"page": page}) + b"\n" for page in range(500)), media_type="application/x-ndjson")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter([b"data: " + b"x" * 5000 + b"\n\n"]), media_type="text/event-stream")
+
+    @app.get("/trusted", response_model=List[Point])
+    def trusted():
+        # Not a valid List[Point]: only returned as-is because validation is skipped
+        return trusted_response([{"value": 1.5, "extra": "kept"}])
+
+    return app
+
+def test_dumps_encodes_numpy_and_datetimes():
+    """NumPy arrays and scalars, datetime64 and Timestamps encode like their Python equivalents"""
+    value = {
+        "array": np.arange(3),
+        "float": np.float32(1.5),
+        "int": np.int64(7),
+        "timestamp": pd.Timestamp("2021-01-01 09:15", tz="UTC"),
+        "naive": datetime(2021, 1, 1, 9, 15),
+        "datetimes": np.array(["2021-01-01T09:15"], dtype="datetime64[ns]"),
+        "strided": np.arange(10.0)[::3],
+    }
+    decoded = json.loads(dumps(value))
+    assert decoded["array"] == [0, 1, 2]
+    assert decoded["float"] == 1.5 and decoded["int"] == 7
+    assert decoded["timestamp"] == "2021-01-01T09:15:00+00:00"
+    assert decoded["naive"] == "2021-01-01T09:15:00"
+    assert decoded["datetimes"][0].startswith("2021-01-01T09:15:00")
+    assert decoded["strided"] == [0.0, 3.0, 6.0, 9.0]
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate, br", "gzip"),
+    ("zstd;q=1.0, gzip;q=0.5", "zstd"),
+    ("gzip;q=0, zstd;q=0", None),
+    ("identity", None),
+    ("*", "zstd"),
+])
+def test_negotiate_picks_first_configured_encoding_accepted(header, expected):
+    assert negotiate(header, ["zstd", "gzip"]) == expected
+
+def test_middleware_compresses_large_bodies_only():
+    """Bodies above the threshold are gzipped, small ones and event streams pass through"""
+    client = TestClient(make_app())
+
+    large = client.get("/rows?count=2000", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in large.headers["vary"].lower()
+    assert int(large.headers["content-length"]) < len(large.content)
+    assert large.json()["close"][-1] == 200.0
+
+    small = client.get("/rows?count=3", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.json()["datetime"][0].startswith("2021-01-01")
+
+    identity = client.get("/rows?count=2000", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert "content-length" not in streamed.headers or int(streamed.headers["content-length"]) < len(streamed.content)
+    assert streamed.text.splitlines()[-1] == '{"page":499}'
+
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in events.headers
+
+def test_trusted_response_skips_response_model():
+    """trusted_response bypasses response_model validation for internally computed results"""
+    client = TestClient(make_app())
+    assert client.get("/trusted").json() == [{"value": 1.5, "extra": "kept"}]
+
+def test_compress_roundtrips_gzip():
+    data = dumps({"values": list(range(1000))})
+    assert gzip.decompress(compress(data, "gzip")) == data
+
+def test_json_fallback_encodes_nan_as_null(monkeypatch):
+    """Without orjson, NaN and infinities still encode as null instead of failing"""
+    from app import serialization
+    monkeypatch.setattr(serialization, "orjson", None)
+    value = {"sharpe_ratio": float("nan"), "equity": np.array([1.0, np.inf]), "peak": np.float64(-np.inf), "n": 2}
+    assert json.loads(dumps(value)) == {"sharpe_ratio": None, "equity": [1.0, None], "peak": None, "n": 2}
+    assert dumps({"a": [1.5]}) == b'{"a":[1.5]}'
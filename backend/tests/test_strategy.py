@@ -2,7 +2,8 @@ import pytest
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from app.strategy import calculate_ma_strategy
+from app.strategy import calculate_ma_strategy, run_ma_backtest, extract_trades, _extract_trades_loop, select_trades
+from app.kernels import HAS_NUMBA, resolve_backend
 
 def generate_test_data(days=100):
     """Generate synthetic stock data for testing"""
@@ -93,4 +94,119 @@ def test_edge_cases():
         long_window=20
     )
     # Equal windows should still produce a valid result
-    assert isinstance(equal_window_result["total_returns"], float)
\ No newline at end of file
+    assert isinstance(equal_window_result["total_returns"], float)
+
+def generate_crossover_series(bars, seed=7):
+    """Generate a random-walk close series with MA crossover events"""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    datetimes = pd.Series(pd.date_range("2000-01-01", periods=bars, freq="min"))
+    series = pd.Series(close)
+    short_ma = series.rolling(10, min_periods=1).mean()
+    long_ma = series.rolling(30, min_periods=1).mean()
+    signal = pd.Series(np.where(short_ma > long_ma, 1, -1))
+    position = np.sign(signal.diff()).to_numpy()
+    return datetimes, close, position
+
+def test_vectorized_trades_match_loop_on_large_series():
+    """The NumPy trade extraction reproduces the reference loop on 10^6 bars"""
+    datetimes, close, position = generate_crossover_series(1_000_000)
+    
+    vectorized = extract_trades(datetimes, close, position)
+    reference = _extract_trades_loop(datetimes, close, position)
+    
+    assert len(vectorized) > 1000
+    assert vectorized == reference
+
+def test_vectorized_trades_handle_repeated_events():
+    """Repeated entries re-price the open trade and stray exits are ignored"""
+    datetimes = pd.Series(pd.date_range("2023-01-01", periods=8, freq="D"))
+    close = np.array([10.0, 11.0, 12.0, 13.0, 14.0, 15.0, 16.0, 17.0])
+    position = np.array([np.nan, -1, 1, 1, -1, -1, 1, 0])
+    
+    trades = extract_trades(datetimes, close, position)
+    
+    assert trades == _extract_trades_loop(datetimes, close, position)
+    assert [(t["entry_price"], t["exit_price"]) for t in trades] == [(13.0, 14.0)]
+
+def test_vectorized_strategy_matches_loop():
+    """Both trade paths give identical strategy results"""
+    test_data = generate_test_data(days=1000)
+    
+    vectorized = calculate_ma_strategy(test_data, short_window=5, long_window=20)
+    reference = calculate_ma_strategy(test_data, short_window=5, long_window=20, vectorized=False)
+    
+    assert vectorized["total_trades"] > 0
+    assert vectorized == reference
+
+
+def test_array_entry_point_matches_records():
+    """run_ma_backtest on float64 arrays equals calculate_ma_strategy on records"""
+    test_data = generate_test_data(days=500)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data], dtype=np.float64)
+    
+    assert run_ma_backtest(datetimes, close, 10, 30) == calculate_ma_strategy(test_data, 10, 30)
+    assert run_ma_backtest(datetimes[:0], close[:0], 10, 30)["total_trades"] == 0
+
+@pytest.mark.parametrize("backend", [
+    "numpy",
+    pytest.param("numba", marks=pytest.mark.skipif(not HAS_NUMBA, reason="numba is not installed")),
+])
+def test_array_backends_match_pandas(backend):
+    """The NumPy and compiled kernels reproduce the pandas column chain"""
+    rng = np.random.default_rng(7)
+    close = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, 100_000))
+    datetimes = pd.date_range("2000-01-01", periods=len(close), freq="min")
+    
+    for short_window, long_window in [(10, 30), (50, 200), (30, 10)]:
+        expected = run_ma_backtest(datetimes, close, short_window, long_window, backend="pandas")
+        result = run_ma_backtest(datetimes, close, short_window, long_window, backend=backend)
+        
+        assert result["trades"] == expected["trades"]
+        for name in ("total_trades", "profitable_trades", "losing_trades", "win_rate"):
+            assert result[name] == expected[name]
+        for name in ("total_returns", "average_win", "average_loss", "max_drawdown", "sharpe_ratio"):
+            assert result[name] == pytest.approx(expected[name], rel=1e-9)
+
+@pytest.mark.parametrize("backend", ["pandas", "numpy"])
+def test_trade_detail_layouts_agree(backend):
+    """Columnar trades hold the same values as records; "none" keeps the metrics and drops the trades"""
+    test_data = generate_test_data(days=500)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data], dtype=np.float64)
+    
+    records = run_ma_backtest(datetimes, close, 5, 20, backend=backend)
+    columns = run_ma_backtest(datetimes, close, 5, 20, backend=backend, trades="columns")
+    summary = run_ma_backtest(datetimes, close, 5, 20, backend=backend, trades="none")
+    
+    trades = records.pop("trades")
+    assert len(trades) > 10
+    assert columns.pop("trades") == {field: [trade[field] for trade in trades] for field in trades[0]}
+    assert columns == records
+    assert "trades" not in summary and summary == records
+    assert run_ma_backtest(datetimes[:0], close[:0], 5, 20, trades="columns")["trades"]["profit_pct"] == []
+
+def test_select_trades_pages_and_lays_out():
+    """select_trades slices the columnar trades and leaves the cached result untouched"""
+    test_data = generate_test_data(days=500)
+    datetimes = pd.DatetimeIndex([row["datetime"] for row in test_data])
+    close = np.array([row["close"] for row in test_data], dtype=np.float64)
+    trades = run_ma_backtest(datetimes, close, 5, 20)["trades"]
+    cached = run_ma_backtest(datetimes, close, 5, 20, trades="columns")
+    
+    assert select_trades(cached)["trades"] == trades
+    assert select_trades(cached, "page", offset=3, limit=4)["trades"] == trades[3:7]
+    assert select_trades(cached, "page", offset=len(trades), limit=4)["trades"] == []
+    page = select_trades(cached, "page", offset=2, limit=2, trades_format="columns")["trades"]
+    assert page["exit_date"] == [trade["exit_date"] for trade in trades[2:4]]
+    none = select_trades(cached, "none")
+    assert "trades" not in none and none["total_trades"] == len(trades)
+    assert len(cached["trades"]["entry_date"]) == len(trades)
+
+def test_resolve_backend():
+    """auto picks the compiled kernel when available; unknown names are rejected"""
+    assert resolve_backend("auto") == ("numba" if HAS_NUMBA else "numpy")
+    assert resolve_backend("pandas") == "pandas"
+    with pytest.raises(ValueError):
+        resolve_backend("fortran")
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from app.incremental import MAStrategyState
+from app.streaming import StreamHub, Subscriber, Topic
+from tests.test_strategy import generate_test_data
+
+def make_rows(test_data):
+    return [SimpleNamespace(**row) for row in test_data]
+
+def update(bars, position="long"):
+    return {"type": "update", "bars": bars, "crossovers": [], "dropped": 0, "position": position}
+
+def ready_hub(key, rows, version=1, **kwargs):
+    """A hub with a loaded topic for `key` built from `rows`, as _load leaves it."""
+    hub = StreamHub(**kwargs)
+    topic = hub.topics[key] = Topic(key)
+    hub.instruments[key[0]] = {key}
+    topic.state = MAStrategyState.from_arrays(
+        pd.DatetimeIndex([row.datetime for row in rows]), np.array([row.close for row in rows]), key[1], key[2]
+    )
+    topic.version = version
+    return hub
+
+def test_subscriber_coalesces_pending_updates():
+    """Updates not yet sent merge into one message: bars appended, latest fields kept"""
+    subscriber = Subscriber(max_pending_bars=100)
+    subscriber.offer("topic", update([{"datetime": "1"}], "short"))
+    subscriber.offer("topic", update([{"datetime": "2"}, {"datetime": "3"}], "long"))
+    subscriber.offer("other", update([{"datetime": "9"}]))
+
+    messages = asyncio.run(subscriber.next_batch(timeout=0))
+    assert len(messages) == 2
+    merged = messages[0]
+    assert [bar["datetime"] for bar in merged["bars"]] == ["1", "2", "3"]
+    assert merged["position"] == "long"
+    assert merged["dropped"] == 0
+    assert subscriber.coalesced == 1
+    assert asyncio.run(subscriber.next_batch(timeout=0)) == []
+
+def test_subscriber_drops_oldest_bars_of_slow_consumer():
+    """A consumer further behind than max_pending_bars loses the oldest bars and is told how many"""
+    subscriber = Subscriber(max_pending_bars=3)
+    subscriber.offer("topic", {"type": "snapshot", "bars": [], "crossovers": [], "dropped": 0})
+    for i in range(5):
+        crossovers = [{"datetime": str(i), "signal": "buy"}] if i in (1, 4) else []
+        subscriber.offer("topic", {**update([{"datetime": str(i)}]), "crossovers": crossovers})
+
+    message = asyncio.run(subscriber.next_batch(timeout=0))[0]
+    assert message["type"] == "snapshot"
+    assert [bar["datetime"] for bar in message["bars"]] == ["2", "3", "4"]
+    assert [crossover["datetime"] for crossover in message["crossovers"]] == ["4"]
+    assert message["dropped"] == 2
+    assert subscriber.dropped_bars == 2
+
+def test_publish_folds_bars_once_per_topic_and_fans_out():
+    """A write updates the topic state once and every subscriber gets the bars, averages and crossovers"""
+    rows = make_rows(generate_test_data(days=300))
+    key = ("TEST", 5, 20)
+    hub = ready_hub(key, rows[:200])
+    subscribers = [hub.connect() for _ in range(3)]
+    for subscriber in subscribers:
+        subscriber.topics.add(key)
+        hub.topics[key].subscribers.add(subscriber)
+
+    hub.publish("TEST", rows[200:250], version=2)
+    hub.publish("TEST", rows[250:], version=3)
+    hub.publish("OTHER", rows[:1], version=7)
+
+    close = pd.Series([row.close for row in rows])
+    short_ma = close.rolling(5, min_periods=1).mean()
+    long_ma = close.rolling(20, min_periods=1).mean()
+    signal = np.where(short_ma > long_ma, 1, -1)
+    expected_crossovers = [
+        ("buy" if signal[i] == 1 else "sell", pd.Timestamp(rows[i].datetime).tz_localize("UTC").isoformat())
+        for i in range(201, len(rows)) if signal[i] != signal[i - 1]
+    ]
+
+    assert hub.updates == 2 and hub.published == 2
+    for subscriber in subscribers:
+        message, = asyncio.run(subscriber.next_batch(timeout=0))
+        assert message["type"] == "update"
+        assert message["version"] == 3
+        assert len(message["bars"]) == 100
+        assert abs(message["short_ma"] - short_ma.iloc[-1]) < 1e-9
+        assert abs(message["long_ma"] - long_ma.iloc[-1]) < 1e-9
+        assert message["position"] == ("long" if signal[-1] == 1 else "short")
+        assert [(c["signal"], c["datetime"]) for c in message["crossovers"]] == expected_crossovers
+        json.dumps(message)
+
+def test_publish_out_of_order_or_skipped_version_rebuilds_topic():
+    """A write that cannot be folded in bar by bar reloads the topic instead"""
+    rows = make_rows(generate_test_data(days=100))
+    key = ("TEST", 5, 20)
+
+    async def scenario(publish):
+        hub = ready_hub(key, rows[:80])
+        loads = []
+        async def load(topic):
+            loads.append(topic.key)
+            topic.loading = None
+        hub._load = load
+        publish(hub)
+        await asyncio.sleep(0)
+        return hub, loads
+
+    hub, loads = asyncio.run(scenario(lambda hub: hub.publish("TEST", rows[80:], version=3)))
+    assert loads == [key] and hub.updates == 0
+    hub, loads = asyncio.run(scenario(lambda hub: hub.publish("TEST", rows[50:60], version=2)))
+    assert loads == [key]
+    hub, loads = asyncio.run(scenario(lambda hub: hub.publish("TEST", rows[80:], version=2, complete=False)))
+    assert loads == [key]
+    hub, loads = asyncio.run(scenario(lambda hub: hub.publish("TEST", rows[80:], version=2)))
+    assert loads == [] and hub.updates == 1
+
+def test_sse_stream_starts_with_snapshot_and_ends_on_close():
+    """The SSE generator sends the topic snapshot, keep-alives when idle, and stops when the hub closes"""
+    rows = make_rows(generate_test_data(days=60))
+    key = ("TEST", 5, 20)
+    # Version 0 is the current data version of an instrument never written to
+    hub = ready_hub(key, rows, version=0, heartbeat=0.01)
+
+    async def scenario():
+        stream = hub.sse([key])
+        first = await stream.__anext__()
+        keep_alive = await stream.__anext__()
+        assert hub.stats()["subscribers"] == 1
+        hub.close()
+        rest = [event async for event in stream]
+        return first, keep_alive, rest
+
+    first, keep_alive, rest = asyncio.run(scenario())
+    event, data = first.strip().split("\n")
+    assert event == "event: snapshot"
+    snapshot = json.loads(data[len("data: "):])
+    assert snapshot["instrument"] == "TEST" and snapshot["version"] == 0
+    assert snapshot["metrics"]["total_trades"] == MAStrategyState.from_arrays(
+        pd.DatetimeIndex([row.datetime for row in rows]), np.array([row.close for row in rows]), 5, 20
+    ).metrics()["total_trades"]
+    assert keep_alive == ": keep-alive\n\n"
+    assert rest == []
+    stats = hub.stats()
+    assert stats["subscribers"] == 0 and stats["topics"] == 0 and stats["delivered"] == 1
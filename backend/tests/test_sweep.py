@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app.strategy import calculate_ma_strategy
+from app.sweep import rolling_means, run_ma_sweep
+from tests.test_strategy import generate_test_data
+
+def test_rolling_means_match_pandas():
+    """Cumulative-sum rolling means agree with pandas rolling(min_periods=1)"""
+    close = np.random.default_rng(1).normal(100, 5, 500)
+    windows = [1, 3, 20, 600]
+    
+    means = rolling_means(close, windows)
+    
+    for row, window in enumerate(windows):
+        expected = pd.Series(close).rolling(window, min_periods=1).mean().to_numpy()
+        np.testing.assert_allclose(means[row], expected, rtol=1e-10)
+
+def test_sweep_matches_single_runs():
+    """Every grid point equals the corresponding calculate_ma_strategy call"""
+    test_data = generate_test_data(days=500)
+    close = np.array([row["close"] for row in test_data])
+    
+    results = run_ma_sweep(close, [5, 10, 20], [20, 50], max_workers=1)
+    
+    assert [(r["short_window"], r["long_window"]) for r in results] == [
+        (5, 20), (5, 50), (10, 20), (10, 50), (20, 20), (20, 50)
+    ]
+    for result in results:
+        expected = calculate_ma_strategy(test_data, result["short_window"], result["long_window"])
+        for key, value in result.items():
+            if key in ("short_window", "long_window"):
+                continue
+            if expected[key] is None:
+                assert value is None
+            else:
+                assert value == pytest.approx(expected[key], rel=1e-9, abs=1e-12)
+
+def test_sweep_process_pool_matches_serial(monkeypatch):
+    """Splitting a grid across worker processes gives the same results"""
+    monkeypatch.setattr("app.sweep.SWEEP_PARALLEL_CELLS", 1)
+    close = 100 * np.cumprod(1 + np.random.default_rng(3).normal(0, 0.01, 2000))
+    
+    parallel = run_ma_sweep(close, range(2, 12), range(20, 60, 10), max_workers=2)
+    serial = run_ma_sweep(close, range(2, 12), range(20, 60, 10), max_workers=1)
+    
+    assert parallel == serial
+
+def test_sweep_empty_input():
+    """An empty series yields an empty grid"""
+    assert run_ma_sweep(np.array([]), [5], [20]) == []
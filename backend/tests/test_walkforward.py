@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import walkforward
+from app.sweep import evaluate_signals, rolling_means
+from app.walkforward import Fold, run_walk_forward, score_grid, walk_forward_folds
+
+def make_series(n=1500, seed=4):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0.0002, 0.012, n))
+    return pd.date_range("2010-01-01", periods=n, freq="B", tz="UTC"), close
+
+def test_folds():
+    assert walk_forward_folds(10, 4, 2) == [Fold(0, 4, 4, 6), Fold(2, 6, 6, 8), Fold(4, 8, 8, 10)]
+    assert walk_forward_folds(10, 4, 2, step=3, anchored=True) == [Fold(0, 4, 4, 6), Fold(0, 7, 7, 9)]
+    for args in ((5, 4, 2), (10, 1, 2), (10, 4, 0)):
+        with pytest.raises(ValueError):
+            walk_forward_folds(*args)
+
+@pytest.mark.parametrize("objective", ["sharpe_ratio", "total_returns"])
+def test_score_grid_matches_evaluate_signals(objective):
+    _, close = make_series(800)
+    short_windows, long_windows = [3, 10, 25], [20, 50, 80, 120]
+    means = rolling_means(close, short_windows + long_windows)
+    short_means, long_means = means[:3], means[3:]
+    scores = score_grid(close, short_means, long_means, 150, 600, objective)
+
+    for i in range(3):
+        signal = np.where(short_means[i, 150:600] > long_means[:, 150:600], 1, -1).astype(np.int8)
+        expected = evaluate_signals(close[150:600], signal)[objective]
+        np.testing.assert_allclose(scores[i], expected, rtol=1e-9)
+
+def test_walk_forward_picks_best_train_pair_and_reports_test():
+    datetimes, close = make_series()
+    short_windows, long_windows = list(range(2, 30, 3)), list(range(20, 120, 10))
+    result = run_walk_forward(datetimes, close, short_windows, long_windows, 500, 200, max_workers=1)
+
+    assert len(result["folds"]) == 5
+    means = rolling_means(close, short_windows + long_windows)
+    for k, fold in enumerate(result["folds"]):
+        start, end = 200 * k, 200 * k + 500
+        scores = score_grid(close, means[:len(short_windows)], means[len(short_windows):], start, end)
+        i, j = np.unravel_index(np.nanargmax(scores), scores.shape)
+        assert (fold["short_window"], fold["long_window"]) == (short_windows[i], long_windows[j])
+        assert fold["test_start"] == datetimes[end].isoformat()
+
+        short_mean = means[short_windows.index(fold["short_window"])]
+        long_mean = means[len(short_windows) + long_windows.index(fold["long_window"])]
+        signal = np.where(short_mean[end - 1:end + 200] > long_mean[end - 1:end + 200], 1, -1).astype(np.int8)
+        expected = evaluate_signals(close[end - 1:end + 200], signal[None], seeded=True)
+        assert fold["test"]["total_returns"] == pytest.approx(expected["total_returns"][0])
+
+    growth = np.prod([1 + fold["test"]["total_returns"] / 100 for fold in result["folds"]])
+    assert result["out_of_sample"]["bars"] == 1000
+    assert result["out_of_sample"]["total_returns"] == pytest.approx((growth - 1) * 100)
+
+def test_test_folds_match_full_series_backtest():
+    """With a single pair, stitched test folds earn the full-series strategy returns of the test bars, first bars included"""
+    datetimes, close = make_series(1000)
+    result = run_walk_forward(datetimes, close, [5], [30], 400, 150, max_workers=1)
+
+    means = rolling_means(close, [5, 30])
+    signal = np.where(means[0] > means[1], 1, -1)
+    returns = signal[:-1] * (close[1:] / close[:-1] - 1)
+    tested = returns[399:]
+    assert result["out_of_sample"]["bars"] == len(tested) == 600
+    assert result["out_of_sample"]["total_returns"] == pytest.approx((np.prod(1 + tested) - 1) * 100)
+    first_fold = np.prod(1 + returns[399:549]) - 1
+    assert result["folds"][0]["test"]["total_returns"] == pytest.approx(first_fold * 100)
+
+def test_walk_forward_in_processes(monkeypatch):
+    datetimes, close = make_series(1200)
+    args = (datetimes, close, [5, 10, 20], [30, 60, 90], 300, 150)
+    serial = run_walk_forward(*args, max_workers=1)
+    monkeypatch.setattr(walkforward, "SWEEP_PARALLEL_CELLS", 0)
+    assert run_walk_forward(*args, max_workers=2) == serial
@@ -24,18 +24,42 @@ long_window = st.sidebar.slider("Long-term MA Window", min_value=20, max_value=2
 
 # API URL
 API_URL = "http://localhost:8000"  # Update with your API URL when deployed
+# Rows requested per page of GET /data
+DATA_PAGE_SIZE = 50000
 
 # Function to fetch data from API
 @st.cache_data(ttl=300)  # Cache for 5 minutes
 def fetch_stock_data():
     try:
-        response = requests.get(f"{API_URL}/data")
-        response.raise_for_status()
-        return response.json()
+        # Columnar pages avoid building one JSON object per row; the cursor links the pages
+        columns = {}
+        params = {"format": "columnar", "limit": DATA_PAGE_SIZE}
+        while True:
+            response = requests.get(f"{API_URL}/data", params=params)
+            response.raise_for_status()
+            page = response.json()
+            next_cursor = page.pop("next_cursor", None)
+            for field, values in page.items():
+                columns.setdefault(field, []).extend(values)
+            if not next_cursor:
+                break
+            params["cursor"] = next_cursor
+        return columns if columns.get("id") else []
     except requests.RequestException as e:
         st.error(f"Error fetching stock data: {e}")
         return []
 
+# Function to fetch OHLCV bars aggregated server-side, so the chart stays small
+@st.cache_data(ttl=300)
+def fetch_resampled_data(interval):
+    try:
+        response = requests.get(f"{API_URL}/data/resample", params={"interval": interval, "format": "columnar"})
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        st.error(f"Error fetching resampled data: {e}")
+        return None
+
 # Function to fetch strategy performance
 def fetch_strategy_performance(short_window, long_window):
     try:
@@ -48,8 +72,25 @@ def fetch_strategy_performance(short_window, long_window):
         st.error(f"Error fetching strategy performance: {e}")
         return None
 
+# Function to fetch a grid of strategy results in one request
+@st.cache_data(ttl=300)
+def fetch_strategy_sweep(short_range, long_range):
+    try:
+        response = requests.get(
+            f"{API_URL}/strategy/sweep",
+            params={
+                "short_min": short_range[0], "short_max": short_range[1], "short_step": short_range[2],
+                "long_min": long_range[0], "long_max": long_range[1], "long_step": long_range[2],
+            }
+        )
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        st.error(f"Error fetching strategy sweep: {e}")
+        return None
+
 # Main content
-tab1, tab2 = st.tabs(["📈 Strategy Performance", "🔍 Data Explorer"])
+tab1, tab2, tab3 = st.tabs(["📈 Strategy Performance", "🔍 Data Explorer", "🧮 Parameter Sweep"])
 
 with tab1:
     st.subheader("Moving Average Crossover Strategy")
@@ -221,13 +262,15 @@ with tab2:
         st.write(f"Total records: {len(df)}")
         st.write(f"Date range: {df['datetime'].min().date()} to {df['datetime'].max().date()}")
         
-        # OHLC chart
+        # OHLC chart, aggregated by the API to the chosen candle interval
+        interval = st.selectbox("Candle interval", ["1d", "1w", "1h", "15m"], index=0)
+        candles = fetch_resampled_data(interval) or {"datetime": [], "open": [], "high": [], "low": [], "close": []}
         fig = go.Figure(data=[go.Candlestick(
-            x=df['datetime'],
-            open=df['open'],
-            high=df['high'],
-            low=df['low'],
-            close=df['close'],
+            x=pd.to_datetime(candles['datetime']),
+            open=candles['open'],
+            high=candles['high'],
+            low=candles['low'],
+            close=candles['close'],
             name='OHLC'
         )])
         
@@ -278,3 +321,42 @@ with tab2:
         
     else:
         st.warning("No stock data available")
+
+with tab3:
+    st.subheader("Moving Average Window Sweep")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        short_range = st.slider("Short-term MA range", min_value=1, max_value=100, value=(5, 50))
+        short_step = st.number_input("Short-term step", min_value=1, value=5)
+    with col2:
+        long_range = st.slider("Long-term MA range", min_value=5, max_value=300, value=(20, 200))
+        long_step = st.number_input("Long-term step", min_value=1, value=10)
+    
+    metric = st.selectbox("Metric", ["total_returns", "sharpe_ratio", "win_rate", "max_drawdown"])
+    
+    with st.spinner("Running parameter sweep..."):
+        sweep = fetch_strategy_sweep(
+            (short_range[0], short_range[1], int(short_step)),
+            (long_range[0], long_range[1], int(long_step))
+        )
+    
+    if sweep and sweep['results']:
+        grid = pd.DataFrame(sweep['results']).pivot(
+            index='short_window', columns='long_window', values=metric
+        )
+        fig = go.Figure(data=go.Heatmap(
+            z=grid.values, x=grid.columns, y=grid.index, colorscale='RdYlGn',
+            colorbar=dict(title=metric)
+        ))
+        fig.update_layout(
+            xaxis_title='Long-term MA window',
+            yaxis_title='Short-term MA window',
+            height=500
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        best = max(sweep['results'], key=lambda r: r[metric] if r[metric] is not None else float('-inf'))
+        st.write(f"Best {metric}: short={best['short_window']}, long={best['long_window']} ({best[metric]:.2f})")
+    else:
+        st.warning("No sweep results available")
@@ -1,54 +1,212 @@
-import pandas as pd
-from prisma import Prisma
+"""
+Bulk-load stock bars into PostgreSQL.
+
+Reads xlsx, CSV or Parquet files in chunks (so files larger than memory
+stream through), writes batches with several concurrent writer tasks and
+skips rows that are already stored, so re-running on a loaded file is cheap.
+
+Usage:
+    python seed.py                                  # HINDALCO_1D.xlsx
+    python seed.py data/bars.csv --workers 8 --method copy
+    python seed.py data/bars.parquet --instrument NIFTY --batch-size 10000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
 from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
 
-# Initialize Prisma Client
-db = Prisma()
+import pandas as pd
 
-async def seed_database():
-    await db.connect()
-    file_path = "HINDALCO_1D.xlsx"
+sys.path.insert(0, str(Path(__file__).resolve().parent / "backend"))
+
+from app.bar_cache import bar_cache  # noqa: E402
+from app.cache import data_versions  # noqa: E402
+from app.database import get_prisma_client  # noqa: E402
+from app.ingest import StagingPool, make_writer  # noqa: E402
+from app.rollups import rollup_store  # noqa: E402
+from app.schemas import StockDataCreate  # noqa: E402
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+
+def read_chunks(path: Path, file_format: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks without loading the whole file."""
+    if file_format == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif file_format == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(name).strip() for name in next(rows)]
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield pd.DataFrame(chunk, columns=header)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def to_rows(df: pd.DataFrame, instrument: str) -> List[StockDataCreate]:
+    """Clean a chunk with vectorized conversions and build rows without per-field validation."""
+    df = df.rename(columns=str.lower)
+    if "instrument" not in df:
+        df["instrument"] = instrument
+    df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    for column in PRICE_COLUMNS + ["volume"]:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    df = df.dropna(subset=["datetime", "volume"] + PRICE_COLUMNS)
+    df["instrument"] = df["instrument"].fillna(instrument).astype(str)
+    df["volume"] = df["volume"].astype("int64")
+
+    return [
+        StockDataCreate.model_construct(
+            datetime=timestamp.to_pydatetime(), open=open_, high=high, low=low,
+            close=close, volume=volume, instrument=name
+        )
+        for timestamp, open_, high, low, close, volume, name in zip(
+            df["datetime"], df["open"].tolist(), df["high"].tolist(), df["low"].tolist(),
+            df["close"].tolist(), df["volume"].tolist(), df["instrument"]
+        )
+    ]
+
+
+def track_ranges(ranges: Dict[str, Tuple[datetime, datetime]], rows: List[StockDataCreate]) -> None:
+    """Widen each instrument's (first, last) datetime range to cover rows."""
+    for row in rows:
+        first, last = ranges.get(row.instrument, (row.datetime, row.datetime))
+        ranges[row.instrument] = (min(first, row.datetime), max(last, row.datetime))
 
-    try:
-        # Load Excel File
-        df = pd.read_excel(file_path, engine="openpyxl")
-
-        # Convert datetime column
-        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-
-        # Drop rows with invalid datetime
-        df = df.dropna(subset=["datetime"])
-
-        # Insert each row
-        for _, row in df.iterrows():
-            datetime_value = row["datetime"].to_pydatetime()
-
-            # Check if record already exists
-            existing_record = await db.stockdata.find_first(where={"datetime": datetime_value})
-
-            if not existing_record:
-                await db.stockdata.create(
-                    data={
-                        "datetime": datetime_value,
-                        "open": float(row["open"]),
-                        "high": float(row["high"]),
-                        "low": float(row["low"]),
-                        "close": float(row["close"]),
-                        "volume": int(row["volume"]),
-                        "instrument": row.get("instrument", "HINDALCO"),
-                    }
-                )
-            else:
-                print(f"Skipping duplicate datetime: {datetime_value}")
-
-        print("✅ Data successfully seeded into PostgreSQL!")
 
+class Progress:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.received = 0
+        self.inserted = 0
+
+    def update(self, received: int, inserted: int) -> None:
+        self.received += received
+        self.inserted += inserted
+        print(
+            f"\r{self.received:,} rows  {self.inserted:,} inserted  "
+            f"{self.received - self.inserted:,} skipped  {self.rate():,.0f} rows/s",
+            end="", file=sys.stderr, flush=True
+        )
+
+    def rate(self) -> float:
+        return self.received / max(time.perf_counter() - self.start, 1e-9)
+
+
+async def put(queue: asyncio.Queue, item, workers: List[asyncio.Task]) -> None:
+    """Queue a batch, surfacing writer failures instead of blocking on a full queue."""
+    while True:
+        for worker in workers:
+            if worker.done() and worker.exception():
+                raise worker.exception()
+        try:
+            await asyncio.wait_for(queue.put(item), timeout=1)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def seed_database(args: argparse.Namespace) -> Progress:
+    path = Path(args.path)
+    file_format = args.format or path.suffix.lstrip(".").lower()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.workers * 2)
+    progress = Progress()
+    ranges: Dict[str, Tuple[datetime, datetime]] = {}
+    # One staging connection per writer task, instead of the API's bounded pool
+    staging = StagingPool(size=args.workers)
+
+    async with get_prisma_client() as prisma:
+        async def writer_task():
+            writer = make_writer(args.method, prisma, staging)
+            try:
+                while True:
+                    rows = await queue.get()
+                    try:
+                        if rows is None:
+                            return
+                        progress.update(len(rows), await writer.write(rows))
+                    finally:
+                        queue.task_done()
+            finally:
+                await writer.close()
+
+        workers = [asyncio.create_task(writer_task()) for _ in range(args.workers)]
+        chunks = read_chunks(path, file_format, args.chunk_size)
+        sentinel = object()
+        try:
+            while True:
+                # File reads and parsing happen off the event loop so writers keep running
+                chunk = await asyncio.to_thread(next, chunks, sentinel)
+                if chunk is sentinel:
+                    break
+                rows = await asyncio.to_thread(to_rows, chunk, args.instrument)
+                track_ranges(ranges, rows)
+                for start in range(0, len(rows), args.batch_size):
+                    await put(queue, rows[start:start + args.batch_size], workers)
+            for _ in workers:
+                await put(queue, None, workers)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            # Let cancelled writers hand their connections back before closing them
+            await asyncio.gather(*workers, return_exceptions=True)
+            await staging.close()
+
+        # Drop cached bars the load backfilled, keep existing rollups of the loaded instruments current
+        # (instruments without rollups build them on first read) and bump their data versions, so running
+        # API processes stop serving cached results and incremental state computed before the load
+        for instrument, (first, last) in ranges.items():
+            bar_cache.invalidate(instrument, first)
+            await rollup_store.refresh(prisma, instrument, first, last)
+            await data_versions.bump(instrument)
+
+    print(file=sys.stderr)
+    return progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default="HINDALCO_1D.xlsx", help="xlsx, csv or parquet file")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], help="Override format detection")
+    parser.add_argument("--instrument", default="HINDALCO", help="Instrument for files without an instrument column")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows read from the file at a time")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per database write")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent writer tasks")
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy", help="COPY via psycopg2 or Prisma create_many")
+    args = parser.parse_args()
+
+    try:
+        progress = asyncio.run(seed_database(args))
     except Exception as e:
-        print(f"❌ Error seeding data: {e}")
+        print(f"❌ Error seeding data: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    finally:
-        await db.disconnect()
+    elapsed = time.perf_counter() - progress.start
+    print(
+        f"✅ Loaded {progress.received:,} rows in {elapsed:.1f}s ({progress.rate():,.0f} rows/s): "
+        f"{progress.inserted:,} inserted, {progress.received - progress.inserted:,} already present"
+    )
 
-# Run the function
-import asyncio
-asyncio.run(seed_database())
+
+if __name__ == "__main__":
+    main()